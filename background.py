@@ -0,0 +1,123 @@
+import logging
+import threading
+from PyQt6.QtCore import QObject, QRunnable, pyqtSignal
+from dxf_export import write_dxf
+from fit_validation import FitTemplate
+from mesh3d import format_dropped_slots, write_mesh
+from svg_export import write_svg
+from toolpath import optimize_cut_order
+
+log = logging.getLogger(__name__)
+
+class TaskCancelled(Exception):
+    """Raised inside a task when it has been cancelled"""
+
+class TaskSignals(QObject):
+    """Signals a Task emits from its worker thread
+
+    Connected slots of objects living in the GUI thread run there, queued.
+    Results are passed as Python object references, so geometry is never
+    copied between threads; Geometry arrays are read-only, which makes
+    sharing them safe.
+    """
+    progress = pyqtSignal(int, int)
+    item = pyqtSignal(str, object)
+    result = pyqtSignal(object)
+    error = pyqtSignal(str)
+    cancelled = pyqtSignal()
+    finished = pyqtSignal()
+
+class Task(QRunnable):
+    """Run a function on a QThreadPool thread
+
+    The function is called as ``function(task, *args)`` so it can report
+    progress, emit items as they become available and stop when cancelled.
+    Its return value is emitted as ``signals.result``.
+    """
+    def __init__(self, function, *args):
+        super().__init__()
+        # Python owns the task; Qt must not delete it after run()
+        self.setAutoDelete(False)
+        self.function = function
+        self.args = args
+        self.signals = TaskSignals()
+        self._cancelled = threading.Event()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    @property
+    def is_cancelled(self):
+        return self._cancelled.is_set()
+
+    def check_cancelled(self):
+        if self._cancelled.is_set():
+            raise TaskCancelled()
+
+    def report(self, done, total):
+        """Emit progress and stop the task here if it was cancelled"""
+        self.signals.progress.emit(done, total)
+        self.check_cancelled()
+
+    def run(self):
+        try:
+            result = self.function(self, *self.args)
+        except TaskCancelled:
+            self.signals.cancelled.emit()
+        except Exception as e:
+            log.exception("Background task %s failed", getattr(self.function, '__name__', self.function))
+            self.signals.error.emit(str(e))
+        else:
+            self.signals.result.emit(result)
+        finally:
+            self.signals.finished.emit()
+
+def fetch_profile(task, manager, profile_name):
+    """Get a profile, parsing it if needed, with its slot fit checks
+
+    Returns ``(profile_name, profile, layout, fit)``; ``fit`` is a
+    FitTemplate, or None if the profile cannot be scaled.
+    """
+    profile = manager.get_profile(profile_name)
+    layout = manager.layouts.get(profile_name)
+    fit = None
+    if profile is not None and layout is not None and layout.error is None:
+        fit = FitTemplate(profile, layout)
+    return profile_name, profile, layout, fit
+
+def export_design(task, manager, profile_name, width, height, material, filepath,
+                  file_format='dxf', optimize_cuts=False):
+    """Scale a profile and write it to a DXF or SVG file, reporting progress
+
+    Cancelling stops the export before the file is written. Returns
+    ``(filepath, cut_report, warning)`` like ``export_box``.
+    """
+    scaled = manager.scale_to_dimensions(profile_name, width, height, material)
+    if scaled is None:
+        raise ValueError(f"Unknown profile: {profile_name}")
+    task.check_cancelled()
+    report = None
+    if optimize_cuts:
+        scaled, report = optimize_cut_order(scaled)
+        task.check_cancelled()
+    if file_format == 'svg':
+        write_svg(scaled, filepath)
+    else:
+        write_dxf(scaled, filepath, progress=task.report)
+    return filepath, report, None
+
+def export_box(task, mesh_cache, profile_name, width, height, material, filepath, file_format='stl'):
+    """Build, or reuse, the 3D box model of a design and stream it to STL or OBJ
+
+    Returns ``(filepath, None, warning)``; ``warning`` lists the slots that
+    cross their panel's outline and are missing from the mesh, or is None.
+    """
+    model = mesh_cache.box(profile_name, width, height, material)
+    if model is None:
+        raise ValueError(f"Unknown profile: {profile_name}")
+    task.check_cancelled()
+    write_mesh(model, filepath, file_format)
+    warning = None
+    if model.dropped_slots:
+        warning = f"slots crossing their panel's outline left out: {format_dropped_slots(model.dropped_slots)}"
+    return filepath, None, warning
@@ -0,0 +1,289 @@
+import argparse
+import csv
+import json
+import logging
+import os
+import re
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from dxf_export import CombinedDXFWriter, write_dxf
+from fit_validation import FitTemplate, format_issues
+from instrumentation import add_arguments, configure
+from profile_manager import ProfileManager
+from toolpath import optimize_cut_order
+
+log = logging.getLogger(__name__)
+
+ORDER_FIELDS = ('profile', 'width', 'height', 'material')
+
+# Profile manager of the current worker process, created once by init_worker
+_manager = None
+# Slot fit checks of the worker's profiles, by layout digest
+_fit_templates = {}
+
+def read_orders(filepath):
+    """Stream orders from a CSV or JSONL file
+
+    Each order needs ``profile``, ``width``, ``height`` and ``material``
+    (thickness in mm) and may have an ``id``; the line number is used
+    otherwise. Rows that cannot be parsed are yielded with an ``error`` key so
+    they are reported like any other failed order.
+    """
+    if filepath.lower().endswith('.csv'):
+        with open(filepath, newline='', encoding='utf-8') as f:
+            for line_number, row in enumerate(csv.DictReader(f), start=2):
+                yield parse_order(row, line_number)
+    else:
+        with open(filepath, encoding='utf-8') as f:
+            for line_number, line in enumerate(f, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    row = json.loads(line)
+                except ValueError as e:
+                    yield {'id': str(line_number), 'error': f"Invalid JSON: {str(e)}"}
+                    continue
+                yield parse_order(row, line_number)
+
+def parse_order(row, line_number):
+    """Validate one order row and convert its dimensions to numbers"""
+    order = {'id': str(row.get('id') or line_number)}
+    try:
+        order['profile'] = str(row['profile'])
+        for field in ORDER_FIELDS[1:]:
+            order[field] = float(row[field])
+    except (KeyError, TypeError, ValueError) as e:
+        order['error'] = f"Invalid order: {str(e)}"
+    return order
+
+def order_filename(order_id):
+    """Get a safe DXF file name for an order"""
+    return re.sub(r'[^A-Za-z0-9._-]', '_', order_id) + '.dxf'
+
+def init_worker(dxf_dir, max_profiles):
+    """Create the worker's profile manager; each profile is then mapped from the geometry store or parsed, once per worker"""
+    global _manager
+    _manager = ProfileManager(lazy=True, dxf_dir=dxf_dir, max_profiles=max_profiles)
+
+def check_fit(order):
+    """Get a description of the order's slot problems, or None if every slot fits"""
+    layout = _manager.layouts[order['profile']]
+    template = _fit_templates.get(layout.digest)
+    if template is None:
+        template = FitTemplate(_manager.get_profile(order['profile']), layout)
+        _fit_templates[layout.digest] = template
+    issues = template.check([order['width']], [order['height']], order['material']).issues()
+    return format_issues(issues) if issues else None
+
+def scale_order(order, optimize_cuts=False, validate=False):
+    """Scale one order's profile
+
+    Returns ``(order_id, geometry, error)``; errors are returned rather than
+    raised so one bad order never stops the batch. With ``optimize_cuts`` the
+    contours are reordered to cut slots first and shorten the machine's travel.
+    With ``validate`` an order whose slots do not fit fails.
+    """
+    try:
+        scaled = _manager.scale_to_dimensions(order['profile'], order['width'],
+                                              order['height'], order['material'])
+        if scaled is None:
+            return order['id'], None, f"Unknown profile: {order['profile']}"
+        if validate:
+            problems = check_fit(order)
+            if problems is not None:
+                return order['id'], None, f"Slot fit: {problems}"
+        if optimize_cuts:
+            scaled, _ = optimize_cut_order(scaled)
+        return order['id'], scaled, None
+    except Exception as e:
+        return order['id'], None, f"{type(e).__name__}: {str(e)}"
+
+def export_order(order, output_dir, optimize_cuts=False, validate=False):
+    """Scale one order's profile and write it to the output directory
+
+    Returns ``(order_id, output_path, error)`` like ``scale_order``.
+    """
+    order_id, scaled, error = scale_order(order, optimize_cuts, validate)
+    if error is not None:
+        return order_id, None, error
+    try:
+        filepath = os.path.join(output_dir, order_filename(order_id))
+        write_dxf(scaled, filepath)
+        return order_id, filepath, None
+    except Exception as e:
+        return order_id, None, f"{type(e).__name__}: {str(e)}"
+
+def read_progress(filepath):
+    """Get the file each order finished by earlier runs was written to"""
+    done = {}
+    if os.path.exists(filepath):
+        with open(filepath, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                    done[entry['id']] = entry.get('file')
+                except (ValueError, KeyError):
+                    # A run interrupted mid-write can leave a partial last line
+                    continue
+    return done
+
+class BatchExporter:
+    """Export many orders to DXF across worker processes
+
+    At most ``max_pending`` orders are in flight, so memory stays bounded no
+    matter how large the order file is. Finished orders are appended to the
+    progress file, with the file they went to, and failed ones to the error
+    file, both as JSON lines; a rerun skips every order whose own DXF file
+    the progress file records and that still exists.
+
+    With ``combined_path`` every order goes into that one DXF file instead,
+    identical panels shared as blocks. The file is written whole, so earlier
+    progress is not skipped. With ``validate`` orders whose slots do not fit
+    fail before anything is written.
+    """
+    def __init__(self, output_dir, workers=None, dxf_dir=None, max_pending=None,
+                 max_profiles=None, progress_path=None, errors_path=None, optimize_cuts=False,
+                 combined_path=None, validate=False):
+        self.output_dir = output_dir
+        self.workers = workers or os.cpu_count() or 1
+        self.dxf_dir = dxf_dir
+        self.max_pending = max_pending or self.workers * 4
+        self.max_profiles = max_profiles
+        self.progress_path = progress_path or os.path.join(output_dir, 'progress.jsonl')
+        self.errors_path = errors_path or os.path.join(output_dir, 'errors.jsonl')
+        self.optimize_cuts = optimize_cuts
+        self.combined_path = combined_path
+        self.validate = validate
+        self.stats = {'exported': 0, 'failed': 0, 'skipped': 0}
+        self._writer = None
+
+    def run(self, orders):
+        """Export every order and return the summary"""
+        os.makedirs(self.output_dir, exist_ok=True)
+        start = time.perf_counter()
+        if self.combined_path is not None:
+            done = set()
+            self._writer = CombinedDXFWriter(self.combined_path)
+        else:
+            done = self._finished(read_progress(self.progress_path))
+
+        try:
+            with open(self.progress_path, 'a', encoding='utf-8') as progress, \
+                    open(self.errors_path, 'a', encoding='utf-8') as errors:
+                self._progress = progress
+                self._errors = errors
+                pending_orders = self._pending(orders, done)
+                if self.workers > 1:
+                    self._run_parallel(pending_orders)
+                else:
+                    init_worker(self.dxf_dir, self.max_profiles)
+                    for order in pending_orders:
+                        function, args = self._task(order)
+                        self._record(*function(*args))
+        except BaseException:
+            if self._writer is not None:
+                self._writer.abort()
+                self._writer = None
+            raise
+
+        summary = dict(self.stats)
+        if self._writer is not None:
+            summary['combined'] = self._writer.close()
+            self._writer = None
+        elapsed = time.perf_counter() - start
+        summary['seconds'] = elapsed
+        summary['orders_per_second'] = (self.stats['exported'] + self.stats['failed']) / elapsed if elapsed > 0 else 0.0
+        return summary
+
+    def _finished(self, progress):
+        """Get the orders whose own DXF file was written, not those of a combined run"""
+        return {order_id for order_id, filepath in progress.items()
+                if filepath is not None
+                and os.path.abspath(filepath) == os.path.abspath(os.path.join(self.output_dir, order_filename(order_id)))
+                and os.path.exists(filepath)}
+
+    def _pending(self, orders, done):
+        """Skip finished orders and report invalid ones"""
+        for order in orders:
+            if order['id'] in done:
+                self.stats['skipped'] += 1
+            elif 'error' in order:
+                self._record(order['id'], None, order['error'])
+            else:
+                yield order
+
+    def _run_parallel(self, orders):
+        with ProcessPoolExecutor(max_workers=self.workers, initializer=init_worker,
+                                 initargs=(self.dxf_dir, self.max_profiles)) as pool:
+            in_flight = set()
+            for order in orders:
+                if len(in_flight) >= self.max_pending:
+                    finished, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        self._record(*future.result())
+                function, args = self._task(order)
+                in_flight.add(pool.submit(function, *args))
+            for future in wait(in_flight).done:
+                self._record(*future.result())
+
+    def _task(self, order):
+        """Get the function and arguments that process one order in a worker"""
+        if self._writer is not None:
+            # Workers only scale; the combined file is written in this process
+            return scale_order, (order, self.optimize_cuts, self.validate)
+        return export_order, (order, self.output_dir, self.optimize_cuts, self.validate)
+
+    def _record(self, order_id, result, error):
+        filepath = result
+        if self._writer is not None and error is None:
+            try:
+                self._writer.add(result)
+                filepath = self.combined_path
+            except Exception as e:
+                error = f"{type(e).__name__}: {str(e)}"
+        if error is None:
+            self.stats['exported'] += 1
+            self._progress.write(json.dumps({'id': order_id, 'file': filepath}) + '\n')
+            self._progress.flush()
+        else:
+            self.stats['failed'] += 1
+            log.warning("Order %s failed: %s", order_id, error)
+            self._errors.write(json.dumps({'id': order_id, 'error': error}) + '\n')
+            self._errors.flush()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export DXF cut files for a batch of orders")
+    parser.add_argument('orders', help="CSV or JSONL file with id, profile, width, height, material")
+    parser.add_argument('-o', '--output-dir', default='output', help="Directory for the DXF files")
+    parser.add_argument('-j', '--workers', type=int, default=None, help="Worker processes (default: one per CPU, 1 runs in-process)")
+    parser.add_argument('--dxf-dir', default=None, help="Profile library directory (default: assets/dxf)")
+    parser.add_argument('--max-pending', type=int, default=None, help="Orders in flight at once (default: 4 per worker)")
+    parser.add_argument('--max-profiles', type=int, default=None, help="Parsed profiles kept per worker")
+    parser.add_argument('--optimize-cuts', action='store_true', help="Order contours to cut slots first and minimize travel")
+    parser.add_argument('--combined', default=None, metavar='FILE', help="Write all orders to one DXF file, sharing identical panels as blocks")
+    parser.add_argument('--validate', action='store_true', help="Fail orders whose slots do not fit their panel or the material")
+    parser.add_argument('--restart', action='store_true', help="Ignore progress from earlier runs")
+    add_arguments(parser)
+    args = parser.parse_args(argv)
+    configure(args.log_level, args.trace)
+
+    exporter = BatchExporter(args.output_dir, args.workers, args.dxf_dir,
+                             args.max_pending, args.max_profiles,
+                             optimize_cuts=args.optimize_cuts, combined_path=args.combined,
+                             validate=args.validate)
+    if args.restart and os.path.exists(exporter.progress_path):
+        os.remove(exporter.progress_path)
+
+    summary = exporter.run(read_orders(args.orders))
+    print(f"Exported {summary['exported']} orders, {summary['failed']} failed, "
+          f"{summary['skipped']} already done in {summary['seconds']:.2f}s "
+          f"({summary['orders_per_second']:.1f} orders/s)")
+    if 'combined' in summary:
+        combined = summary['combined']
+        print(f"Combined file {args.combined}: {combined['panels']} panels as "
+              f"{combined['blocks']} blocks, {combined['bytes'] / 1e6:.2f} MB")
+    return 1 if summary['failed'] else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,335 @@
+import argparse
+import contextlib
+import json
+import math
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+import types
+import numpy as np
+from dxf_export import dxf_polyline, r12_header
+
+# Layer names as used in assets/dxf/bakjetestingsoftware.dxf, typo included
+PROFILE_PANELS = ('LEFTRIGHT', 'FRONTBACK', 'BOTTOM')
+QUADRANTS = ('TL', 'BL', 'TR', 'BR')
+PROFILE_SLOTS = {
+    'LEFTRIGHT': ('LEFTRIGHT_SLOTL', 'LEFTRIHT_SLOTR'),
+    'FRONTBACK': ('FRONTBACK_SLOTL', 'FRONTBACK_SLOTR'),
+    'BOTTOM': (),
+}
+# Left edge of each panel, placed like in the bundled profile
+PROFILE_COLUMNS = {'LEFTRIGHT': 0.0, 'FRONTBACK': 400.0, 'BOTTOM': 0.0}
+# Layer names DXFViewer reads from simplefied.dxf
+VIEWER_PANELS = ('LEFTRIGHT', 'FRONTBACK', 'BOTTOM')
+
+DEFAULT_THRESHOLD = 0.25
+
+def wavy_line(start, end, count, amplitude=1.5, waves=8):
+    """Sample ``count`` points from start to end with a small sideways wave, like a jointed edge"""
+    t = np.linspace(0.0, 1.0, max(count, 2))
+    start = np.asarray(start, dtype=np.float64)
+    end = np.asarray(end, dtype=np.float64)
+    direction = end - start
+    normal = np.array([-direction[1], direction[0]]) / (np.hypot(*direction) or 1.0)
+    wave = amplitude * np.sin(t * waves * 2 * np.pi)[:, np.newaxis]
+    return start + t[:, np.newaxis] * direction + wave * normal
+
+def quadrant_polyline(quadrant, min_x, min_y, width, height, count):
+    """Get the open corner polyline of one panel quadrant, mid-edge to mid-edge"""
+    mid_x = min_x + width / 2
+    mid_y = min_y + height / 2
+    corner_x = min_x if quadrant[1] == 'L' else min_x + width
+    corner_y = min_y + height if quadrant[0] == 'T' else min_y
+    half = max(count // 2, 2)
+    first = wavy_line((mid_x, corner_y), (corner_x, corner_y), half)
+    second = wavy_line((corner_x, corner_y), (corner_x, mid_y), count - half + 1)
+    return np.vstack([first, second[1:]])
+
+def slot_polyline(x, y, width=65.0, depth=9.8):
+    """Get a 4-point U-shaped slot like the ones in the profile library"""
+    return np.array([(x, y + depth), (x, y), (x + width, y), (x + width, y + depth)])
+
+def write_r12(filepath, polylines):
+    """Write ``(layer, points)`` polylines to an R12 DXF file"""
+    layers = {'0'} | {layer for layer, _ in polylines}
+    with open(filepath, 'w', encoding='utf-8') as f:
+        f.write(r12_header(layers))
+        f.write("  0\nSECTION\n  2\nENTITIES\n")
+        for layer, points in polylines:
+            f.write(dxf_polyline(layer, np.asarray(points).tolist()))
+        f.write("  0\nENDSEC\n  0\nEOF\n")
+
+def generate_profile(filepath, panels, vertices):
+    """Write a synthetic profile: ``panels`` panels of ``vertices`` outline vertices each
+
+    Panels cycle through LEFTRIGHT, FRONTBACK and BOTTOM, one row each, in
+    the columns of the real profile. Each is drawn as four open quadrant
+    polylines (``_TL``, ``_BL``, ``_TR``, ``_BR``) with the slot halves of
+    the real profile either side of its centre line, 20 mm above its bottom
+    edge, so the slots stay inside it as scaling widens it. Repeated panels
+    are numbered (``FRONTBACK2``) so each is a panel of its own.
+    """
+    polylines = []
+    per_quadrant = max(vertices // 4, 3)
+    for index in range(panels):
+        panel_type = PROFILE_PANELS[index % len(PROFILE_PANELS)]
+        repeat = index // len(PROFILE_PANELS)
+        panel_name = f"{panel_type}{repeat + 1}" if repeat else panel_type
+        min_x = PROFILE_COLUMNS[panel_type]
+        min_y = index * 300.0
+        width, height = 200.0, 120.0
+        for quadrant in QUADRANTS:
+            points = quadrant_polyline(quadrant, min_x, min_y, width, height, per_quadrant)
+            polylines.append((f"{panel_name}_{quadrant}", points))
+        slot_layers = PROFILE_SLOTS[panel_type]
+        if repeat:
+            slot_layers = [f"{panel_name}_SLOT{layer[-1]}" for layer in slot_layers]
+        for slot_index, layer in enumerate(slot_layers):
+            polylines.append((layer, slot_polyline(min_x + width / 2 + (slot_index - 1) * 65, min_y + 20)))
+    write_r12(filepath, polylines)
+
+def generate_viewer(filepath, panels, vertices):
+    """Write a synthetic simplefied.dxf for DXFViewer
+
+    Each of the three viewer panels gets a closed outline of ``vertices``
+    points, its share of ``panels`` slots and one X and one Y cutline.
+    """
+    polylines = []
+    slots_per_panel = max(math.ceil(panels / len(VIEWER_PANELS)), 1)
+    for index, panel_name in enumerate(VIEWER_PANELS):
+        min_y = index * 700.0
+        width, height = 400.0, 600.0
+        side = max(vertices // 4, 2)
+        corners = [(0, min_y), (width, min_y), (width, min_y + height), (0, min_y + height), (0, min_y)]
+        edges = [wavy_line(corners[i], corners[i + 1], side + 1)[:-1] for i in range(4)]
+        outline = np.vstack(edges + [np.array([corners[0]])])
+        polylines.append((panel_name, outline))
+        columns = max(int(math.sqrt(slots_per_panel)), 1)
+        for slot in range(slots_per_panel):
+            x = 20 + (slot % columns) * (width - 40) / columns
+            y = min_y + 20 + (slot // columns) * (height - 40) / math.ceil(slots_per_panel / columns)
+            polylines.append((f"{panel_name}_SLOT5_5", slot_polyline(x, y, width=min(65.0, (width - 40) / columns - 5))))
+        polylines.append((f"{panel_name}_XCUTLINE", [(width / 2, min_y), (width / 2, min_y + height)]))
+        polylines.append((f"{panel_name}_YCUTLINE", [(0, min_y + height / 2), (width, min_y + height / 2)]))
+    write_r12(filepath, polylines)
+
+def measure(function, repeat):
+    """Time ``function`` and then measure its peak traced memory in one extra run
+
+    Every call gets a fresh argument from ``function.setup`` if it has one,
+    so the setup is not timed.
+    """
+    setup = getattr(function, 'setup', None)
+    times = []
+    for _ in range(repeat):
+        argument = setup() if setup else None
+        start = time.perf_counter()
+        function(argument)
+        times.append(time.perf_counter() - start)
+
+    argument = setup() if setup else None
+    tracemalloc.start()
+    try:
+        function(argument)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {
+        'seconds': min(times),
+        'median_seconds': statistics.median(times),
+        'peak_bytes': peak,
+    }
+
+def stage(setup=None):
+    """Mark a benchmark function, optionally with a per-call setup"""
+    def decorate(function):
+        function.setup = setup
+        return function
+    return decorate
+
+def run_benchmarks(panels, vertices, repeat=5, workdir=None, stages=None):
+    """Generate the synthetic files and time every stage
+
+    Returns ``{stage: {'seconds', 'median_seconds', 'peak_bytes'}}``; the
+    best of ``repeat`` runs is reported as ``seconds``.
+    """
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    from PyQt6.QtWidgets import QApplication
+    app = QApplication.instance() or QApplication([])
+
+    # dxf_inspect selects the Qt backend on import, so it needs the application first
+    from cutting_list import CuttingList, CuttingTemplate
+    from dxf_export import write_dxf
+    from dxf_inspect import DXFViewer, PanelScaler
+    from mesh3d import build_box
+    from profile_manager import ProfileManager
+    from simplify import LevelOfDetail
+    from svg_export import write_svg
+    from vector_editor import Container, DrawingArea
+
+    with tempfile.TemporaryDirectory(dir=workdir) as tmp, open(os.devnull, 'w') as devnull:
+        dxf_dir = os.path.join(tmp, 'profiles')
+        os.makedirs(dxf_dir)
+        profile_path = os.path.join(dxf_dir, 'synthetic.dxf')
+        viewer_path = os.path.join(tmp, 'simplefied.dxf')
+        generate_profile(profile_path, panels, vertices)
+        generate_viewer(viewer_path, panels, vertices)
+        export_path = os.path.join(tmp, 'export')
+
+        with contextlib.redirect_stdout(devnull):
+            manager = ProfileManager(use_cache=False, dxf_dir=os.path.join(tmp, 'empty'))
+            manager.load_profile(profile_path)
+        name = 'synthetic'
+        # Scale factors are metres, as for boxes of 0.3 to 1 m; the layout
+        # widens panels there, where larger sizes would fold them over
+        factors = iter(np.linspace(0.3, 0.99, 10000))
+        scaled = manager.scale_to_dimensions(name, 400, 600, 18)
+
+        viewer = types.SimpleNamespace()
+        DXFViewer.load_dxf(viewer, viewer_path)
+        scaler = PanelScaler(viewer.panels)
+        scaler.scale_factors.update(width=1.5, height=1.25, depth=0.8)
+
+        container = Container()
+        container.width, container.height = 1200, 900
+        area = DrawingArea(container)
+        area.resize(800, 600)
+
+        @stage()
+        def load_profile(_):
+            with contextlib.redirect_stdout(devnull):
+                manager.load_profile(profile_path)
+
+        @stage(setup=lambda: next(factors))
+        def scale_profile(factor):
+            # A new factor each time so the result cache never answers
+            manager.scale_profile(name, factor, factor)
+
+        @stage()
+        def scale_panel(_):
+            for panel_name, panel_data in viewer.panels.items():
+                scaler.scale_panel(panel_name, panel_data)
+
+        @stage()
+        def scale_all(_):
+            scaler.scale_all()
+
+        @stage()
+        def load_dxf(_):
+            DXFViewer.load_dxf(viewer, viewer_path)
+
+        @stage()
+        def export_dxf(_):
+            write_dxf(scaled, export_path + '.dxf')
+
+        @stage()
+        def export_svg(_):
+            write_svg(scaled, export_path + '.svg')
+
+        @stage()
+        def mesh(_):
+            build_box(scaled, 18)
+
+        @stage()
+        def simplify(_):
+            LevelOfDetail(scaled).level(8)
+
+        @stage()
+        def cutting_list(_):
+            # Ten thousand orders of random sizes, measured in one pass
+            rng = np.random.default_rng(0)
+            width, height = rng.uniform(300, 1000, (2, 10000))
+            template = CuttingTemplate(manager.get_profile(name), manager.layouts[name])
+            CuttingList().add(np.full(10000, 18.0), name, template, *template.evaluate(width, height))
+
+        @stage(setup=lambda: manager.scale_profile(name, next(factors), 1.0))
+        def paint(profile):
+            # A new profile per paint, as when the dimensions change
+            container.current_profile = profile
+            area.grab()
+
+        benchmarks = {
+            'load_profile': load_profile,
+            'scale_profile': scale_profile,
+            'scale_panel': scale_panel,
+            'scale_all': scale_all,
+            'load_dxf': load_dxf,
+            'export_dxf': export_dxf,
+            'export_svg': export_svg,
+            'mesh': mesh,
+            'simplify': simplify,
+            'cutting_list': cutting_list,
+            'paint': paint,
+        }
+        results = {}
+        for stage_name, function in benchmarks.items():
+            if stages and stage_name not in stages:
+                continue
+            results[stage_name] = measure(function, repeat)
+        area.deleteLater()
+        app.processEvents()
+    return results
+
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """List the stages that got slower or use more memory than the baseline allows
+
+    A stage regresses when its time or peak memory exceeds the baseline by
+    more than ``threshold`` (0.25 = 25 %). Returns ``(stage, metric, baseline,
+    current)`` tuples.
+    """
+    regressions = []
+    for stage_name, result in results.items():
+        reference = baseline.get('results', {}).get(stage_name)
+        if reference is None:
+            continue
+        for metric in ('seconds', 'peak_bytes'):
+            if metric in reference and result[metric] > reference[metric] * (1 + threshold):
+                regressions.append((stage_name, metric, reference[metric], result[metric]))
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark loading, scaling, rendering and export on synthetic DXF files")
+    parser.add_argument('--panels', type=int, default=60, help="Panels in the synthetic profile (default: 60)")
+    parser.add_argument('--vertices', type=int, default=1000, help="Outline vertices per panel (default: 1000)")
+    parser.add_argument('--repeat', type=int, default=5, help="Timed runs per stage; the best is reported")
+    parser.add_argument('--stage', action='append', dest='stages', help="Only run this stage (repeatable)")
+    parser.add_argument('-o', '--output', help="Write the results as JSON to this file")
+    parser.add_argument('--baseline', help="Compare against this JSON baseline and fail on regressions")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD, help="Allowed slowdown as a fraction (default: 0.25)")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.panels, args.vertices, args.repeat, stages=args.stages)
+    report = {
+        'config': {'panels': args.panels, 'vertices': args.vertices, 'repeat': args.repeat},
+        'machine': {'python': platform.python_version(), 'platform': platform.platform(),
+                    'cpus': os.cpu_count()},
+        'results': results,
+    }
+    for stage_name, result in results.items():
+        print(f"{stage_name:14s} {result['seconds'] * 1000:10.2f} ms  "
+              f"(median {result['median_seconds'] * 1000:.2f} ms)  peak {result['peak_bytes'] / 1e6:8.2f} MB")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        if baseline.get('config') != report['config']:
+            print(f"Warning: baseline was recorded with {baseline.get('config')}, not {report['config']}")
+        regressions = compare(results, baseline, args.threshold)
+        for stage_name, metric, before, after in regressions:
+            print(f"REGRESSION {stage_name} {metric}: {before:.6g} -> {after:.6g} ({after / before - 1:+.0%})")
+        if regressions:
+            return 1
+        print(f"No regressions beyond {args.threshold:.0%}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
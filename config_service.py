@@ -0,0 +1,383 @@
+import argparse
+import asyncio
+import io
+import json
+import logging
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qsl, urlsplit
+import numpy as np
+from cutting_list import part_metrics
+from dxf_export import dxf_document
+from instrumentation import add_arguments, configure, count, span
+from lru import LRUCache
+from nesting import parts_from_profile
+from profile_manager import ProfileManager
+from svg_export import SVGWriter
+
+log = logging.getLogger(__name__)
+
+MAX_BODY_BYTES = 1 << 20
+MAX_HEADER_LINES = 100
+
+STATUS_TEXT = {
+    200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+    408: 'Request Timeout', 413: 'Payload Too Large', 500: 'Internal Server Error',
+    501: 'Not Implemented', 503: 'Service Unavailable', 504: 'Gateway Timeout',
+}
+
+class RequestError(Exception):
+    """A request that gets an error response with ``status``"""
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+class LatencyStats:
+    """Latencies of the most recent requests, per endpoint, with percentiles
+
+    Only the last ``window`` samples are kept, so the percentiles follow
+    the current load and memory stays bounded.
+    """
+    def __init__(self, window=4096):
+        self.window = window
+        self.samples = {}
+        self.counts = {}
+
+    def record(self, endpoint, seconds):
+        self.samples.setdefault(endpoint, deque(maxlen=self.window)).append(seconds)
+        self.counts[endpoint] = self.counts.get(endpoint, 0) + 1
+
+    def summary(self):
+        """Get the request count and p50/p90/p99/max latency in ms of every endpoint"""
+        summary = {}
+        for endpoint, samples in self.samples.items():
+            p50, p90, p99 = np.percentile(np.fromiter(samples, dtype=np.float64), [50, 90, 99]) * 1000
+            summary[endpoint] = {
+                'requests': self.counts[endpoint],
+                'p50_ms': round(float(p50), 3),
+                'p90_ms': round(float(p90), 3),
+                'p99_ms': round(float(p99), 3),
+                'max_ms': round(max(samples) * 1000, 3),
+            }
+        return summary
+
+def design_parameters(params):
+    """Get ``(profile, width, height, material)`` from request parameters"""
+    try:
+        profile_name = str(params['profile'])
+        width, height, material = (float(params[field]) for field in ('width', 'height', 'material'))
+    except KeyError as e:
+        raise RequestError(400, f"Missing parameter: {e.args[0]}")
+    except (TypeError, ValueError) as e:
+        raise RequestError(400, f"Invalid parameter: {str(e)}")
+    if not all(np.isfinite(value) and value > 0 for value in (width, height, material)):
+        raise RequestError(400, "Dimensions must be positive numbers")
+    return profile_name, width, height, material
+
+class ConfigService:
+    """HTTP/JSON service answering design requests from profiles kept in memory
+
+    The ProfileManager is loaded once and shared by every request, with its
+    cache of scaled profiles. Scaling and export run on a pool of
+    ``workers`` threads, so the event loop only parses requests and writes
+    responses; the geometry is read-only and safe to share. At most
+    ``max_pending`` requests wait for or run on the pool, further ones are
+    answered 503 at once. A request taking longer than ``timeout`` seconds
+    is answered 504; its work still finishes on the pool and counts
+    against ``max_pending`` until it does.
+
+    Endpoints, with parameters in the query string or a JSON body:
+
+    - ``GET /profiles``: profile names
+    - ``/scale?profile=&width=&height=&material=``: bounds and per-panel
+      size, area, cut length and slot count
+    - ``/preview.svg`` and ``/export.dxf`` with the same parameters
+    - ``GET /stats``: latency percentiles, load and rejections
+    """
+    def __init__(self, manager, workers=None, max_pending=64, timeout=10.0, cache_size=256):
+        self.manager = manager
+        self.workers = workers or os.cpu_count() or 1
+        self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='config-service')
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.responses = LRUCache(max_items=cache_size)
+        self.latency = LatencyStats()
+        self.pending = 0
+        self.stats = {'rejected': 0, 'timeouts': 0, 'errors': 0}
+        self.server = None
+        # Writer and handler task of every open connection
+        self.connections = {}
+        self.routes = {
+            '/profiles': (('GET',), self.list_profiles, False),
+            '/scale': (('GET', 'POST'), self.scale, True),
+            '/preview.svg': (('GET', 'POST'), self.preview_svg, True),
+            '/export.dxf': (('GET', 'POST'), self.export_dxf, True),
+            '/stats': (('GET',), self.service_stats, False),
+        }
+
+    async def start(self, host='127.0.0.1', port=8765):
+        """Start listening; port 0 picks a free port, see ``port``"""
+        self.server = await asyncio.start_server(self.handle_connection, host, port)
+        log.info("Serving %d profiles on http://%s:%d with %d workers",
+                 len(self.manager.list_profiles()), host, self.port, self.workers)
+        return self
+
+    @property
+    def port(self):
+        return self.server.sockets[0].getsockname()[1]
+
+    async def serve_forever(self):
+        async with self.server:
+            await self.server.serve_forever()
+
+    async def close(self):
+        if self.server is not None:
+            self.server.close()
+            # Idle keep-alive connections end once their stream is closed
+            handlers = list(self.connections.values())
+            for writer in list(self.connections):
+                writer.close()
+            await asyncio.gather(*handlers, return_exceptions=True)
+            await self.server.wait_closed()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    async def handle_connection(self, reader, writer):
+        """Answer requests on one keep-alive connection until it closes"""
+        self.connections[writer] = asyncio.current_task()
+        try:
+            while True:
+                try:
+                    request = await asyncio.wait_for(read_request(reader), self.timeout)
+                except asyncio.TimeoutError:
+                    break
+                except RequestError as e:
+                    await send_response(writer, e.status, json_body({'error': str(e)}), keep_alive=False)
+                    break
+                if request is None:
+                    break
+                method, target, headers, body = request
+                status, content_type, payload = await self.dispatch(method, target, body)
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                await send_response(writer, status, payload, content_type, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self.connections.pop(writer, None)
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def dispatch(self, method, target, body):
+        """Route a request and get ``(status, content_type, body)``"""
+        start = time.perf_counter()
+        url = urlsplit(target)
+        endpoint = url.path
+        try:
+            if endpoint not in self.routes:
+                raise RequestError(404, f"Unknown endpoint: {endpoint}")
+            methods, handler, on_pool = self.routes[endpoint]
+            if method not in methods:
+                raise RequestError(405, f"{method} not allowed on {endpoint}")
+            params = dict(parse_qsl(url.query))
+            if body:
+                try:
+                    params.update(json.loads(body))
+                except (ValueError, TypeError, AttributeError):
+                    raise RequestError(400, "Body must be a JSON object")
+            if on_pool:
+                content_type, payload = await self.run(handler, params)
+            else:
+                content_type, payload = handler(params)
+            status = 200
+        except RequestError as e:
+            status, content_type, payload = e.status, 'application/json', json_body({'error': str(e)})
+        except Exception as e:
+            log.exception("Request %s %s failed", method, target)
+            self.stats['errors'] += 1
+            status, content_type, payload = 500, 'application/json', json_body({'error': f"{type(e).__name__}: {str(e)}"})
+        # Rejections are counted in the stats; they would hide the latency of served requests
+        if status != 503:
+            self.latency.record(endpoint if endpoint in self.routes else 'other', time.perf_counter() - start)
+        count('service_requests')
+        return status, content_type, payload
+
+    async def run(self, handler, params):
+        """Run a handler on the worker pool, with backpressure and a timeout"""
+        if self.pending >= self.max_pending:
+            self.stats['rejected'] += 1
+            raise RequestError(503, "Too many requests in progress, retry later")
+        self.pending += 1
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self.executor, handler, params)
+        future.add_done_callback(self._finished)
+        try:
+            # Shielded: a timed out request stops waiting, the work still completes
+            return await asyncio.wait_for(asyncio.shield(future), self.timeout)
+        except asyncio.TimeoutError:
+            self.stats['timeouts'] += 1
+            raise RequestError(504, f"Request took longer than {self.timeout:g}s")
+
+    def _finished(self, future):
+        self.pending -= 1
+
+    def list_profiles(self, params):
+        return 'application/json', json_body({'profiles': sorted(self.manager.list_profiles())})
+
+    def service_stats(self, params):
+        return 'application/json', json_body({
+            'profiles': len(self.manager.list_profiles()),
+            'workers': self.workers,
+            'pending': self.pending,
+            'max_pending': self.max_pending,
+            **self.stats,
+            'response_cache': dict(self.responses.stats),
+            'latency': self.latency.summary(),
+        })
+
+    def scaled(self, params):
+        """Scale the requested design; runs on the pool"""
+        profile_name, width, height, material = design_parameters(params)
+        scaled = self.manager.scale_to_dimensions(profile_name, width, height, material)
+        if scaled is None:
+            raise RequestError(404, f"Unknown profile: {profile_name}")
+        return (profile_name, width, height, material), scaled
+
+    def cached(self, kind, params, render):
+        """Get a rendered response for a design, rendering it on a miss
+
+        Keys include the profile's layout digest, so a reloaded profile is
+        rendered again.
+        """
+        design, scaled = self.scaled(params)
+        layout = self.manager.layouts.get(design[0])
+        key = (kind, layout.digest if layout else None, *design)
+        response = self.responses.get(key)
+        if response is None:
+            with span(kind, 'export', profile=design[0]):
+                response = render(design, scaled)
+            self.responses.put(key, response)
+        return response
+
+    def scale(self, params):
+        return self.cached('scale', params, self.render_scale)
+
+    def preview_svg(self, params):
+        return self.cached('preview.svg', params, self.render_svg)
+
+    def export_dxf(self, params):
+        return self.cached('export.dxf', params, self.render_dxf)
+
+    def render_scale(self, design, scaled):
+        profile_name, width, height, material = design
+        # Measured on the scaled geometry itself; the response is cached per design
+        panels = [{
+            'panel': metrics['panel'],
+            'width': float(metrics['width']),
+            'height': float(metrics['height']),
+            'area': float(metrics['area']),
+            'cut_length': float(metrics['cut_length']),
+            'slots': int(metrics['slots']),
+        } for metrics in part_metrics(parts_from_profile(scaled))]
+        return 'application/json', json_body({
+            'profile': profile_name,
+            'width': width,
+            'height': height,
+            'material': material,
+            'bounds': [float(value) for value in scaled.bounds() or ()],
+            'polylines': scaled.polyline_count,
+            'panels': panels,
+        })
+
+    def render_svg(self, design, scaled):
+        f = io.StringIO()
+        writer = SVGWriter(f, scaled.bounds() or (0.0, 0.0, 0.0, 0.0), margin=5.0)
+        writer.add(scaled)
+        writer.close()
+        return 'image/svg+xml', f.getvalue().encode('utf-8')
+
+    def render_dxf(self, design, scaled):
+        f = io.StringIO()
+        dxf_document(scaled).write(f)
+        return 'application/dxf', f.getvalue().encode('utf-8')
+
+def json_body(data):
+    return json.dumps(data).encode('utf-8')
+
+async def read_request(reader):
+    """Read one HTTP/1.1 request; returns None when the client closed the connection"""
+    request_line = await reader.readline()
+    if not request_line:
+        return None
+    try:
+        method, target, _ = request_line.decode('latin-1').split()
+    except ValueError:
+        raise RequestError(400, "Malformed request line")
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if not line:
+            raise asyncio.IncompleteReadError(line, None)
+        if line in (b'\r\n', b'\n'):
+            break
+        if len(headers) >= MAX_HEADER_LINES:
+            raise RequestError(400, "Too many headers")
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+    if 'chunked' in headers.get('transfer-encoding', '').lower():
+        raise RequestError(501, "Chunked request bodies are not supported")
+    try:
+        length = int(headers.get('content-length', 0))
+    except ValueError:
+        raise RequestError(400, "Invalid Content-Length")
+    if length > MAX_BODY_BYTES:
+        raise RequestError(413, f"Request body over {MAX_BODY_BYTES} bytes")
+    body = await reader.readexactly(length) if length > 0 else b''
+    return method.upper(), target, headers, body
+
+async def send_response(writer, status, body, content_type='application/json', keep_alive=True):
+    head = (f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n")
+    if status == 503:
+        head += "Retry-After: 1\r\n"
+    writer.write(head.encode('latin-1') + b"\r\n" + body)
+    await writer.drain()
+
+async def serve(manager, host, port, **options):
+    service = await ConfigService(manager, **options).start(host, port)
+    try:
+        await service.serve_forever()
+    finally:
+        await service.close()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve design scaling, previews and exports over HTTP")
+    parser.add_argument('--host', default='127.0.0.1', help="Address to listen on (default: 127.0.0.1)")
+    parser.add_argument('--port', type=int, default=8765, help="Port to listen on (default: 8765)")
+    parser.add_argument('-j', '--workers', type=int, default=None, help="Worker threads (default: one per CPU)")
+    parser.add_argument('--max-pending', type=int, default=64, help="Requests queued or running before answering 503 (default: 64)")
+    parser.add_argument('--timeout', type=float, default=10.0, help="Seconds per request before answering 504 (default: 10)")
+    parser.add_argument('--dxf-dir', default=None, help="Profile library directory (default: assets/dxf)")
+    add_arguments(parser)
+    args = parser.parse_args(argv)
+    configure(args.log_level, args.trace)
+
+    # Every profile is parsed up front, so no request pays for it
+    manager = ProfileManager(workers=None, dxf_dir=args.dxf_dir)
+    try:
+        asyncio.run(serve(manager, args.host, args.port, workers=args.workers,
+                          max_pending=args.max_pending, timeout=args.timeout))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,348 @@
+import argparse
+import csv
+import json
+import logging
+import sys
+import time
+import numpy as np
+from geometry import chain_layers, chain_polylines
+from instrumentation import add_arguments, configure, count, span
+from nesting import parts_from_profile
+
+log = logging.getLogger(__name__)
+
+# Orders times loop pieces evaluated per NumPy step
+EVALUATE_CHUNK = 1 << 18
+
+# Panel sizes in the cutting list are grouped to a tenth of a millimetre
+SIZE_DECIMALS = 1
+
+def loop_metrics(loops):
+    """Areas and perimeters of closed loops, in one vectorized shoelace pass"""
+    loops = [np.asarray(loop, dtype=np.float64) for loop in loops]
+    if not loops:
+        return np.zeros(0), np.zeros(0)
+    points = np.concatenate(loops)
+    starts = np.cumsum([0] + [len(loop) for loop in loops[:-1]])
+    # Every vertex's successor, wrapping around within its loop
+    following = np.arange(1, len(points) + 1)
+    following[np.cumsum([len(loop) for loop in loops]) - 1] = starts
+    x, y = points.T
+    cross = x * y[following] - y * x[following]
+    steps = np.hypot(x[following] - x, y[following] - y)
+    return 0.5 * np.abs(np.add.reduceat(cross, starts)), np.add.reduceat(steps, starts)
+
+def chained_loops(polylines, layers=None):
+    """Join polylines into closed loops, see ``geometry.chain_layers``"""
+    chains = chain_polylines(polylines) if layers is None else chain_layers(layers, polylines)
+    return [np.concatenate([polylines[index][::-1] if reverse else polylines[index] for index, reverse in chain])
+            for chain in chains]
+
+def part_metrics(parts):
+    """Area, cut length, slot count and size of already scaled parts
+
+    Works on any parts, e.g. ``parts_from_profile`` of a scaled profile or
+    ``parts_from_panels`` of ``PanelScaler.scale_panel`` results. A part's
+    area is its largest outline loop minus its slots; its cut length is
+    every loop, outline and slot. Returns one dict per part.
+    """
+    rows = []
+    for part in parts:
+        outlines, outline_layers, slots = [], [], []
+        for layer, points in part.geometry.iter_polylines():
+            if 'SLOT' in layer:
+                slots.append(points)
+            else:
+                outlines.append(points)
+                outline_layers.append(layer)
+        outline_areas, outline_lengths = loop_metrics(chained_loops(outlines, outline_layers))
+        slot_areas, slot_lengths = loop_metrics(chained_loops(slots))
+        rows.append({
+            'panel': part.name,
+            'width': part.width,
+            'height': part.height,
+            'area': (outline_areas.max() if len(outline_areas) else 0.0) - slot_areas.sum(),
+            'cut_length': outline_lengths.sum() + slot_lengths.sum(),
+            'slots': len(slot_areas),
+        })
+    return rows
+
+class CuttingTemplate:
+    """A profile's panels as loops of layer pieces, for evaluating many sizes at once
+
+    ``ProfileLayout.scale`` only moves whole layers, by ``(dx, dy)`` for
+    layers that move in X and Y. A panel's outline is its quadrants joined
+    end to end by ``geometry.chain_layers``, whose order depends only on
+    each piece's own shape; scaling moves the pieces but keeps that order.
+    A piece's own length and its share of the shoelace sum then change only
+    by its offset, and the straight edges bridging the gaps between pieces
+    are computed from the moved ends, so the outlines of any number of
+    sizes are measured without building their geometry. Slots stay put and
+    are measured once.
+    """
+    def __init__(self, profile, layout):
+        if layout.error is not None:
+            raise ValueError(f"Cannot scale profile: {str(layout.error)}")
+        self.layout = layout
+        moves = {layer: (layout.moves_x[layer_id], layout.moves_y[layer_id])
+                 for layer_id, layer in enumerate(profile.layers)}
+
+        self.panels = []
+        self.slot_counts = []
+        self.slot_areas = []
+        self.slot_lengths = []
+        slot_bounds = []
+        pieces = []
+        loop_panels = []
+        self.loop_starts = []
+        for part in parts_from_profile(profile):
+            outlines, outline_layers, slots = [], [], []
+            for layer, points in part.geometry.iter_polylines():
+                if 'SLOT' in layer:
+                    slots.append(points)
+                else:
+                    outlines.append(points)
+                    outline_layers.append(layer)
+            chains = chain_layers(outline_layers, outlines)
+            if not chains:
+                log.debug("Panel %s has no outline", part.name)
+                continue
+            panel_index = len(self.panels)
+            self.panels.append(part.name)
+            for chain in chains:
+                self.loop_starts.append(len(pieces))
+                loop_panels.append(panel_index)
+                for index, reverse in chain:
+                    points = outlines[index][::-1] if reverse else outlines[index]
+                    x, y = points.T
+                    pieces.append((
+                        *points[0], *points[-1],
+                        *moves[outline_layers[index]],
+                        # Shoelace terms and length of the piece's own edges
+                        np.dot(x[:-1], y[1:]) - np.dot(y[:-1], x[1:]),
+                        np.hypot(np.diff(x), np.diff(y)).sum(),
+                        x.min(), y.min(), x.max(), y.max(),
+                    ))
+            slot_areas, slot_lengths = loop_metrics(chained_loops(slots))
+            # A slot off the outline still widens the part, as in parts_from_profile
+            if slots:
+                slot_points = np.concatenate(slots)
+                slot_bounds.append((*slot_points.min(axis=0), *slot_points.max(axis=0)))
+            else:
+                slot_bounds.append((np.inf, np.inf, -np.inf, -np.inf))
+            self.slot_counts.append(len(slot_areas))
+            self.slot_areas.append(slot_areas.sum())
+            self.slot_lengths.append(slot_lengths.sum())
+
+        pieces = np.array(pieces, dtype=np.float64).reshape(-1, 12)
+        (self.start_x, self.start_y, self.end_x, self.end_y, self.moves_x, self.moves_y,
+         self.cross, self.length, self.min_x, self.min_y, self.max_x, self.max_y) = pieces.T
+        self.loop_starts = np.array(self.loop_starts, dtype=np.int64)
+        loop_panels = np.array(loop_panels, dtype=np.int64)
+        # The next piece of each loop, wrapping around to its first
+        loop_ends = np.append(self.loop_starts[1:], len(pieces))
+        self.following = np.arange(1, len(pieces) + 1)
+        self.following[loop_ends - 1] = self.loop_starts
+        self.panel_loop_starts = np.flatnonzero(np.diff(loop_panels, prepend=-1))
+        self.panel_piece_starts = self.loop_starts[self.panel_loop_starts]
+        self.slot_counts = np.array(self.slot_counts, dtype=np.int64)
+        self.slot_areas = np.array(self.slot_areas)
+        self.slot_lengths = np.array(self.slot_lengths)
+        self.slot_bounds = np.array(slot_bounds, dtype=np.float64).reshape(-1, 4)
+
+        # The outline is each panel's largest loop on the unscaled profile
+        areas, _ = self.loops(np.zeros(1), np.zeros(1))
+        self.outline_loops = np.array([self.panel_loop_starts[panel] + int(np.argmax(np.abs(panel_areas)))
+                                       for panel, panel_areas in enumerate(np.split(areas[0], self.panel_loop_starts[1:]))],
+                                      dtype=np.int64)
+
+    def loops(self, dx, dy):
+        """Signed areas and lengths of every loop, per pair of offsets"""
+        offset_x = dx[:, np.newaxis] * self.moves_x
+        offset_y = dy[:, np.newaxis] * self.moves_y
+        end_x = self.end_x + offset_x
+        end_y = self.end_y + offset_y
+        next_x = (self.start_x + offset_x)[:, self.following]
+        next_y = (self.start_y + offset_y)[:, self.following]
+        cross = (self.cross
+                 + offset_x * (self.end_y - self.start_y) - offset_y * (self.end_x - self.start_x)
+                 + end_x * next_y - end_y * next_x)
+        length = self.length + np.hypot(next_x - end_x, next_y - end_y)
+        return 0.5 * np.add.reduceat(cross, self.loop_starts, axis=1), np.add.reduceat(length, self.loop_starts, axis=1)
+
+    def evaluate(self, width, height):
+        """Measure every panel at container dimensions in mm, as ``scale_to_dimensions`` scales
+
+        Returns ``(area, cut_length, panel_width, panel_height)`` arrays of
+        shape ``(len(width), len(panels))``.
+        """
+        width = np.asarray(width, dtype=np.float64)
+        height = np.asarray(height, dtype=np.float64)
+        dx = self.layout.x_offset(width / 1000)
+        dy = self.layout.y_offset(height / 1000)
+        results = [[], [], [], []]
+        chunk = max(1, EVALUATE_CHUNK // max(1, len(self.length)))
+        for start in range(0, len(width), chunk):
+            chunk_dx, chunk_dy = dx[start:start + chunk], dy[start:start + chunk]
+            areas, lengths = self.loops(chunk_dx, chunk_dy)
+            offset_x = chunk_dx[:, np.newaxis] * self.moves_x
+            offset_y = chunk_dy[:, np.newaxis] * self.moves_y
+            starts = self.panel_piece_starts
+            min_x, min_y, max_x, max_y = self.slot_bounds.T
+            results[0].append(np.abs(areas[:, self.outline_loops]) - self.slot_areas)
+            results[1].append(np.add.reduceat(lengths, self.panel_loop_starts, axis=1) + self.slot_lengths)
+            results[2].append(np.maximum(np.maximum.reduceat(self.max_x + offset_x, starts, axis=1), max_x)
+                              - np.minimum(np.minimum.reduceat(self.min_x + offset_x, starts, axis=1), min_x))
+            results[3].append(np.maximum(np.maximum.reduceat(self.max_y + offset_y, starts, axis=1), max_y)
+                              - np.minimum(np.minimum.reduceat(self.min_y + offset_y, starts, axis=1), min_y))
+        if not results[0]:
+            empty = np.zeros((0, len(self.panels)))
+            return empty, empty, empty, empty
+        return tuple(np.concatenate(result) for result in results)
+
+class CuttingList:
+    """Panels to cut and material needed for a batch of orders
+
+    ``parts`` has one row per material thickness, profile, panel and size
+    with its quantity; ``materials`` totals each thickness. Areas are in
+    m² and cut lengths in m, taking drawing units as mm; ``stock_area``
+    is the panels' bounding rectangles, what they take from a sheet before
+    nesting.
+    """
+    def __init__(self):
+        self.parts = []
+        self.materials = {}
+        self.orders = 0
+        self.failed = 0
+        self.seconds = 0.0
+
+    def add(self, material, profile_name, template, area, cut_length, panel_width, panel_height):
+        """Add the measured panels of one profile's orders"""
+        material = np.asarray(material, dtype=np.float64)
+        for panel, panel_name in enumerate(template.panels):
+            keys = np.column_stack([material,
+                                    np.round(panel_width[:, panel], SIZE_DECIMALS),
+                                    np.round(panel_height[:, panel], SIZE_DECIMALS)])
+            unique, inverse = np.unique(keys, axis=0, return_inverse=True)
+            inverse = inverse.reshape(-1)
+            quantity = np.bincount(inverse, minlength=len(unique))
+            areas = np.bincount(inverse, area[:, panel], len(unique))
+            lengths = np.bincount(inverse, cut_length[:, panel], len(unique))
+            for row, (row_material, row_width, row_height) in enumerate(unique.tolist()):
+                self.parts.append({
+                    'material': row_material,
+                    'profile': profile_name,
+                    'panel': panel_name,
+                    'width': row_width,
+                    'height': row_height,
+                    'quantity': int(quantity[row]),
+                    'slots': int(template.slot_counts[panel] * quantity[row]),
+                    'area': areas[row] / 1e6,
+                    'cut_length': lengths[row] / 1e3,
+                })
+
+        thicknesses, inverse = np.unique(material, return_inverse=True)
+        inverse = inverse.reshape(-1)
+        order_counts = np.bincount(inverse, minlength=len(thicknesses))
+        totals = [area.sum(axis=1), cut_length.sum(axis=1), (panel_width * panel_height).sum(axis=1)]
+        totals = [np.bincount(inverse, total, len(thicknesses)) for total in totals]
+        for index, thickness in enumerate(thicknesses.tolist()):
+            summary = self.materials.setdefault(thickness, {
+                'material': thickness, 'orders': 0, 'parts': 0, 'slots': 0,
+                'area': 0.0, 'cut_length': 0.0, 'stock_area': 0.0})
+            summary['orders'] += int(order_counts[index])
+            summary['parts'] += int(order_counts[index]) * len(template.panels)
+            summary['slots'] += int(order_counts[index]) * int(template.slot_counts.sum())
+            summary['area'] += totals[0][index] / 1e6
+            summary['cut_length'] += totals[1][index] / 1e3
+            summary['stock_area'] += totals[2][index] / 1e6
+        self.orders += len(material)
+
+    def summary(self):
+        """Get the totals per material thickness, thinnest first"""
+        return [self.materials[thickness] for thickness in sorted(self.materials)]
+
+    def write_csv(self, filepath):
+        """Write the cutting list, one row per panel size and material"""
+        fields = ('material', 'profile', 'panel', 'width', 'height', 'quantity', 'slots', 'area', 'cut_length')
+        with open(filepath, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=fields)
+            writer.writeheader()
+            for row in sorted(self.parts, key=lambda row: (row['material'], row['profile'], row['panel'],
+                                                           row['width'], row['height'])):
+                writer.writerow(row)
+
+    def write_json(self, filepath):
+        """Write the material totals and the cutting list"""
+        with open(filepath, 'w', encoding='utf-8') as f:
+            json.dump({
+                'orders': self.orders,
+                'failed': self.failed,
+                'seconds': self.seconds,
+                'materials': self.summary(),
+                'parts': self.parts,
+            }, f, indent=1)
+
+def cutting_list(manager, orders):
+    """Measure the panels of every order, batched per profile
+
+    ``orders`` are dicts as ``batch_export.read_orders`` yields them. Each
+    profile is parsed once and all its orders are measured in one pass.
+    Orders with errors or unknown profiles are counted as failed.
+    """
+    start = time.perf_counter()
+    result = CuttingList()
+    batches = {}
+    for order in orders:
+        if 'error' in order:
+            log.warning("Order %s skipped: %s", order['id'], order['error'])
+            result.failed += 1
+            continue
+        batches.setdefault(order['profile'], []).append((order['width'], order['height'], order['material']))
+
+    for profile_name, dimensions in batches.items():
+        profile = manager.get_profile(profile_name)
+        try:
+            if profile is None:
+                raise ValueError(f"Unknown profile: {profile_name}")
+            template = CuttingTemplate(profile, manager.layouts[profile_name])
+        except ValueError as e:
+            log.warning("%d orders skipped: %s", len(dimensions), e)
+            result.failed += len(dimensions)
+            continue
+        width, height, material = np.array(dimensions, dtype=np.float64).T
+        with span('cutting_list', 'export', profile=profile_name, orders=len(width)):
+            measured = template.evaluate(width, height)
+            result.add(material, profile_name, template, *measured)
+        count('orders_measured', len(width))
+    result.seconds = time.perf_counter() - start
+    return result
+
+def main(argv=None):
+    from batch_export import read_orders
+    from profile_manager import ProfileManager
+
+    parser = argparse.ArgumentParser(description="Compute the cutting list and material needs of a batch of orders")
+    parser.add_argument('orders', help="CSV or JSONL file with id, profile, width, height, material")
+    parser.add_argument('--csv', default=None, help="Write the cutting list to this CSV file")
+    parser.add_argument('--json', default=None, help="Write the totals and cutting list to this JSON file")
+    parser.add_argument('--dxf-dir', default=None, help="Profile library directory (default: assets/dxf)")
+    add_arguments(parser)
+    args = parser.parse_args(argv)
+    configure(args.log_level, args.trace)
+
+    manager = ProfileManager(lazy=True, dxf_dir=args.dxf_dir)
+    result = cutting_list(manager, read_orders(args.orders))
+    if args.csv:
+        result.write_csv(args.csv)
+    if args.json:
+        result.write_json(args.json)
+    for summary in result.summary():
+        print(f"{summary['material']:g} mm: {summary['orders']} orders, {summary['parts']} panels, "
+              f"{summary['slots']} slots, {summary['area']:.2f} m² net, {summary['stock_area']:.2f} m² stock, "
+              f"{summary['cut_length']:.1f} m cut")
+    print(f"{result.orders} orders measured in {result.seconds:.2f}s, {result.failed} failed")
+    return 1 if result.failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
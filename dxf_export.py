@@ -0,0 +1,167 @@
+import ezdxf
+import hashlib
+import os
+import shutil
+import tempfile
+import time
+import numpy as np
+from instrumentation import traced
+from nesting import parts_from_profile
+
+@traced('export')
+def write_dxf(geometry, filepath, progress=None):
+    """Write every polyline of a geometry to a new DXF file, one LWPOLYLINE each
+
+    ``progress(done, total)`` is called every few hundred polylines; it may
+    raise to abort the export before anything is saved.
+    """
+    dxf_document(geometry, progress).saveas(filepath)
+
+def dxf_document(geometry, progress=None):
+    """Build an ezdxf document with every polyline of a geometry as an LWPOLYLINE"""
+    # Create new DXF document
+    doc = ezdxf.new('R2010')
+    msp = doc.modelspace()
+    total = geometry.polyline_count
+
+    # Add each polyline on its layer
+    for index, (layer, points) in enumerate(geometry.iter_polylines()):
+        if progress is not None and index % 256 == 0:
+            progress(index, total)
+        msp.add_lwpolyline(points.tolist(), dxfattribs={'layer': layer})
+    if progress is not None:
+        progress(total, total)
+    return doc
+
+def dxf_polyline(layer, points):
+    """Get the R12 tags of an open 2D POLYLINE with its VERTEX entities"""
+    vertex = f"  0\nVERTEX\n  8\n{layer}\n 10\n%r\n 20\n%r\n"
+    parts = [f"  0\nPOLYLINE\n  8\n{layer}\n 66\n1\n 10\n0.0\n 20\n0.0\n 30\n0.0\n 70\n0\n"]
+    parts.extend(vertex % (x, y) for x, y in points)
+    parts.append(f"  0\nSEQEND\n  8\n{layer}\n")
+    return ''.join(parts)
+
+def r12_header(layers):
+    """Get the HEADER and TABLES sections of an R12 file using the given layers"""
+    parts = [
+        "  0\nSECTION\n  2\nHEADER\n  9\n$ACADVER\n  1\nAC1009\n  0\nENDSEC\n",
+        "  0\nSECTION\n  2\nTABLES\n",
+        "  0\nTABLE\n  2\nLTYPE\n 70\n1\n"
+        "  0\nLTYPE\n  2\nCONTINUOUS\n 70\n0\n  3\nSolid line\n 72\n65\n 73\n0\n 40\n0.0\n"
+        "  0\nENDTAB\n",
+        f"  0\nTABLE\n  2\nLAYER\n 70\n{len(layers)}\n",
+    ]
+    for layer in sorted(layers):
+        parts.append(f"  0\nLAYER\n  2\n{layer}\n 70\n0\n 62\n7\n  6\nCONTINUOUS\n")
+    parts.append("  0\nENDTAB\n  0\nENDSEC\n")
+    return ''.join(parts)
+
+class CombinedDXFWriter:
+    """Write many scaled designs into one DXF file, sharing identical panels
+
+    Every panel of a design is reduced to its shape at the origin; the first
+    panel with a given shape becomes a BLOCK and each occurrence an INSERT,
+    so a batch full of equal panels stores their vertices once. The file is
+    ASCII R12 (AC1009), which readers handle without handles or object
+    tables. Blocks and inserts are streamed to temporary files as designs
+    are added and joined into the output on ``close``; only the hashes of
+    the blocks stay in memory.
+    """
+    def __init__(self, filepath, precision=6, spacing=50.0):
+        self.filepath = filepath
+        self.precision = precision
+        self.spacing = spacing
+        self.blocks = {}
+        self.layers = {'0'}
+        self.cursor_x = 0.0
+        self.stats = {'designs': 0, 'panels': 0, 'blocks': 0}
+        self._start = time.perf_counter()
+        directory = os.path.dirname(os.path.abspath(filepath))
+        self._blocks_file = tempfile.TemporaryFile('w+', encoding='utf-8', dir=directory)
+        self._entities_file = tempfile.TemporaryFile('w+', encoding='utf-8', dir=directory)
+
+    def add(self, geometry, offset=None):
+        """Add a design's panels, by default to the right of the previous design
+
+        Raises ValueError, before writing anything, if some polyline belongs
+        to no panel, so a design is never written with a cut missing.
+        """
+        bounds = geometry.bounds()
+        if bounds is None:
+            return
+        parts = parts_from_profile(geometry)
+        placed = sum(part.geometry.polyline_count for part in parts)
+        if placed != geometry.polyline_count:
+            raise ValueError(f"{geometry.polyline_count - placed} of {geometry.polyline_count} "
+                             f"polylines belong to no panel")
+        min_x, min_y, max_x, _ = bounds
+        if offset is None:
+            offset = (self.cursor_x - min_x, -min_y)
+        self.cursor_x += max_x - min_x + self.spacing
+
+        for part in parts:
+            block = self._block(part.name, part.geometry, part.bounds)
+            insert_x = float(part.bounds[0] + offset[0])
+            insert_y = float(part.bounds[1] + offset[1])
+            self._entities_file.write(f"  0\nINSERT\n  8\n0\n  2\n{block}\n 10\n{insert_x!r}\n 20\n{insert_y!r}\n 30\n0.0\n")
+            self.stats['panels'] += 1
+        self.stats['designs'] += 1
+
+    def _block(self, panel_name, geometry, bounds):
+        """Get the block holding a panel's shape, defining it on first use"""
+        relative = np.round(geometry.coords - bounds[:2], self.precision) + 0.0
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update('\0'.join(geometry.layers[layer_id] for layer_id in geometry.layer_ids.tolist()).encode('utf-8'))
+        digest.update(geometry.offsets.tobytes())
+        digest.update(relative.tobytes())
+        key = digest.digest()
+        if key in self.blocks:
+            return self.blocks[key]
+
+        name = f"{panel_name}_{len(self.blocks) + 1}"
+        self.blocks[key] = name
+        self.stats['blocks'] += 1
+        self._blocks_file.write(f"  0\nBLOCK\n  8\n0\n  2\n{name}\n 70\n0\n 10\n0.0\n 20\n0.0\n 30\n0.0\n  3\n{name}\n")
+        offsets = geometry.offsets.tolist()
+        points = relative.tolist()
+        for index, layer_id in enumerate(geometry.layer_ids.tolist()):
+            layer = geometry.layers[layer_id]
+            self.layers.add(layer)
+            self._blocks_file.write(dxf_polyline(layer, points[offsets[index]:offsets[index + 1]]))
+        self._blocks_file.write("  0\nENDBLK\n  8\n0\n")
+        return name
+
+    @traced('export')
+    def close(self):
+        """Assemble the output file and return the write statistics"""
+        tmp_path = f"{self.filepath}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(r12_header(self.layers))
+            f.write("  0\nSECTION\n  2\nBLOCKS\n")
+            self._blocks_file.seek(0)
+            shutil.copyfileobj(self._blocks_file, f)
+            f.write("  0\nENDSEC\n  0\nSECTION\n  2\nENTITIES\n")
+            self._entities_file.seek(0)
+            shutil.copyfileobj(self._entities_file, f)
+            f.write("  0\nENDSEC\n  0\nEOF\n")
+        os.replace(tmp_path, self.filepath)
+        self.abort()
+
+        stats = dict(self.stats)
+        stats['bytes'] = os.path.getsize(self.filepath)
+        stats['seconds'] = time.perf_counter() - self._start
+        return stats
+
+    def abort(self):
+        """Drop the temporary files without writing the output"""
+        self._blocks_file.close()
+        self._entities_file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
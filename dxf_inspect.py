@@ -1,86 +1,245 @@
-import ezdxf
+import argparse
+import logging
+import numpy as np
 import matplotlib.pyplot as plt
 import matplotlib.ticker as ticker
 import os
 import sys
 from PyQt6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, 
-                            QHBoxLayout, QLabel, QDoubleSpinBox, QPushButton)
-from PyQt6.QtCore import Qt
+                            QHBoxLayout, QLabel, QDoubleSpinBox, QPushButton,
+                            QFileDialog)
+from PyQt6.QtCore import Qt, QTimer
 import matplotlib
 matplotlib.use('QtAgg')
 from matplotlib.backends.backend_qtagg import FigureCanvasQTAgg as FigureCanvas
 from matplotlib.figure import Figure
+from dxf_stream import read_geometry
+from geometry import Geometry
+from instrumentation import add_arguments, configure, count, span, traced
+from parametric import ParametricModel
+from simplify import LevelOfDetail
+from svg_export import SVGWriter, panels_geometry
+
+log = logging.getLogger(__name__)
+
+PANEL_NAMES = ["LEFTRIGHT", "FRONTBACK", "BOTTOM"]
+
+def panel_layers(panel_name):
+    """Get a panel's outline, slot, X cutline and Y cutline layers"""
+    return [panel_name, f"{panel_name}_SLOT5_5",
+            f"{panel_name}_XCUTLINE", f"{panel_name}_YCUTLINE"]
+
+def read_panels(dxf_path, panel_names=PANEL_NAMES):
+    """Read the panel layers of a DXF file in one streaming pass
+    
+    Returns the packed Geometry and a dict of panels in the
+    ``{'outline', 'slots', 'cutlines'}`` layout, as views into it.
+    """
+    layers = [layer for panel_name in panel_names for layer in panel_layers(panel_name)]
+    with span('read_panels', 'parse', file=dxf_path):
+        geometry = read_geometry(dxf_path, layers, entity_types=('POLYLINE',))
+    count('vertices_parsed', len(geometry.coords))
+    panels = {}
+    for panel_name in panel_names:
+        panels[panel_name] = geometry.panel(panel_name)
+    return geometry, panels
 
 class PanelScaler:
-    def __init__(self, original_panels):
+    DIMENSIONS = ('width', 'height', 'depth')
+
+    def __init__(self, original_panels, reference_dims=(400, 600, 200)):
+        """Prepare the panels for scaling
+        
+        ``reference_dims`` is the (width, height, depth) in mm that the
+        original panels were drawn for. The outline, slots and cutlines of all
+        panels are packed into one Geometry (one layer per panel) so every
+        point can be scaled in a single NumPy operation.
+        """
         self.original_panels = original_panels
+        self.reference_dims = np.asarray(reference_dims, dtype=np.float64)
         self.scale_factors = {
             'width': 1.0,
             'height': 1.0,
             'depth': 1.0
         }
-    
-    def scale_panel(self, panel_name, panel_data):
-        """Scale a panel based on cutlines and new dimensions"""
-        # Get original dimensions
-        original_width = max(x for x, _ in panel_data['outline']) - min(x for x, _ in panel_data['outline'])
-        original_height = max(y for _, y in panel_data['outline']) - min(y for _, y in panel_data['outline'])
         
-        # Calculate new dimensions
+        # Pack every panel with an outline, remembering how to split it again
+        polylines = []
+        self.panel_layout = {}
+        axes = []
+        for panel_name, panel_data in original_panels.items():
+            if not len(panel_data['outline']):
+                continue
+            slots = [slot for slot in panel_data.get('slots', []) if len(slot)]
+            cutlines = [cutline for cutline in panel_data.get('cutlines', []) if len(cutline)]
+            self.panel_layout[panel_name] = (len(polylines), len(slots), len(cutlines))
+            for points in [panel_data['outline']] + slots + cutlines:
+                polylines.append((panel_name, points))
+            axes.append(self.panel_axes(panel_name))
+        self.geometry = Geometry.from_polylines(polylines)
+        
+        # Per-vertex panel index, panel origin (outline minimum) and scale axes
+        self.vertex_panels = self.geometry.layer_ids[self.geometry.vertex_polyline_ids()]
+        self.panel_mins = np.array([
+            np.asarray(original_panels[panel_name]['outline']).min(axis=0)
+            for panel_name in self.geometry.layers
+        ]).reshape(-1, 2)
+        self.panel_axes_index = np.array(axes, dtype=np.intp).reshape(-1, 2)
+        self._relative = self.geometry.coords - self.panel_mins[self.vertex_panels]
+        self._level_of_detail = None
+    
+    @staticmethod
+    def panel_axes(panel_name):
+        """Get which dimensions scale a panel's X and Y, as indices into DIMENSIONS"""
         if 'LEFTRIGHT' in panel_name:
-            new_width = original_width * self.scale_factors['depth']
-            new_height = original_height * self.scale_factors['height']
+            return (2, 1)  # depth, height
         elif 'FRONTBACK' in panel_name:
-            new_width = original_width * self.scale_factors['width']
-            new_height = original_height * self.scale_factors['height']
+            return (0, 1)  # width, height
         else:  # BOTTOM
-            new_width = original_width * self.scale_factors['width']
-            new_height = original_height * self.scale_factors['depth']
-        
-        # Scale the outline
-        min_x = min(x for x, _ in panel_data['outline'])
-        min_y = min(y for _, y in panel_data['outline'])
-        
-        scaled_outline = []
-        for x, y in panel_data['outline']:
-            # Normalize coordinates
-            norm_x = (x - min_x) / original_width
-            norm_y = (y - min_y) / original_height
-            # Scale
-            new_x = min_x + (norm_x * new_width)
-            new_y = min_y + (norm_y * new_height)
-            scaled_outline.append((new_x, new_y))
-        
-        # Scale slots and cutlines
-        scaled_slots = []
-        for slot in panel_data.get('slots', []):
-            scaled_slot = []
-            for x, y in slot:
-                norm_x = (x - min_x) / original_width
-                norm_y = (y - min_y) / original_height
-                new_x = min_x + (norm_x * new_width)
-                new_y = min_y + (norm_y * new_height)
-                scaled_slot.append((new_x, new_y))
-            scaled_slots.append(scaled_slot)
-        
-        scaled_cutlines = []
-        for cutline in panel_data.get('cutlines', []):
-            scaled_cutline = []
-            for x, y in cutline:
-                norm_x = (x - min_x) / original_width
-                norm_y = (y - min_y) / original_height
-                new_x = min_x + (norm_x * new_width)
-                new_y = min_y + (norm_y * new_height)
-                scaled_cutline.append((new_x, new_y))
-            scaled_cutlines.append(scaled_cutline)
+            return (0, 2)  # width, depth
+    
+    def scale_panel(self, panel_name, panel_data):
+        """Scale a panel based on cutlines and new dimensions"""
+        outline = np.asarray(panel_data['outline'], dtype=np.float64)
+        origin = outline.min(axis=0)
+        factors = np.array([self.scale_factors[self.DIMENSIONS[axis]]
+                            for axis in self.panel_axes(panel_name)])
+        
+        def scale(points):
+            # Keep the outline's minimum corner fixed and stretch away from it
+            return origin + (np.asarray(points, dtype=np.float64) - origin) * factors
         
         return {
-            'outline': scaled_outline,
-            'slots': scaled_slots,
-            'cutlines': scaled_cutlines
+            'outline': scale(outline),
+            'slots': [scale(slot) for slot in panel_data.get('slots', [])],
+            'cutlines': [scale(cutline) for cutline in panel_data.get('cutlines', [])]
         }
+    
+    @traced('scale', 'PanelScaler.scale_all')
+    def scale_all(self, tolerance=0.0):
+        """Scale every panel at the current scale factors in one operation
+        
+        With a ``tolerance`` in mm the polylines are simplified to within it,
+        for display; the outlines' bounds stay exact.
+        """
+        factors = np.array([self.scale_factors[name] for name in self.DIMENSIONS])
+        coords = self.scale_coords(factors[np.newaxis])[0]
+        if tolerance <= 0:
+            return self.unpack(coords)
+        
+        # Stretching a panel stretches its simplification error by the same factor
+        return self.unpack(*self.level_of_detail.simplified(tolerance / factors.max(), coords))
+    
+    def scale_panel_to(self, panel_name, factor_x, factor_y, tolerance=0.0):
+        """Scale one panel by the factors of its X and Y axes
+        
+        Returns the panel in the {'outline', 'slots', 'cutlines'} layout and
+        its outline's (min_x, min_y, max_x, max_y); with a ``tolerance`` in mm
+        simplified for display, like scale_all.
+        """
+        first, slot_count, cutline_count = self.panel_layout[panel_name]
+        offsets = self.geometry.offsets[first:first + 2 + slot_count + cutline_count]
+        start, stop = offsets[0], offsets[-1]
+        factors = np.array([factor_x, factor_y])
+        coords = self.panel_mins[self.geometry.layers.index(panel_name)] + self._relative[start:stop] * factors
+        if tolerance > 0:
+            level = self.level_of_detail.level_for(tolerance / factors.max())
+            if level is not None:
+                mask, kept = self.level_of_detail.mask(level)
+                coords = coords[mask[start:stop]]
+                offsets = kept[first:first + 2 + slot_count + cutline_count]
+        offsets = (offsets - offsets[0]).tolist()
+        polylines = [coords[offsets[i]:offsets[i + 1]] for i in range(len(offsets) - 1)]
+        outline = polylines[0]
+        bounds = (*outline.min(axis=0), *outline.max(axis=0))
+        return {
+            'outline': outline,
+            'slots': polylines[1:1 + slot_count],
+            'cutlines': polylines[1 + slot_count:]
+        }, bounds
+    
+    def model(self, width, height, depth, tolerance=0.0, spacing=20):
+        """Build the parametric model of the stacked panel layout DXFViewer draws
+        
+        Node ``{panel_name}`` holds ``(scaled_data, bounds)`` from
+        scale_panel_to and depends only on the two dimensions scaling the
+        panel, plus the display tolerance. Node ``offset:{panel_name}`` is the
+        panel's y offset, which changes only when a panel below it changes
+        height.
+        """
+        model = ParametricModel()
+        for name, value in zip(self.DIMENSIONS, (width, height, depth)):
+            model.add_parameter(name, value)
+        model.add_parameter('tolerance', tolerance)
+        previous = None
+        for panel_name in self.panel_layout:
+            axis_x, axis_y = self.panel_axes(panel_name)
+            reference_x, reference_y = self.reference_dims[axis_x], self.reference_dims[axis_y]
+            
+            def scale(size_x, size_y, tolerance, panel_name=panel_name,
+                      reference_x=reference_x, reference_y=reference_y):
+                return self.scale_panel_to(panel_name, size_x / reference_x, size_y / reference_y, tolerance)
+            
+            model.add_node(panel_name, scale, (self.DIMENSIONS[axis_x], self.DIMENSIONS[axis_y], 'tolerance'))
+            if previous is None:
+                model.add_node(f"offset:{panel_name}", lambda: 0)
+            else:
+                model.add_node(f"offset:{panel_name}",
+                               lambda offset, panel: offset + panel[1][3] - panel[1][1] + spacing,
+                               (f"offset:{previous}", previous))
+            previous = panel_name
+        return model
+    
+    @property
+    def level_of_detail(self):
+        """Douglas-Peucker pyramid of the original panels, built on first use"""
+        if self._level_of_detail is None:
+            self._level_of_detail = LevelOfDetail(self.geometry)
+        return self._level_of_detail
+    
+    def scale_batch(self, targets):
+        """Scale every panel to many (width, height, depth) targets at once
+        
+        Returns a ``(len(targets), N, 2)`` array holding the packed coordinates
+        of each variant; ``unpack`` or ``geometry.with_coords`` turn one row
+        into panels. Memory grows with targets × points, so split very large
+        batches into chunks.
+        """
+        targets = np.asarray(targets, dtype=np.float64).reshape(-1, 3)
+        return self.scale_coords(targets / self.reference_dims)
+    
+    def scale_coords(self, factors):
+        """Apply a batch of (width, height, depth) scale factors to the packed points"""
+        # (T, panels, 2) factors for each panel's X and Y axes
+        panel_factors = factors[:, self.panel_axes_index]
+        # Work in place on the (T, N, 2) result to avoid a second full-size temporary
+        coords = panel_factors[:, self.vertex_panels]
+        coords *= self._relative
+        coords += self.panel_mins[self.vertex_panels]
+        return coords
+    
+    def unpack(self, coords, offsets=None):
+        """Split packed coordinates into the {'outline', 'slots', 'cutlines'} panel layout
+        
+        ``offsets`` gives the polyline offsets of simplified coordinates.
+        """
+        if offsets is None:
+            offsets = self.geometry.offsets
+        polylines = [coords[offsets[i]:offsets[i + 1]] for i in range(self.geometry.polyline_count)]
+        panels = {}
+        for panel_name, (first, slot_count, cutline_count) in self.panel_layout.items():
+            slots_end = first + 1 + slot_count
+            panels[panel_name] = {
+                'outline': polylines[first],
+                'slots': polylines[first + 1:slots_end],
+                'cutlines': polylines[slots_end:slots_end + cutline_count]
+            }
+        return panels
 
 class DXFViewer(QMainWindow):
+    # Largest on-screen deviation of simplified polylines from the panels
+    MAX_ERROR_PIXELS = 0.5
+    
     def __init__(self):
         super().__init__()
         self.setWindowTitle("DXF Panel Scaler")
@@ -125,6 +284,10 @@ class DXFViewer(QMainWindow):
         export_button.clicked.connect(self.export_dxf)
         left_layout.addWidget(export_button)
         
+        export_svg_button = QPushButton("Export SVG")
+        export_svg_button.clicked.connect(self.export_svg)
+        left_layout.addWidget(export_svg_button)
+        
         # Add stretch to push controls to the top
         left_layout.addStretch()
         
@@ -136,76 +299,93 @@ class DXFViewer(QMainWindow):
         self.canvas = FigureCanvas(self.figure)
         layout.addWidget(self.canvas, stretch=3)
         
+        # Live updates move existing artists instead of rebuilding the figure
+        self.live_update = True
+        self.ax = None
+        self.panel_artists = {}
+        self.background = None
+        self.canvas.mpl_connect('draw_event', self.on_draw)
+        
+        # Redraw at most once per frame however fast the spin boxes change
+        self.redraw_timer = QTimer(self)
+        self.redraw_timer.setSingleShot(True)
+        self.redraw_timer.setInterval(16)
+        self.redraw_timer.timeout.connect(self.update_plot)
+        
         # Load DXF file
         self.load_dxf()
         
-        # Initialize panel scaler
+        # Initialize panel scaler and the model of which panels depend on
+        # which dimension
         self.panel_scaler = PanelScaler(self.panels)
+        self.panel_model = self.panel_scaler.model(self.width_spin.value(), self.height_spin.value(),
+                                                   self.depth_spin.value())
         
         # Initial plot
         self.update_plot()
     
-    def load_dxf(self):
+    @traced('load', 'DXFViewer.load_dxf')
+    def load_dxf(self, dxf_path=None):
         # Path to your DXF file
-        dxf_path = "simplefied.dxf"
-        if not os.path.exists(dxf_path):
-            dxf_path = r"c:\Users\samjk\Desktop\simplefied.dxf"
+        if dxf_path is None:
+            dxf_path = "simplefied.dxf"
+            if not os.path.exists(dxf_path):
+                dxf_path = r"c:\Users\samjk\Desktop\simplefied.dxf"
         
         if not os.path.exists(dxf_path):
-            print(f"Error: Could not find DXF file at {dxf_path}")
+            log.error("Could not find DXF file at %s", dxf_path)
             sys.exit(1)
         
-        # Load DXF file
-        doc = ezdxf.readfile(dxf_path)
-        msp = doc.modelspace()
-        
-        # Initialize panels dictionary
-        self.panels = {}
-        
-        # Load panels
-        for panel_name in ["LEFTRIGHT", "FRONTBACK", "BOTTOM"]:
-            panel_data = {'outline': [], 'slots': [], 'cutlines': []}
-            
-            # Get panel outline
-            for entity in msp.query(f'POLYLINE[layer=="{panel_name}"]'):
-                panel_data['outline'] = self.get_polyline_coords(entity)
-            
-            # Get slots
-            slot_layer = f"{panel_name}_SLOT5_5"
-            for entity in msp.query(f'POLYLINE[layer=="{slot_layer}"]'):
-                panel_data['slots'].append(self.get_polyline_coords(entity))
-            
-            # Get cutlines
-            for direction in ['X', 'Y']:
-                cutline_layer = f"{panel_name}_{direction}CUTLINE"
-                for entity in msp.query(f'POLYLINE[layer=="{cutline_layer}"]'):
-                    panel_data['cutlines'].append(self.get_polyline_coords(entity))
-            
-            self.panels[panel_name] = panel_data
-    
-    def get_polyline_coords(self, entity):
-        coords = []
-        if entity.dxftype() == 'POLYLINE':
-            for v in entity.vertices:
-                try:
-                    loc = v.dxf.location
-                    coords.append((loc.x, loc.y))
-                except AttributeError:
-                    pass
-        return coords
+        # Keep the geometry packed and expose each panel as views into it
+        self.geometry, self.panels = read_panels(dxf_path)
     
     def update_scaling(self):
         # Update scale factors
-        self.panel_scaler.scale_factors['width'] = self.width_spin.value() / 400
-        self.panel_scaler.scale_factors['height'] = self.height_spin.value() / 600
-        self.panel_scaler.scale_factors['depth'] = self.depth_spin.value() / 200
+        width, height, depth = self.panel_scaler.reference_dims
+        self.panel_scaler.scale_factors['width'] = self.width_spin.value() / width
+        self.panel_scaler.scale_factors['height'] = self.height_spin.value() / height
+        self.panel_scaler.scale_factors['depth'] = self.depth_spin.value() / depth
         
-        # Update plot
-        self.update_plot()
+        # Coalesce rapid spin box changes into one redraw per frame; restarting
+        # a running timer would hold the redraw back until the changes stop
+        if not self.redraw_timer.isActive():
+            self.redraw_timer.start()
+    
+    def layout_panels(self, tolerance=0.0):
+        """Scale all panels and stack them vertically
+        
+        Yields ``(panel_name, scaled_data, y_offset, bounds)`` per panel, where
+        ``bounds`` is the scaled outline's (min_x, min_y, max_x, max_y). A
+        ``tolerance`` in mm simplifies the polylines for display.
+        """
+        current_y = 0
+        spacing = 20  # mm spacing between panels
+        
+        # Scale all panels at once
+        for panel_name, scaled_data in self.panel_scaler.scale_all(tolerance).items():
+            outline = scaled_data['outline']
+            min_x, min_y = outline.min(axis=0)
+            max_x, max_y = outline.max(axis=0)
+            yield panel_name, scaled_data, current_y, (min_x, min_y, max_x, max_y)
+            
+            # Update Y position for next panel
+            current_y += max_y - min_y + spacing
     
+    @traced('render', 'DXFViewer.update_plot')
     def update_plot(self):
+        """Redraw the panels, only moving existing artists in live-update mode"""
+        if self.live_update and self.panel_artists:
+            self.update_artists()
+        else:
+            self.build_plot()
+    
+    def build_plot(self):
+        """Rebuild the whole figure"""
         self.figure.clear()
         ax = self.figure.add_subplot(111)
+        self.ax = ax
+        self.panel_artists = {}
+        self.background = None
         
         # Plot scaled panels
         panel_colors = {
@@ -214,44 +394,42 @@ class DXFViewer(QMainWindow):
             'BOTTOM': 'teal'
         }
         
-        current_y = 0
-        spacing = 20  # mm spacing between panels
-        
-        for panel_name, panel_data in self.panels.items():
-            # Scale panel
-            scaled_data = self.panel_scaler.scale_panel(panel_name, panel_data)
+        for panel_name, scaled_data, y_offset, bounds in self.layout_panels():
+            color = panel_colors.get(panel_name, 'black')
             
             # Plot outline
-            xs, ys = zip(*scaled_data['outline'])
-            ax.plot(xs, [y + current_y for y in ys], 
-                   color=panel_colors[panel_name], 
-                   label=panel_name)
+            outline = scaled_data['outline']
+            (outline_line,) = ax.plot(outline[:, 0], outline[:, 1] + y_offset,
+                                      color=color, label=panel_name)
             
             # Plot slots
+            slot_lines = []
             for slot in scaled_data['slots']:
-                xs, ys = zip(*slot)
-                ax.plot(xs, [y + current_y for y in ys], 
-                       color='blue', 
-                       linestyle='-')
+                (line,) = ax.plot(slot[:, 0], slot[:, 1] + y_offset,
+                                  color='blue', linestyle='-')
+                slot_lines.append(line)
             
             # Plot cutlines
+            cutline_lines = []
             for cutline in scaled_data['cutlines']:
-                xs, ys = zip(*cutline)
-                ax.plot(xs, [y + current_y for y in ys], 
-                       color='red', 
-                       linestyle='--')
+                (line,) = ax.plot(cutline[:, 0], cutline[:, 1] + y_offset,
+                                  color='red', linestyle='--')
+                cutline_lines.append(line)
             
             # Add dimensions label
-            width = max(xs) - min(xs)
-            height = max(ys) - min(ys)
-            ax.text(min(xs) + width/2, 
-                   current_y + height/2,
-                   f"{panel_name}\n{width:.0f}x{height:.0f}mm",
-                   ha='center', va='center',
-                   color=panel_colors[panel_name])
+            label = ax.text(0, 0, '', ha='center', va='center', color=color)
+            self.set_label(label, panel_name, y_offset, bounds)
             
-            # Update Y position for next panel
-            current_y += height + spacing
+            self.panel_artists[panel_name] = {
+                'outline': outline_line,
+                'slots': slot_lines,
+                'cutlines': cutline_lines,
+                'label': label
+            }
+        
+        # Artists that change with the dimensions are drawn by blitting
+        for artist in self.dynamic_artists():
+            artist.set_animated(self.live_update)
         
         ax.set_aspect('equal')
         ax.grid(True, linestyle=':', linewidth=0.5)
@@ -272,12 +450,145 @@ class DXFViewer(QMainWindow):
         # Update canvas
         self.canvas.draw()
     
+    def update_artists(self):
+        """Move the lines and labels of the panels the dimensions changed"""
+        tolerance = self.display_tolerance()
+        data_bounds = self.set_artist_data(self.update_model(tolerance))
+        
+        # Only re-layout the axes when the panels leave the view or shrink a lot
+        if self.fit_view(*data_bounds) or self.background is None:
+            # Zoomed in, so draw the panels in more detail
+            if self.display_tolerance() < tolerance:
+                self.set_artist_data(self.update_model(self.display_tolerance()))
+            self.canvas.draw_idle()
+            return
+        
+        # Blit: restore the static background and draw only the moving artists
+        self.canvas.restore_region(self.background)
+        for artist in self.dynamic_artists():
+            self.ax.draw_artist(artist)
+        self.canvas.blit(self.ax.bbox)
+    
+    def update_model(self, tolerance=0.0):
+        """Bring the parametric model to the spin box values; returns the changed nodes"""
+        changed = self.panel_model.update(width=self.width_spin.value(), height=self.height_spin.value(),
+                                          depth=self.depth_spin.value(), tolerance=tolerance)
+        log.debug("Dimension change recomputed %s", changed)
+        return changed
+    
+    def set_artist_data(self, changed):
+        """Move the lines and labels of the panels whose model nodes changed
+        
+        Returns the bounds of all panels as laid out.
+        """
+        changed = set(changed)
+        min_x = min_y = float('inf')
+        max_x = max_y = float('-inf')
+        for panel_name, artists in self.panel_artists.items():
+            scaled_data, bounds = self.panel_model[panel_name]
+            y_offset = self.panel_model[f"offset:{panel_name}"]
+            if panel_name in changed or f"offset:{panel_name}" in changed:
+                outline = scaled_data['outline']
+                artists['outline'].set_data(outline[:, 0], outline[:, 1] + y_offset)
+                for line, slot in zip(artists['slots'], scaled_data['slots']):
+                    line.set_data(slot[:, 0], slot[:, 1] + y_offset)
+                for line, cutline in zip(artists['cutlines'], scaled_data['cutlines']):
+                    line.set_data(cutline[:, 0], cutline[:, 1] + y_offset)
+                self.set_label(artists['label'], panel_name, y_offset, bounds)
+            
+            min_x = min(min_x, bounds[0])
+            max_x = max(max_x, bounds[2])
+            min_y = min(min_y, bounds[1] + y_offset)
+            max_y = max(max_y, bounds[3] + y_offset)
+        return min_x, min_y, max_x, max_y
+    
+    def display_tolerance(self):
+        """Get the distance in mm that stays within MAX_ERROR_PIXELS on screen"""
+        if self.ax is None or not self.ax.bbox.width or not self.ax.bbox.height:
+            return 0.0
+        x0, x1 = self.ax.get_xlim()
+        y0, y1 = self.ax.get_ylim()
+        mm_per_pixel = min((x1 - x0) / self.ax.bbox.width, (y1 - y0) / self.ax.bbox.height)
+        return self.MAX_ERROR_PIXELS * mm_per_pixel
+    
+    def fit_view(self, min_x, min_y, max_x, max_y):
+        """Adjust the axis limits if the data no longer fits them well
+        
+        Returns True if the limits changed and a full redraw is needed.
+        """
+        x0, x1 = self.ax.get_xlim()
+        y0, y1 = self.ax.get_ylim()
+        outside = min_x < x0 or max_x > x1 or min_y < y0 or max_y > y1
+        too_small = (max_x - min_x) < 0.5 * (x1 - x0) and (max_y - min_y) < 0.5 * (y1 - y0)
+        if not (outside or too_small):
+            return False
+        
+        pad_x = 0.05 * (max_x - min_x)
+        pad_y = 0.05 * (max_y - min_y)
+        self.ax.set_xlim(min_x - pad_x, max_x + pad_x)
+        self.ax.set_ylim(min_y - pad_y, max_y + pad_y)
+        return True
+    
+    @staticmethod
+    def set_label(label, panel_name, y_offset, bounds):
+        """Place a panel's dimension label at the centre of its outline"""
+        min_x, min_y, max_x, max_y = bounds
+        width = max_x - min_x
+        height = max_y - min_y
+        label.set_position((min_x + width / 2, min_y + y_offset + height / 2))
+        label.set_text(f"{panel_name}\n{width:.0f}x{height:.0f}mm")
+    
+    def dynamic_artists(self):
+        for artists in self.panel_artists.values():
+            yield artists['outline']
+            yield from artists['slots']
+            yield from artists['cutlines']
+            yield artists['label']
+    
+    def on_draw(self, event):
+        """Capture the static background after a full redraw, then draw the moving artists"""
+        if not self.live_update or self.ax is None:
+            return
+        self.background = self.canvas.copy_from_bbox(self.ax.bbox)
+        for artist in self.dynamic_artists():
+            self.ax.draw_artist(artist)
+    
     def export_dxf(self):
         # TODO: Implement DXF export
         pass
+    
+    def export_svg(self):
+        """Export the scaled panels, laid out as plotted, to SVG"""
+        filepath, _ = QFileDialog.getSaveFileName(self, "Export SVG", "", "SVG Files (*.svg)")
+        if filepath:
+            try:
+                self.write_svg(filepath)
+            except Exception as e:
+                log.exception("Failed to export SVG: %s", e)
+    
+    @traced('export', 'DXFViewer.write_svg')
+    def write_svg(self, filepath, precision=3):
+        """Write the current layout to an SVG file, one panel at a time"""
+        layout = list(self.layout_panels())
+        if not layout:
+            return
+        min_x = min(bounds[0] for _, _, _, bounds in layout)
+        min_y = min(bounds[1] + y_offset for _, _, y_offset, bounds in layout)
+        max_x = max(bounds[2] for _, _, _, bounds in layout)
+        max_y = max(bounds[3] + y_offset for _, _, y_offset, bounds in layout)
+        with open(filepath, 'w', encoding='utf-8') as f:
+            writer = SVGWriter(f, (min_x, min_y, max_x, max_y), precision, margin=5.0)
+            for panel_name, scaled_data, y_offset, _ in layout:
+                writer.add(panels_geometry({panel_name: scaled_data}), (0.0, y_offset))
+            writer.close()
 
 def main():
-    app = QApplication(sys.argv)
+    parser = argparse.ArgumentParser(description="DXF Panel Scaler")
+    add_arguments(parser)
+    args, qt_args = parser.parse_known_args()
+    configure(args.log_level, args.trace)
+    
+    app = QApplication(sys.argv[:1] + qt_args)
     window = DXFViewer()
     window.show()
     sys.exit(app.exec())
@@ -0,0 +1,186 @@
+import sys
+import time
+import numpy as np
+from geometry import Geometry
+
+POLYLINE_TYPES = ('LWPOLYLINE', 'POLYLINE')
+
+class DXFStreamError(ValueError):
+    """Raised when a file cannot be read as an ASCII DXF tag stream"""
+
+def iter_tags(f):
+    """Iterate over the (group code, value) pairs of an ASCII DXF file
+
+    Both are returned as stripped bytes; callers convert only the values
+    they need.
+    """
+    for code in f:
+        value = f.readline()
+        if not value:
+            raise DXFStreamError("Unexpected end of file")
+        yield code.strip(), value.strip()
+
+def decode(value):
+    """Decode a DXF string value; files before R2007 use a code page, not UTF-8"""
+    try:
+        return value.decode('utf-8')
+    except UnicodeDecodeError:
+        return value.decode('cp1252', errors='replace')
+
+def read_polylines(filepath, layers=None, entity_types=POLYLINE_TYPES):
+    """Yield ``(layer, entity_type, points)`` for modelspace polylines
+
+    Makes one pass over the tag stream of the ENTITIES section and never
+    builds a document: only the polyline being read is held in memory.
+    ``points`` is an ``(N, 2)`` array of the vertex X/Y coordinates, the same
+    points ezdxf's ``LWPOLYLINE.get_points()`` and ``POLYLINE.points()``
+    give. Polylines not on one of ``layers`` (if given) are skipped without
+    collecting their vertices.
+    """
+    wanted_types = {entity_type.encode('ascii') for entity_type in entity_types}
+    wanted_layers = None if layers is None else set(layers)
+
+    with open(filepath, 'rb') as f:
+        if f.read(18) == b'AutoCAD Binary DXF':
+            raise DXFStreamError(f"{filepath} is a binary DXF file")
+        f.seek(0)
+
+        tags = iter_tags(f)
+        in_entities = False
+        expect_section_name = False
+        entity = None  # entity type of the polyline being read, or None
+        layer = None
+        paperspace = False
+        in_vertex = False
+        coords = []
+        seen_section = False
+
+        try:
+            for code, value in tags:
+                if code != b'0':
+                    if expect_section_name:
+                        expect_section_name = False
+                        in_entities = code == b'2' and value == b'ENTITIES'
+                    elif entity is None:
+                        continue
+                    elif code == b'10' or code == b'20':
+                        # POLYLINE headers carry a dummy point; only VERTEX locations count
+                        if entity == b'LWPOLYLINE' or (in_vertex and entity == b'POLYLINE'):
+                            coords.append(float(value))
+                    elif code == b'8' and not in_vertex and layer is None:
+                        layer = decode(value)
+                        if wanted_layers is not None and layer not in wanted_layers:
+                            entity = b'SKIP' if entity == b'POLYLINE' else None
+                    elif code == b'67' and not in_vertex:
+                        paperspace = value == b'1'
+                    continue
+
+                # A new entity starts; VERTEX and SEQEND continue a POLYLINE
+                if entity in (b'POLYLINE', b'SKIP'):
+                    if value == b'VERTEX':
+                        in_vertex = True
+                        continue
+                    if value == b'SEQEND':
+                        if entity == b'POLYLINE' and not paperspace and coords:
+                            yield layer, 'POLYLINE', np.array(coords).reshape(-1, 2)
+                        entity = None
+                        continue
+                elif entity == b'LWPOLYLINE':
+                    if not paperspace and coords:
+                        yield layer, 'LWPOLYLINE', np.array(coords).reshape(-1, 2)
+
+                entity = None
+                layer = None
+                paperspace = False
+                in_vertex = False
+                coords = []
+                if value == b'SECTION':
+                    expect_section_name = True
+                    seen_section = True
+                elif value == b'ENDSEC':
+                    in_entities = False
+                elif value == b'EOF':
+                    return
+                elif in_entities and value in wanted_types:
+                    entity = value
+        except ValueError as e:
+            if isinstance(e, DXFStreamError):
+                raise
+            raise DXFStreamError(f"Invalid DXF structure in {filepath}: {str(e)}") from e
+
+        if not seen_section:
+            raise DXFStreamError(f"{filepath} is not a DXF file")
+        if in_entities:
+            # Truncated, e.g. still being saved; ezdxf rejects it as well
+            raise DXFStreamError(f"{filepath} ends inside the ENTITIES section")
+
+def read_geometry(filepath, layers=None, entity_types=POLYLINE_TYPES):
+    """Read the polylines of a DXF file straight into a Geometry"""
+    polylines = ((layer, points) for layer, _, points in read_polylines(filepath, layers, entity_types))
+    return Geometry.from_polylines(polylines)
+
+def read_geometry_ezdxf(filepath, layers=None, entity_types=POLYLINE_TYPES):
+    """Read the same polylines as read_geometry through a full ezdxf document"""
+    import ezdxf
+    doc = ezdxf.readfile(filepath)
+    polylines = []
+    for entity in doc.modelspace():
+        entity_type = entity.dxftype()
+        if entity_type not in entity_types:
+            continue
+        if layers is not None and entity.dxf.layer not in layers:
+            continue
+        if entity_type == 'LWPOLYLINE':
+            points = [(point[0], point[1]) for point in entity.get_points()]
+        else:  # POLYLINE
+            points = [(vertex[0], vertex[1]) for vertex in entity.points()]
+        polylines.append((entity.dxf.layer, points))
+    return Geometry.from_polylines(polylines)
+
+def benchmark(filepath, repeat=3, memory=False):
+    """Time the streaming reader against ezdxf.readfile on one file
+
+    With ``memory`` the peak traced allocation of each reader is measured
+    as well, in a separate run since tracing slows ezdxf down considerably.
+    """
+    import ezdxf
+    results = {'file': filepath}
+    readers = {
+        'stream': lambda: read_geometry(filepath),
+        'ezdxf': lambda: ezdxf.readfile(filepath),
+    }
+    for name, reader in readers.items():
+        best = float('inf')
+        for _ in range(repeat):
+            start = time.perf_counter()
+            reader()
+            best = min(best, time.perf_counter() - start)
+        results[f'{name}_seconds'] = best
+        if memory:
+            import tracemalloc
+            tracemalloc.start()
+            reader()
+            results[f'{name}_peak_bytes'] = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+    return results
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description="Benchmark the streaming DXF reader against ezdxf.readfile")
+    parser.add_argument('files', nargs='+', help="DXF files to read")
+    parser.add_argument('--repeat', type=int, default=3, help="Runs per reader; the best time is reported")
+    parser.add_argument('--memory', action='store_true', help="Also measure peak memory (slow)")
+    args = parser.parse_args(argv)
+
+    for filepath in args.files:
+        result = benchmark(filepath, args.repeat, args.memory)
+        line = (f"{filepath}: stream {result['stream_seconds']:.3f}s, "
+                f"ezdxf.readfile {result['ezdxf_seconds']:.3f}s "
+                f"({result['ezdxf_seconds'] / result['stream_seconds']:.1f}x)")
+        if args.memory:
+            line += (f", peak {result['stream_peak_bytes'] / 1e6:.1f} MB vs "
+                     f"{result['ezdxf_peak_bytes'] / 1e6:.1f} MB")
+        print(line)
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,372 @@
+import argparse
+import json
+import logging
+import re
+import sys
+import time
+import numpy as np
+from geometry import chain_layers, chain_polylines
+from instrumentation import add_arguments, configure, count, span
+
+log = logging.getLogger(__name__)
+
+# Slot layers may carry their nominal width, e.g. FRONTBACK_SLOT5_5 for 5.5 mm
+SLOT_WIDTH = re.compile(r'SLOT(\d+)_(\d+)')
+
+# Material to keep between a slot and its panel's edge, in mm
+DEFAULT_CLEARANCE = 2.0
+# How much wider than the material a slot may be, in mm
+DEFAULT_PLAY = 0.5
+
+# Orders times slot vertices times outline edges tested per NumPy step
+CHECK_CHUNK = 1 << 16
+
+PROBLEMS = ('no_panel', 'outside', 'clearance', 'too_narrow', 'too_loose')
+
+def nominal_slot_width(layer):
+    """Get the slot width a layer name states, e.g. 5.5 for ``*_SLOT5_5``, or None"""
+    match = SLOT_WIDTH.search(layer)
+    return float(f"{match.group(1)}.{match.group(2)}") if match else None
+
+class GridIndex:
+    """Uniform grid over bounding boxes, to find the boxes that may hold points
+
+    Every box is registered in each cell it overlaps; a query looks up the
+    cell of each point, so the cost does not grow with the number of boxes
+    far away. Built and queried with NumPy, without a loop per box.
+    """
+    def __init__(self, boxes, cell_size=None):
+        self.boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+        if not len(self.boxes):
+            self.cell_size = 1.0
+            self.origin = np.zeros(2)
+            self.columns = 1
+            self.keys = np.zeros(0, dtype=np.int64)
+            self.box_ids = np.zeros(0, dtype=np.int64)
+            return
+        if cell_size is None:
+            # About the size of an average box
+            cell_size = float(np.mean(np.maximum(self.boxes[:, 2:] - self.boxes[:, :2], 0).max(axis=1))) or 1.0
+        self.cell_size = cell_size
+        self.origin = self.boxes[:, :2].min(axis=0)
+        low = np.floor((self.boxes[:, :2] - self.origin) / cell_size).astype(np.int64)
+        high = np.floor((self.boxes[:, 2:] - self.origin) / cell_size).astype(np.int64)
+        self.columns = int(high[:, 0].max()) + 1
+        spans = high - low + 1
+
+        # One (cell, box) pair per overlapped cell, sorted by cell
+        cells_per_box = spans[:, 0] * spans[:, 1]
+        box_ids = np.repeat(np.arange(len(self.boxes)), cells_per_box)
+        within = np.arange(len(box_ids)) - np.repeat(np.cumsum(cells_per_box) - cells_per_box, cells_per_box)
+        column = low[box_ids, 0] + within % spans[box_ids, 0]
+        row = low[box_ids, 1] + within // spans[box_ids, 0]
+        keys = row * self.columns + column
+        order = np.argsort(keys, kind='stable')
+        self.keys = keys[order]
+        self.box_ids = box_ids[order]
+
+    def query(self, points):
+        """Get ``(point_ids, box_ids)`` pairs of points and the boxes containing them"""
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        cell = np.floor((points - self.origin) / self.cell_size).astype(np.int64)
+        valid = (cell[:, 0] >= 0) & (cell[:, 0] < self.columns) & (cell[:, 1] >= 0)
+        keys = np.where(valid, cell[:, 1] * self.columns + cell[:, 0], -1)
+        first = np.searchsorted(self.keys, keys, side='left')
+        last = np.searchsorted(self.keys, keys, side='right')
+        hits = np.where(valid, last - first, 0)
+        point_ids = np.repeat(np.arange(len(points)), hits)
+        position = np.arange(len(point_ids)) - np.repeat(np.cumsum(hits) - hits, hits) + np.repeat(first, hits)
+        box_ids = self.box_ids[position]
+        # Cells are coarser than boxes; keep the pairs whose box holds the point
+        x, y = points[point_ids].T
+        box = self.boxes[box_ids]
+        inside = (box[:, 0] <= x) & (x <= box[:, 2]) & (box[:, 1] <= y) & (y <= box[:, 3])
+        return point_ids[inside], box_ids[inside]
+
+def crossings_and_distances(points, starts, ends):
+    """Even-odd inside test and distance to the nearest edge, batched
+
+    ``points`` is ``(N, V, 2)``, ``starts`` and ``ends`` the edges as
+    ``(N, E, 2)``. Returns ``(inside, distance)``, each ``(N, V)``.
+    """
+    x, y = points[..., np.newaxis, 0], points[..., np.newaxis, 1]
+    x0, y0 = starts[:, np.newaxis, :, 0], starts[:, np.newaxis, :, 1]
+    dx = (ends[..., 0] - starts[..., 0])[:, np.newaxis, :]
+    dy = (ends[..., 1] - starts[..., 1])[:, np.newaxis, :]
+    relative_x = x - x0
+    relative_y = y - y0
+
+    # An edge spanning the point's y crosses the ray to its right when the
+    # point lies on the edge's left, seen in the edge's upward direction
+    crosses = (relative_y < 0) != (relative_y < dy)
+    left = dx * relative_y - relative_x * dy
+    inside = (crosses & ((left > 0) == (dy > 0))).sum(axis=-1) % 2 == 1
+
+    length2 = dx * dx + dy * dy
+    t = (relative_x * dx + relative_y * dy) / np.where(length2 > 0, length2, 1.0)
+    np.clip(t, 0.0, 1.0, out=t)
+    relative_x -= t * dx
+    relative_y -= t * dy
+    distance = np.sqrt((relative_x * relative_x + relative_y * relative_y).min(axis=-1))
+    return inside, distance
+
+class FitTemplate:
+    """A profile's slots assigned to their panels, for checking many sizes at once
+
+    Panels are the non-slot layers grouped by the name before their last
+    ``_``, joined into an outline in the order found on the given profile,
+    like ``cutting_list.CuttingTemplate``. Slot polylines are joined into
+    loops and assigned to the panel whose outline holds their centre,
+    looked up through a ``GridIndex`` of the panel bounds. ``layout`` is
+    the profile's ProfileLayout; without one the geometry is checked as it
+    is, e.g. an already scaled profile or ``PanelScaler`` panels.
+    """
+    def __init__(self, profile, layout=None):
+        if layout is not None and layout.error is not None:
+            raise ValueError(f"Cannot scale profile: {str(layout.error)}")
+        self.layout = layout
+        layer_moves = {}
+        for layer_id, layer in enumerate(profile.layers):
+            if layout is None:
+                layer_moves[layer] = (False, False)
+            else:
+                layer_moves[layer] = (bool(layout.moves_x[layer_id]), bool(layout.moves_y[layer_id]))
+
+        groups = {}
+        slot_polylines = []
+        for layer, points in profile.iter_polylines():
+            if 'SLOT' in layer:
+                slot_polylines.append((layer, points))
+            else:
+                groups.setdefault(layer.rsplit('_', 1)[0], []).append((layer, points))
+
+        # Each panel's outline: its largest loop, with the moves of every vertex's layer
+        self.panels = []
+        self.outlines = []
+        self.outline_moves = []
+        for panel_name, polylines in groups.items():
+            points = [points for _, points in polylines]
+            best = None
+            for chain in chain_layers([layer for layer, _ in polylines], points):
+                loop = np.concatenate([points[index][::-1] if reverse else points[index] for index, reverse in chain])
+                moves = np.concatenate([np.tile(layer_moves[polylines[index][0]], (len(points[index]), 1))
+                                        for index, _ in chain])
+                area = abs(np.dot(loop[:, 0], np.roll(loop[:, 1], -1)) - np.dot(loop[:, 1], np.roll(loop[:, 0], -1)))
+                if len(loop) >= 3 and (best is None or area > best[0]):
+                    best = (area, loop, moves)
+            if best is None:
+                log.debug("Panel %s has no outline", panel_name)
+                continue
+            self.panels.append(panel_name)
+            self.outlines.append(best[1])
+            self.outline_moves.append(best[2])
+
+        # Slot loops, measured once; slots are rigid
+        self.slots = []
+        points = [points for _, points in slot_polylines]
+        for chain in chain_polylines(points):
+            loop = np.concatenate([points[index][::-1] if reverse else points[index] for index, reverse in chain])
+            layers = [slot_polylines[index][0] for index, _ in chain]
+            moves = np.concatenate([np.tile(layer_moves[layers[position]], (len(points[index]), 1))
+                                    for position, (index, _) in enumerate(chain)])
+            nominal = [width for width in map(nominal_slot_width, layers) if width is not None]
+            size = loop.max(axis=0) - loop.min(axis=0)
+            self.slots.append({
+                'layers': layers,
+                'points': loop,
+                'moves': moves,
+                # To the micrometre, so a 9.8 mm slot is not narrower than 9.8 mm material
+                'width': round(float(size.min()), 6),
+                'nominal_width': nominal[0] if nominal else None,
+            })
+
+        # Assign every slot to the panel holding its centre
+        self.slot_panels = np.full(len(self.slots), -1, dtype=np.int64)
+        if self.slots and self.panels:
+            index = GridIndex([(*outline.min(axis=0), *outline.max(axis=0)) for outline in self.outlines])
+            centres = np.array([(slot['points'].min(axis=0) + slot['points'].max(axis=0)) / 2 for slot in self.slots])
+            slot_ids, panel_ids = index.query(centres)
+            for slot_id, panel_id in zip(slot_ids.tolist(), panel_ids.tolist()):
+                if self.slot_panels[slot_id] >= 0:
+                    continue
+                outline = self.outlines[panel_id]
+                inside, _ = crossings_and_distances(centres[np.newaxis, [slot_id]], outline[np.newaxis],
+                                                    np.roll(outline, -1, axis=0)[np.newaxis])
+                if inside[0, 0]:
+                    self.slot_panels[slot_id] = panel_id
+        self.slot_widths = np.array([slot['width'] for slot in self.slots])
+
+    def offsets(self, width, height):
+        """Get the (dx, dy) of moving layers for container dimensions in mm"""
+        if self.layout is None:
+            return np.zeros(len(width)), np.zeros(len(width))
+        return self.layout.x_offset(width / 1000), self.layout.y_offset(height / 1000)
+
+    def check(self, width, height, material_thickness, clearance=DEFAULT_CLEARANCE, play=DEFAULT_PLAY):
+        """Check every slot at many container dimensions at once
+
+        Returns a FitResult for ``len(width)`` designs. Without a layout,
+        ``width`` and ``height`` only set the number of designs.
+        """
+        width = np.atleast_1d(np.asarray(width, dtype=np.float64))
+        height = np.broadcast_to(np.asarray(height, dtype=np.float64), width.shape)
+        thickness = np.broadcast_to(np.asarray(material_thickness, dtype=np.float64), width.shape)
+        dx, dy = self.offsets(width, height)
+        count_designs = len(width)
+        inside = np.ones((count_designs, len(self.slots)), dtype=bool)
+        distance = np.full((count_designs, len(self.slots)), np.inf)
+
+        for panel_id, (outline, moves) in enumerate(zip(self.outlines, self.outline_moves)):
+            slot_ids = np.flatnonzero(self.slot_panels == panel_id)
+            if not len(slot_ids):
+                continue
+            slot_points = np.concatenate([self.slots[slot_id]['points'] for slot_id in slot_ids])
+            slot_moves = np.concatenate([self.slots[slot_id]['moves'] for slot_id in slot_ids])
+            owner = np.repeat(np.arange(len(slot_ids)), [len(self.slots[slot_id]['points']) for slot_id in slot_ids])
+            starts_of = np.flatnonzero(np.diff(owner, prepend=-1))
+            chunk = max(1, CHECK_CHUNK // (len(slot_points) * len(outline)))
+            for start in range(0, count_designs, chunk):
+                shift = np.stack([dx[start:start + chunk], dy[start:start + chunk]], axis=-1)[:, np.newaxis, :]
+                polygon = outline + shift * moves
+                points = slot_points + shift * slot_moves
+                vertex_inside, vertex_distance = crossings_and_distances(
+                    points, polygon, np.roll(polygon, -1, axis=1))
+                inside[start:start + chunk, slot_ids] = np.logical_and.reduceat(vertex_inside, starts_of, axis=1)
+                distance[start:start + chunk, slot_ids] = np.minimum.reduceat(vertex_distance, starts_of, axis=1)
+
+        assigned = self.slot_panels >= 0
+        problems = {
+            'no_panel': np.broadcast_to(~assigned, inside.shape),
+            'outside': assigned & ~inside,
+            'clearance': assigned & inside & (distance < clearance),
+            'too_narrow': self.slot_widths < thickness[:, np.newaxis],
+            'too_loose': self.slot_widths > thickness[:, np.newaxis] + play,
+        }
+        count('slots_checked', inside.size)
+        return FitResult(self, problems, distance)
+
+class FitResult:
+    """Slot problems of a batch of designs
+
+    ``problems[name]`` is a ``(designs, slots)`` boolean array for each of
+    ``PROBLEMS``; ``clearance`` holds each slot's distance to its panel's
+    edge. ``ok`` tells which designs have no problem at all.
+    """
+    def __init__(self, template, problems, clearance):
+        self.template = template
+        self.problems = problems
+        self.clearance = clearance
+        failed = np.zeros(clearance.shape, dtype=bool)
+        for flags in problems.values():
+            failed |= flags
+        self.ok = ~failed.any(axis=1)
+
+    def issues(self, design=0):
+        """List the problems of one design as dicts"""
+        template = self.template
+        issues = []
+        for problem in PROBLEMS:
+            for slot_id in np.flatnonzero(self.problems[problem][design]).tolist():
+                panel_id = template.slot_panels[slot_id]
+                slot = template.slots[slot_id]
+                issue = {
+                    'problem': problem,
+                    'panel': template.panels[panel_id] if panel_id >= 0 else None,
+                    'layers': slot['layers'],
+                    'slot_width': slot['width'],
+                }
+                if problem in ('outside', 'clearance'):
+                    issue['clearance'] = float(self.clearance[design, slot_id])
+                if slot['nominal_width'] is not None:
+                    issue['nominal_width'] = slot['nominal_width']
+                issues.append(issue)
+        return issues
+
+    def counts(self):
+        """Count the designs with each problem"""
+        return {problem: int(self.problems[problem].any(axis=1).sum()) for problem in PROBLEMS}
+
+def format_issues(issues):
+    """Describe problems in one line"""
+    texts = []
+    for issue in issues:
+        slot = '+'.join(issue['layers'])
+        where = f"{slot} of {issue['panel']}" if issue['panel'] else slot
+        if issue['problem'] == 'no_panel':
+            texts.append(f"{where} lies in no panel")
+        elif issue['problem'] == 'outside':
+            texts.append(f"{where} sticks out of its panel")
+        elif issue['problem'] == 'clearance':
+            texts.append(f"{where} is {issue['clearance']:.1f} mm from the edge")
+        elif issue['problem'] == 'too_narrow':
+            texts.append(f"{where} is {issue['slot_width']:.1f} mm, narrower than the material")
+        else:
+            texts.append(f"{where} is {issue['slot_width']:.1f} mm, too loose for the material")
+    return '; '.join(texts)
+
+def validate_orders(manager, orders, clearance=DEFAULT_CLEARANCE, play=DEFAULT_PLAY):
+    """Check the slots of every order, batched per profile
+
+    Yields ``(order_id, issues)`` for the orders with problems and
+    ``(order_id, error)`` strings for orders that cannot be checked.
+    """
+    batches = {}
+    for order in orders:
+        if 'error' in order:
+            yield order['id'], order['error']
+            continue
+        batches.setdefault(order['profile'], []).append(order)
+
+    for profile_name, batch in batches.items():
+        profile = manager.get_profile(profile_name)
+        try:
+            if profile is None:
+                raise ValueError(f"Unknown profile: {profile_name}")
+            template = FitTemplate(profile, manager.layouts[profile_name])
+        except ValueError as e:
+            for order in batch:
+                yield order['id'], str(e)
+            continue
+        width, height, material = np.array([(order['width'], order['height'], order['material'])
+                                            for order in batch], dtype=np.float64).T
+        with span('fit_validation', 'export', profile=profile_name, orders=len(batch)):
+            result = template.check(width, height, material, clearance, play)
+        for design in np.flatnonzero(~result.ok).tolist():
+            yield batch[design]['id'], result.issues(design)
+
+def main(argv=None):
+    from batch_export import read_orders
+    from profile_manager import ProfileManager
+
+    parser = argparse.ArgumentParser(description="Check that every order's slots fit their panels and the material")
+    parser.add_argument('orders', help="CSV or JSONL file with id, profile, width, height, material")
+    parser.add_argument('--clearance', type=float, default=DEFAULT_CLEARANCE, help=f"Least material between a slot and its panel's edge in mm (default: {DEFAULT_CLEARANCE:g})")
+    parser.add_argument('--play', type=float, default=DEFAULT_PLAY, help=f"How much wider than the material a slot may be in mm (default: {DEFAULT_PLAY:g})")
+    parser.add_argument('-o', '--output', default=None, help="Write the problems as JSON lines to this file")
+    parser.add_argument('--dxf-dir', default=None, help="Profile library directory (default: assets/dxf)")
+    add_arguments(parser)
+    args = parser.parse_args(argv)
+    configure(args.log_level, args.trace)
+
+    start = time.perf_counter()
+    manager = ProfileManager(lazy=True, dxf_dir=args.dxf_dir)
+    failed = 0
+    out = open(args.output, 'w', encoding='utf-8') if args.output else None
+    try:
+        for order_id, issues in validate_orders(manager, read_orders(args.orders), args.clearance, args.play):
+            failed += 1
+            if out is not None:
+                key = 'error' if isinstance(issues, str) else 'issues'
+                out.write(json.dumps({'id': order_id, key: issues}) + '\n')
+            elif isinstance(issues, str):
+                print(f"{order_id}: {issues}")
+            else:
+                print(f"{order_id}: {format_issues(issues)}")
+    finally:
+        if out is not None:
+            out.close()
+    print(f"{failed} orders with problems, checked in {time.perf_counter() - start:.2f}s")
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,221 @@
+from collections.abc import Mapping
+import numpy as np
+
+class Geometry(Mapping):
+    """Layered polylines packed into contiguous NumPy arrays
+
+    All vertices live in one ``(N, 2)`` float64 array ``coords``. Polyline
+    ``i`` spans ``coords[offsets[i]:offsets[i + 1]]`` and sits on layer
+    ``layers[layer_ids[i]]``. A layer may hold any number of polylines.
+
+    The arrays are read-only, so a Geometry can be shared freely between
+    callers and threads. As a mapping it behaves like the older
+    ``{layer: points}`` profile dicts: ``geometry[layer]`` is a ``(K, 2)``
+    view of the layer's last polyline. Use ``polylines(layer)`` or
+    ``iter_polylines()`` to see every polyline.
+    """
+    def __init__(self, coords, offsets, layer_ids, layers):
+        self.coords = _readonly(np.ascontiguousarray(coords, dtype=np.float64).reshape(-1, 2))
+        self.offsets = _readonly(np.ascontiguousarray(offsets, dtype=np.int64))
+        self.layer_ids = _readonly(np.ascontiguousarray(layer_ids, dtype=np.int32))
+        self.layers = tuple(layers)
+        self._last = {}
+        for index, layer_id in enumerate(self.layer_ids.tolist()):
+            self._last[self.layers[layer_id]] = index
+
+    @classmethod
+    def from_polylines(cls, polylines):
+        """Build from an iterable of ``(layer, points)`` pairs, skipping empty polylines"""
+        layers = {}
+        layer_ids = []
+        offsets = [0]
+        chunks = []
+        for layer, points in polylines:
+            points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+            if not len(points):
+                continue
+            layer_ids.append(layers.setdefault(layer, len(layers)))
+            offsets.append(offsets[-1] + len(points))
+            chunks.append(points)
+        coords = np.concatenate(chunks) if chunks else np.empty((0, 2))
+        return cls(coords, offsets, layer_ids, layers)
+
+    @classmethod
+    def from_profile(cls, profile):
+        """Build from a ``{layer: points}`` profile dict"""
+        return cls.from_polylines(profile.items())
+
+    def with_coords(self, coords):
+        """Create a geometry with the same polylines but new vertex coordinates"""
+        return Geometry(coords, self.offsets, self.layer_ids, self.layers)
+
+    @property
+    def polyline_count(self):
+        return len(self.layer_ids)
+
+    @property
+    def counts(self):
+        """Number of vertices in each polyline"""
+        return np.diff(self.offsets)
+
+    @property
+    def nbytes(self):
+        return self.coords.nbytes + self.offsets.nbytes + self.layer_ids.nbytes
+
+    def polyline(self, index):
+        """Get a view of one polyline's vertices"""
+        return self.coords[self.offsets[index]:self.offsets[index + 1]]
+
+    def polylines(self, layer):
+        """Get views of every polyline on a layer"""
+        if layer not in self._last:
+            return []
+        layer_id = self.layers.index(layer)
+        return [self.polyline(i) for i in np.flatnonzero(self.layer_ids == layer_id)]
+
+    def iter_polylines(self):
+        """Iterate over ``(layer, points)`` for every polyline"""
+        for index, layer_id in enumerate(self.layer_ids.tolist()):
+            yield self.layers[layer_id], self.polyline(index)
+
+    def vertex_polyline_ids(self):
+        """Get the polyline index of every vertex"""
+        return np.repeat(np.arange(self.polyline_count), self.counts)
+
+    def polyline_bounds(self):
+        """Get the ``(min_x, min_y, max_x, max_y)`` bounds of every polyline"""
+        if not self.polyline_count:
+            return np.empty((0, 4))
+        starts = self.offsets[:-1]
+        return np.hstack([np.minimum.reduceat(self.coords, starts),
+                          np.maximum.reduceat(self.coords, starts)])
+
+    def layer_bounds(self):
+        """Get the ``(min_x, min_y, max_x, max_y)`` bounds of each layer"""
+        bounds = self.polyline_bounds()
+        result = {}
+        for layer_id, layer in enumerate(self.layers):
+            layer_bounds = bounds[self.layer_ids == layer_id]
+            result[layer] = (*layer_bounds[:, :2].min(axis=0), *layer_bounds[:, 2:].max(axis=0))
+        return result
+
+    def bounds(self):
+        """Get the ``(min_x, min_y, max_x, max_y)`` bounds of all vertices, or None if empty"""
+        if not len(self.coords):
+            return None
+        return (*self.coords.min(axis=0), *self.coords.max(axis=0))
+
+    def panel(self, name):
+        """Get a panel in the ``{'outline', 'slots', 'cutlines'}`` layout used by DXFViewer
+
+        The outline is the last polyline on the ``name`` layer, slots come from
+        ``{name}_SLOT5_5`` and cutlines from ``{name}_XCUTLINE`` then
+        ``{name}_YCUTLINE``.
+        """
+        outline = self.get(name)
+        return {
+            'outline': outline if outline is not None else np.empty((0, 2)),
+            'slots': self.polylines(f"{name}_SLOT5_5"),
+            'cutlines': self.polylines(f"{name}_XCUTLINE") + self.polylines(f"{name}_YCUTLINE")
+        }
+
+    def to_profile(self):
+        """Convert to a ``{layer: [(x, y), ...]}`` dict holding each layer's last polyline"""
+        return {layer: [tuple(point) for point in self[layer].tolist()] for layer in self}
+
+    def __getitem__(self, layer):
+        return self.polyline(self._last[layer])
+
+    def __iter__(self):
+        return iter(self._last)
+
+    def __len__(self):
+        return len(self._last)
+
+    def __contains__(self, layer):
+        return layer in self._last
+
+    def __eq__(self, other):
+        if not isinstance(other, Geometry):
+            return NotImplemented
+        return (self.layers == other.layers
+                and np.array_equal(self.layer_ids, other.layer_ids)
+                and np.array_equal(self.offsets, other.offsets)
+                and np.array_equal(self.coords, other.coords))
+
+    __hash__ = None
+
+    def __reduce__(self):
+        return (Geometry, (self.coords, self.offsets, self.layer_ids, self.layers))
+
+    def __repr__(self):
+        return (f"Geometry({len(self.layers)} layers, {self.polyline_count} polylines, "
+                f"{len(self.coords)} vertices)")
+
+def chain_polylines(polylines):
+    """Chain polylines end to end into closed loops
+
+    Each loop grows by the polyline with the nearest free end until closing
+    it is shorter than any further step. Returns every loop as a list of
+    ``(index, reversed)`` pairs into ``polylines``; polylines with fewer
+    than two points are left out.
+    """
+    ends = {index: (np.asarray(points[0], dtype=np.float64), np.asarray(points[-1], dtype=np.float64))
+            for index, points in enumerate(polylines) if len(points) > 1}
+    remaining = list(ends)
+    loops = []
+    while remaining:
+        first = remaining.pop(0)
+        chain = [(first, False)]
+        start, end = ends[first]
+        while remaining:
+            heads = np.hypot(*(np.array([ends[index][0] for index in remaining]) - end).T)
+            tails = np.hypot(*(np.array([ends[index][1] for index in remaining]) - end).T)
+            head, tail = int(heads.argmin()), int(tails.argmin())
+            if np.hypot(*(end - start)) <= min(heads[head], tails[tail]):
+                break
+            if heads[head] <= tails[tail]:
+                index = remaining.pop(head)
+                chain.append((index, False))
+                end = ends[index][1]
+            else:
+                index = remaining.pop(tail)
+                chain.append((index, True))
+                end = ends[index][0]
+        loops.append(chain)
+    return loops
+
+# Panel quadrants in ring order, with the direction each runs along the outline
+QUADRANT_DIRECTIONS = (('TL', (1.0, 0.0)), ('TR', (0.0, -1.0)), ('BR', (-1.0, 0.0)), ('BL', (0.0, 1.0)))
+
+def chain_layers(layers, polylines):
+    """Chain named polylines into closed loops, like ``chain_polylines``
+
+    A panel drawn as ``_TL``/``_TR``/``_BR``/``_BL`` quadrants becomes one
+    loop in that order, each quadrant turned to run clockwise. That only
+    depends on each quadrant's own shape, so it holds however far scaling
+    moves the quadrants apart, where joining the nearest ends can pair the
+    wrong ones. Other polylines are chained with ``chain_polylines``.
+    """
+    quadrants = {}
+    for index, layer in enumerate(layers):
+        suffix = layer.rsplit('_', 1)[-1]
+        if suffix not in quadrants and len(polylines[index]) > 1:
+            quadrants[suffix] = index
+    if not all(suffix in quadrants for suffix, _ in QUADRANT_DIRECTIONS):
+        return chain_polylines(polylines)
+
+    ring = []
+    for suffix, direction in QUADRANT_DIRECTIONS:
+        index = quadrants[suffix]
+        points = np.asarray(polylines[index], dtype=np.float64)
+        ring.append((index, float(np.dot(points[-1] - points[0], direction)) < 0))
+    used = {index for index, _ in ring}
+    rest = [index for index in range(len(polylines)) if index not in used]
+    return [ring] + [[(rest[index], reverse) for index, reverse in chain]
+                     for chain in chain_polylines([polylines[index] for index in rest])]
+
+def _readonly(array):
+    view = array.view()
+    view.flags.writeable = False
+    return view
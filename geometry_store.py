@@ -0,0 +1,366 @@
+import argparse
+import glob
+import hashlib
+import json
+import logging
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+import numpy as np
+from geometry import Geometry
+from instrumentation import add_arguments, configure, count, span
+
+log = logging.getLogger(__name__)
+
+STORE_NAME = 'geometry.store'
+# Vertices relative to a polyline's first one are rounded to this many decimals for its key
+KEY_DECIMALS = 9
+# Attempts at replacing a file another process briefly holds open (Windows)
+REPLACE_ATTEMPTS = 5
+
+def default_store_path(dxf_dir):
+    """Get the store path for a profile directory: next to it, e.g. assets/geometry.store"""
+    return os.path.join(os.path.dirname(os.path.abspath(dxf_dir)), STORE_NAME)
+
+def polyline_key(points):
+    """Hash a polyline's shape, its vertices relative to the first one
+
+    Copies of a polyline moved elsewhere hash alike; -0.0 and 0.0 do too.
+    """
+    points = np.asarray(points, dtype=np.float64)
+    if len(points):
+        points = points - points[0]
+    points = np.ascontiguousarray(np.round(points, KEY_DECIMALS), dtype='<f8') + 0.0
+    return hashlib.sha256(points.tobytes()).digest()
+
+def file_stamp(filepath):
+    """Get the size, modification time and SHA-256 hex digest of a file"""
+    stat = os.stat(filepath)
+    digest = hashlib.sha256()
+    with open(filepath, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return stat.st_size, stat.st_mtime_ns, digest.hexdigest()
+
+def pack_paths(path):
+    """Get the pack files that may belong to the store at ``path``"""
+    stem = os.path.splitext(path)[0]
+    return glob.glob(glob.escape(stem) + '.*.pack')
+
+def replace_file(path, data):
+    """Atomically write ``data`` to ``path`` through a temp file next to it
+
+    Replacing is retried for a moment, since on Windows it fails while
+    another process has the target open.
+    """
+    tmp = tempfile.NamedTemporaryFile(dir=os.path.dirname(os.path.abspath(path)), suffix='.tmp', delete=False)
+    try:
+        with tmp:
+            tmp.write(data)
+        for attempt in range(REPLACE_ATTEMPTS):
+            try:
+                os.replace(tmp.name, path)
+                return
+            except PermissionError:
+                if attempt == REPLACE_ATTEMPTS - 1:
+                    raise
+                time.sleep(0.05 * (attempt + 1))
+    except OSError:
+        try:
+            os.remove(tmp.name)
+        except OSError:
+            pass
+        raise
+
+def write_store(path, entries):
+    """Write profiles to a packed store, storing each distinct polyline once
+
+    ``entries`` yields ``(name, filepath, stamp, geometry)`` with ``stamp``
+    from ``file_stamp``, taken before the file was parsed. Polylines are
+    keyed by shape, so a panel repeated within or across profiles is stored
+    once, wherever it was placed; each use records how far it is moved from
+    the stored copy. A profile's new polylines are laid out together, in
+    order, so a profile that adds geometry, or repeats another one exactly,
+    can be read back as a single run without copying.
+
+    The data goes to a new pack file named after its content, and ``path``
+    is then switched to point at it. Packs mapped by running processes are
+    never overwritten; old ones are removed once nothing holds them.
+    Returns the store's stats.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    blobs = {}
+    chunks = []
+    blob_offsets = [0]
+    records = []
+    for name, filepath, stamp, geometry in entries:
+        ids = []
+        shifts = []
+        for _, points in geometry.iter_polylines():
+            key = polyline_key(points)
+            index = blobs.get(key)
+            if index is None:
+                index = blobs[key] = len(chunks)
+                chunks.append(points)
+                blob_offsets.append(blob_offsets[-1] + len(points))
+            ids.append(index)
+            shift = points[0] - chunks[index][0] if len(points) else np.zeros(2)
+            shifts.append([float(shift[0]), float(shift[1])])
+        size, mtime_ns, digest = stamp
+        record = {
+            'name': name,
+            'file': os.path.relpath(os.path.abspath(filepath), directory),
+            'size': size,
+            'mtime_ns': mtime_ns,
+            'digest': digest,
+            'layers': list(geometry.layers),
+            'layer_ids': geometry.layer_ids.tolist(),
+            'polylines': ids
+        }
+        if any(dx or dy for dx, dy in shifts):
+            record['shifts'] = shifts
+        records.append(record)
+
+    index = json.dumps({'profiles': records, 'blob_count': len(chunks),
+                        'vertex_count': blob_offsets[-1]}).encode('utf-8')
+    data_offset = GeometryStore.data_offset(len(index))
+    coords = np.concatenate(chunks) if chunks else np.empty((0, 2))
+    data = b''.join([
+        GeometryStore.HEADER.pack(GeometryStore.MAGIC, GeometryStore.VERSION, len(index)),
+        index,
+        b'\0' * (data_offset - GeometryStore.HEADER.size - len(index)),
+        np.asarray(blob_offsets, dtype='<i8').tobytes(),
+        coords.astype('<f8').tobytes()
+    ])
+    stem = os.path.splitext(os.path.basename(path))[0]
+    pack = f"{stem}.{hashlib.sha256(data).hexdigest()[:16]}.pack"
+    pack_path = os.path.join(directory, pack)
+    os.makedirs(directory, exist_ok=True)
+    if not os.path.exists(pack_path):
+        replace_file(pack_path, data)
+    replace_file(path, json.dumps({'pack': pack}).encode('utf-8'))
+    remove_stale_packs(path, pack_path)
+    return GeometryStore(path).stats()
+
+def remove_stale_packs(path, keep):
+    """Remove the store's packs other than ``keep``; ones still mapped elsewhere stay until the next build"""
+    for pack_path in pack_paths(path):
+        if os.path.abspath(pack_path) == os.path.abspath(keep):
+            continue
+        for stale in (pack_path, pack_path + '.stamps'):
+            try:
+                os.remove(stale)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                log.debug("Keeping %s: %s", stale, e)
+
+class GeometryStore:
+    """Packed, memory-mapped file of profile geometry shared between processes
+
+    The store file points at a pack holding a JSON index followed by two
+    arrays: the start of every distinct polyline, and all their vertices as
+    float64 pairs. Each profile records its DXF file's stamp, its layers,
+    the polylines it is made of and how far each is moved. The pack is
+    mapped read-only, so every process on the host reads the same pages;
+    ``get`` returns a Geometry viewing the mapping when the profile's
+    polylines form one unmoved run, and otherwise gathers them into a copy.
+
+    Stamps refreshed after a file was touched are kept next to the pack in
+    a small ``.stamps`` file, so the pack itself is never rewritten.
+    """
+    MAGIC = b'VCGS'
+    VERSION = 2
+    HEADER = struct.Struct('<4sHQ')
+    ALIGN = 64
+
+    def __init__(self, path):
+        self.path = path
+        self.directory = os.path.dirname(os.path.abspath(path))
+        with open(path, 'rb') as f:
+            pointer = json.loads(f.read())
+        self.pack_path = os.path.join(self.directory, os.path.basename(pointer['pack']))
+        with open(self.pack_path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, index_len = self.HEADER.unpack_from(self._map, 0)
+        if magic != self.MAGIC or version != self.VERSION:
+            raise ValueError(f"{self.pack_path} is not a geometry store of version {self.VERSION}")
+        index = json.loads(self._map[self.HEADER.size:self.HEADER.size + index_len])
+        self.entries = {record['name']: record for record in index['profiles']}
+        offset = self.data_offset(index_len)
+        self.blob_offsets = np.frombuffer(self._map, '<i8', index['blob_count'] + 1, offset)
+        offset += self.blob_offsets.nbytes
+        self.coords = np.frombuffer(self._map, '<f8', 2 * index['vertex_count'], offset).reshape(-1, 2)
+        self.stamps = self._read_stamps()
+        self._stamps_lock = threading.Lock()
+
+    @classmethod
+    def open(cls, path):
+        """Open a store, or return None if it is missing or unreadable"""
+        if not os.path.exists(path):
+            return None
+        # A rebuild can remove the pack between reading the pointer and mapping it
+        for attempt in range(2):
+            try:
+                store = cls(path)
+                break
+            except FileNotFoundError as e:
+                if attempt:
+                    log.warning("Ignoring geometry store %s: %s", path, e)
+                    return None
+            except (OSError, ValueError, KeyError, TypeError, struct.error) as e:
+                log.warning("Ignoring geometry store %s: %s", path, e)
+                return None
+        log.info("Attached geometry store %s with %d profiles", store.pack_path, len(store.entries))
+        return store
+
+    @classmethod
+    def data_offset(cls, index_len):
+        """Get where the arrays start, aligned past the header and index"""
+        end = cls.HEADER.size + index_len
+        return (end + cls.ALIGN - 1) // cls.ALIGN * cls.ALIGN
+
+    def filepath(self, name):
+        """Get the DXF path a profile was stored from"""
+        return os.path.normpath(os.path.join(self.directory, self.entries[name]['file']))
+
+    def get(self, name):
+        """Get a profile's Geometry"""
+        record = self.entries[name]
+        ids = np.asarray(record['polylines'], dtype=np.int64)
+        if not len(ids):
+            return Geometry(np.empty((0, 2)), [0], [], record['layers'])
+        first = ids[0]
+        if 'shifts' not in record and np.array_equal(ids, np.arange(first, first + len(ids))):
+            offsets = self.blob_offsets[first:first + len(ids) + 1]
+            coords = self.coords[offsets[0]:offsets[-1]]
+            offsets = offsets - offsets[0]
+            count('geometry_store_views')
+        else:
+            starts, ends = self.blob_offsets[ids], self.blob_offsets[ids + 1]
+            coords = np.concatenate([self.coords[start:end] for start, end in zip(starts, ends)])
+            if 'shifts' in record:
+                coords += np.repeat(np.asarray(record['shifts'], dtype=np.float64), ends - starts, axis=0)
+            offsets = np.concatenate([[0], np.cumsum(ends - starts)])
+            count('geometry_store_copies')
+        return Geometry(coords, offsets, record['layer_ids'], record['layers'])
+
+    def load(self, filepath):
+        """Get a DXF file's profile if the store has it and the file is unchanged, else None
+
+        The file's size and modification time are compared first; if they
+        differ the content digest decides, so a checkout that only touches
+        timestamps still hits, and the new time is recorded so the file is
+        not hashed again.
+        """
+        name = os.path.splitext(os.path.basename(filepath))[0]
+        record = self.entries.get(name)
+        if record is None or self.filepath(name) != os.path.normpath(os.path.abspath(filepath)):
+            count('geometry_store_misses')
+            return None
+        try:
+            stat = os.stat(filepath)
+            size, mtime_ns = self.stamps.get(name, (record['size'], record['mtime_ns']))
+            if stat.st_size != size:
+                stale = True
+            elif stat.st_mtime_ns != mtime_ns:
+                stale = file_stamp(filepath)[2] != record['digest']
+                if not stale:
+                    self._refresh_stamp(name, stat.st_size, stat.st_mtime_ns)
+            else:
+                stale = False
+        except OSError:
+            return None
+        if stale:
+            log.debug("Stored profile %s is stale", name)
+            count('geometry_store_misses')
+            return None
+        count('geometry_store_hits')
+        with span('store_profile', 'load', profile=name):
+            return self.get(name)
+
+    def _read_stamps(self):
+        """Get the stamps refreshed since the pack was written"""
+        try:
+            with open(self.pack_path + '.stamps', encoding='utf-8') as f:
+                return {name: tuple(stamp) for name, stamp in json.load(f).items()}
+        except (OSError, ValueError, TypeError, AttributeError):
+            return {}
+
+    def _refresh_stamp(self, name, size, mtime_ns):
+        """Record a touched but unchanged file's new stamp for this and later processes"""
+        with self._stamps_lock:
+            # Keep what other processes refreshed in the meantime
+            stamps = self._read_stamps()
+            stamps.update(self.stamps)
+            stamps[name] = (size, mtime_ns)
+            self.stamps = stamps
+            try:
+                replace_file(self.pack_path + '.stamps', json.dumps(stamps).encode('utf-8'))
+                log.debug("Refreshed stamp of stored profile %s", name)
+            except OSError as e:
+                log.warning("Could not refresh stamp of stored profile %s: %s", name, e)
+
+    def stats(self):
+        """Summarize what the store holds and how much deduplication saved"""
+        polylines = sum(len(record['polylines']) for record in self.entries.values())
+        blob_counts = np.diff(self.blob_offsets)
+        vertices = sum(int(blob_counts[record['polylines']].sum()) for record in self.entries.values()
+                       if record['polylines'])
+        return {
+            'profiles': len(self.entries),
+            'polylines': polylines,
+            'unique_polylines': len(blob_counts),
+            'vertices': vertices,
+            'unique_vertices': len(self.coords),
+            'bytes': len(self._map)
+        }
+
+    def __contains__(self, name):
+        return name in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+def build_store(manager, path):
+    """Write every profile of a lazy ``manager`` to the store at ``path``
+
+    Each file is stamped before its profile is parsed, so one saved during
+    the build is treated as stale by readers and parsed again.
+    """
+    entries = []
+    for name in sorted(manager.list_profiles()):
+        filepath = manager.profiles.filepaths[name]
+        try:
+            stamp = file_stamp(filepath)
+        except OSError as e:
+            log.warning("Skipping profile %s: %s", name, e)
+            continue
+        profile = manager.get_profile(name)
+        if profile is not None:
+            entries.append((name, filepath, stamp, profile))
+    return write_store(path, entries)
+
+def main(argv=None):
+    """Build the geometry store for a profile directory"""
+    from profile_manager import ProfileManager
+
+    parser = argparse.ArgumentParser(description="Pack the profile library into a shared geometry store")
+    parser.add_argument('--dxf-dir', default=None, help="Profile library directory (default: assets/dxf)")
+    parser.add_argument('-o', '--output', default=None, help=f"Store file (default: {STORE_NAME} next to the profile directory)")
+    add_arguments(parser)
+    args = parser.parse_args(argv)
+    configure(args.log_level, args.trace)
+
+    # Unchanged profiles are read from the current store, only changed files are parsed
+    manager = ProfileManager(lazy=True, dxf_dir=args.dxf_dir, store_path=args.output)
+    path = args.output or default_store_path(manager.dxf_dir)
+    stats = build_store(manager, path)
+    print(f"Stored {stats['profiles']} profiles in {path}: {stats['unique_polylines']} of "
+          f"{stats['polylines']} polylines and {stats['unique_vertices']} of {stats['vertices']} "
+          f"vertices distinct, {stats['bytes']} bytes")
+
+if __name__ == '__main__':
+    main()
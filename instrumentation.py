@@ -0,0 +1,160 @@
+import atexit
+import functools
+import json
+import logging
+import os
+import threading
+import time
+
+log = logging.getLogger(__name__)
+
+LOG_LEVELS = ('DEBUG', 'INFO', 'WARNING', 'ERROR')
+
+# Tracing state; everything below is a no-op while _enabled is False
+_enabled = False
+_events = []
+_counters = {}
+_lock = threading.Lock()
+_origin = time.perf_counter()
+
+class _NullSpan:
+    """Span returned while tracing is disabled"""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def set(self, **args):
+        pass
+
+_NULL_SPAN = _NullSpan()
+
+class Span:
+    """A named, timed section of work, recorded as a Chrome trace event"""
+    __slots__ = ('name', 'category', 'args', 'start')
+
+    def __init__(self, name, category, args):
+        self.name = name
+        self.category = category
+        self.args = args
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        end = time.perf_counter()
+        if exc_type is not None:
+            self.args['error'] = exc_type.__name__
+        _events.append({
+            'name': self.name,
+            'cat': self.category,
+            'ph': 'X',
+            'ts': (self.start - _origin) * 1e6,
+            'dur': (end - self.start) * 1e6,
+            'pid': os.getpid(),
+            'tid': threading.get_ident(),
+            'args': self.args,
+        })
+        log.debug("%s/%s took %.3f ms %s", self.category, self.name, (end - self.start) * 1000, self.args or '')
+        return False
+
+    def set(self, **args):
+        """Attach results, e.g. counts, to the span"""
+        self.args.update(args)
+
+def span(name, category, **args):
+    """Time a block of work: ``with span('read_profile', 'parse', file=path):``
+
+    ``category`` groups spans by stage: load, parse, scale, render, mesh or export.
+    """
+    if not _enabled:
+        return _NULL_SPAN
+    return Span(name, category, args)
+
+def traced(category, name=None):
+    """Decorate a function so every call is recorded as a span"""
+    def decorate(function):
+        span_name = name or function.__qualname__
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return function(*args, **kwargs)
+            with Span(span_name, category, {}):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorate
+
+def count(name, value=1):
+    """Add to a named counter, e.g. vertices parsed or cache hits"""
+    if not _enabled:
+        return
+    with _lock:
+        total = _counters.get(name, 0) + value
+        _counters[name] = total
+    _events.append({
+        'name': name,
+        'ph': 'C',
+        'ts': (time.perf_counter() - _origin) * 1e6,
+        'pid': os.getpid(),
+        'args': {name: total},
+    })
+
+def counters():
+    """Get a copy of the counter totals"""
+    with _lock:
+        return dict(_counters)
+
+def enable():
+    global _enabled
+    _enabled = True
+
+def disable():
+    global _enabled
+    _enabled = False
+
+def is_enabled():
+    return _enabled
+
+def reset():
+    """Drop every recorded span and counter"""
+    with _lock:
+        _events.clear()
+        _counters.clear()
+
+def trace_data():
+    """Get the recorded spans and counters in Chrome's trace event format"""
+    with _lock:
+        events = list(_events)
+        totals = dict(_counters)
+    return {
+        'traceEvents': events,
+        'displayTimeUnit': 'ms',
+        'otherData': {'counters': totals},
+    }
+
+def write_trace(filepath):
+    """Write the trace as JSON, to open in chrome://tracing or Perfetto"""
+    with open(filepath, 'w', encoding='utf-8') as f:
+        json.dump(trace_data(), f)
+    log.info("Wrote %d trace events to %s", len(_events), filepath)
+
+def add_arguments(parser):
+    """Add the --log-level and --trace options to an argparse parser"""
+    parser.add_argument('--log-level', default='INFO', type=str.upper, choices=LOG_LEVELS,
+                        help="Logging verbosity (default: INFO)")
+    parser.add_argument('--trace', metavar='FILE', default=None,
+                        help="Record timing spans and counters and write a Chrome trace JSON on exit")
+
+def configure(log_level='INFO', trace_path=None):
+    """Set up logging and, with ``trace_path``, tracing written at exit"""
+    logging.basicConfig(level=getattr(logging, str(log_level).upper(), logging.INFO),
+                        format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+    if trace_path:
+        enable()
+        atexit.register(write_trace, trace_path)
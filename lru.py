@@ -0,0 +1,75 @@
+import threading
+from collections import OrderedDict
+
+class LRUCache:
+    """Bounded least-recently-used mapping with an optional memory budget
+
+    Entries are evicted oldest first once there are more than ``max_items``
+    entries or their total ``sizeof`` exceeds ``max_bytes``. The most recently
+    added entry is always kept, even if it alone is over budget.
+    """
+    def __init__(self, max_items=None, max_bytes=None, sizeof=None):
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.total_bytes = 0
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """Get an entry and mark it as most recently used"""
+        with self._lock:
+            try:
+                value, _ = self._entries[key]
+            except KeyError:
+                self.stats['misses'] += 1
+                return default
+            self._entries.move_to_end(key)
+            self.stats['hits'] += 1
+            return value
+
+    def put(self, key, value):
+        """Add or replace an entry, evicting old entries to stay in budget"""
+        size = self.sizeof(value) if self.sizeof is not None else 0
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.total_bytes -= old[1]
+            self._entries[key] = (value, size)
+            self.total_bytes += size
+            while len(self._entries) > 1 and self._over_budget():
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.total_bytes -= evicted_size
+                self.stats['evictions'] += 1
+
+    def pop(self, key, default=None):
+        """Remove an entry"""
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None:
+                return default
+            self.total_bytes -= entry[1]
+            return entry[0]
+
+    def clear(self):
+        """Remove all entries"""
+        with self._lock:
+            self._entries.clear()
+            self.total_bytes = 0
+
+    def keys(self):
+        """List the keys from least to most recently used"""
+        with self._lock:
+            return list(self._entries.keys())
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _over_budget(self):
+        if self.max_items is not None and len(self._entries) > self.max_items:
+            return True
+        return self.max_bytes is not None and self.total_bytes > self.max_bytes
@@ -0,0 +1,497 @@
+import hashlib
+import logging
+import numpy as np
+import trimesh
+from geometry import chain_layers, chain_polylines
+from instrumentation import count, span, traced
+from lru import LRUCache
+from nesting import parts_from_profile
+
+log = logging.getLogger(__name__)
+
+# Binary STL facet: normal, three vertices and an unused attribute word
+STL_FACET = np.dtype([('normal', '<f4', 3), ('vertices', '<f4', (3, 3)), ('attribute', '<u2')])
+
+# Pairs of (convex vertex, reflex vertex) tested per step of ear clipping
+EAR_TEST_CHUNK = 1 << 18
+
+def signed_area(points):
+    """Signed area of a polygon, positive when counter-clockwise"""
+    x, y = points[:, 0], points[:, 1]
+    return 0.5 * (np.dot(x, np.roll(y, -1)) - np.dot(y, np.roll(x, -1)))
+
+def cross(o, a, b):
+    """Z component of ``(a - o) x (b - o)`` for arrays of 2D points"""
+    return (a[..., 0] - o[..., 0]) * (b[..., 1] - o[..., 1]) - (a[..., 1] - o[..., 1]) * (b[..., 0] - o[..., 0])
+
+def clean_loop(points, eps=1e-9):
+    """Drop repeated vertices, including a closing copy of the first one"""
+    steps = np.diff(points, axis=0, append=points[:1])
+    return points[np.hypot(steps[:, 0], steps[:, 1]) > eps]
+
+def closed_loops(polylines, layers=None):
+    """Chain polylines end to end into closed loops
+
+    The quadrants of a scaled panel have been moved apart, so the gaps
+    between them become straight edges; with the polylines' ``layers``
+    they are joined by ``geometry.chain_layers``.
+    """
+    polylines = [np.asarray(points, dtype=np.float64) for points in polylines]
+    chains = chain_polylines(polylines) if layers is None else chain_layers(layers, polylines)
+    loops = []
+    for chain in chains:
+        loop = clean_loop(np.concatenate([polylines[index][::-1] if reverse else polylines[index]
+                                          for index, reverse in chain]))
+        if len(loop) >= 3:
+            loops.append(loop)
+    return loops
+
+def points_in_polygon(points, polygon):
+    """Even-odd test of many points against one polygon"""
+    x, y = points[:, 0:1], points[:, 1:2]
+    x0, y0 = polygon[:, 0], polygon[:, 1]
+    x1, y1 = np.roll(x0, -1), np.roll(y0, -1)
+    crosses = (y0 > y) != (y1 > y)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        at = x0 + (y - y0) * (x1 - x0) / (y1 - y0)
+    return (crosses & (x < at)).sum(axis=1) % 2 == 1
+
+def panel_polygon(geometry):
+    """Get a panel's outline and slot holes from its polylines
+
+    The outline is the largest loop of the non-slot layers, made
+    counter-clockwise; slot loops lying inside it become clockwise holes.
+    Slots that cross the outline would need a polygon boolean and are left
+    out. Returns ``(outline, holes, dropped)`` with the number of slots
+    left out.
+    """
+    outlines = []
+    outline_layers = []
+    slots = []
+    for layer, points in geometry.iter_polylines():
+        if 'SLOT' in layer:
+            slots.append(points)
+        else:
+            outlines.append(points)
+            outline_layers.append(layer)
+    loops = closed_loops(outlines, outline_layers)
+    if not loops:
+        return None, [], 0
+    outline = max(loops, key=lambda loop: abs(signed_area(loop)))
+    if signed_area(outline) < 0:
+        outline = outline[::-1]
+
+    holes = []
+    dropped = 0
+    for loop in closed_loops(slots):
+        if not points_in_polygon(loop, outline).all():
+            dropped += 1
+            continue
+        holes.append(loop[::-1] if signed_area(loop) > 0 else loop)
+    return outline, holes, dropped
+
+def bridge_holes(outer, holes):
+    """Join holes to the outline through zero-width bridges, as earcut does
+
+    Returns the vertices (outline, then holes) and one ring of indices into
+    them that walks the outline and every hole. Each hole is entered from
+    its leftmost vertex over the nearest outline vertex the bridge can reach
+    without crossing an edge.
+    """
+    vertices = np.concatenate([outer] + holes) if holes else outer
+    ring = list(range(len(outer)))
+    hole_rings = []
+    start = len(outer)
+    for hole in holes:
+        hole_rings.append(np.arange(start, start + len(hole)))
+        start += len(hole)
+
+    pending = sorted(hole_rings, key=lambda indices: vertices[indices, 0].min())
+    while pending:
+        hole = pending.pop(0)
+        entry = int(np.argmin(vertices[hole, 0]))
+        h = hole[entry]
+        position = _bridge_position(vertices, ring, [hole] + pending, h)
+        cycle = np.roll(hole, -entry).tolist()
+        v = ring[position]
+        ring[position + 1:position + 1] = cycle + [h, v]
+    return vertices, np.array(ring, dtype=np.int64)
+
+def _bridge_position(vertices, ring, holes, h):
+    """Find the ring position to bridge to vertex ``h`` of a hole"""
+    ring = np.asarray(ring)
+    point = vertices[h]
+    # Every edge a bridge must not cross: the ring's and the holes'
+    starts = [ring]
+    ends = [np.roll(ring, -1)]
+    for hole in holes:
+        starts.append(hole)
+        ends.append(np.roll(hole, -1))
+    edge_a = vertices[np.concatenate(starts)]
+    edge_b = vertices[np.concatenate(ends)]
+
+    positions = np.argsort(np.hypot(*(vertices[ring] - point).T), kind='stable')
+    for position in positions.tolist():
+        v = vertices[ring[position]]
+        previous = vertices[ring[position - 1]]
+        following = vertices[ring[(position + 1) % len(ring)]]
+        if not _in_wedge(previous, v, following, point):
+            continue
+        # Edges touching either end of the bridge cannot block it
+        free = ~((edge_a == v).all(axis=1) | (edge_b == v).all(axis=1) |
+                 (edge_a == point).all(axis=1) | (edge_b == point).all(axis=1))
+        a, b = edge_a[free], edge_b[free]
+        d1 = cross(v, point, a)
+        d2 = cross(v, point, b)
+        d3 = cross(a, b, v)
+        d4 = cross(a, b, point)
+        crossing = (d1 * d2 <= 0) & (d3 * d4 <= 0) & ~((d1 == 0) & (d2 == 0) & (d3 == 0))
+        if not crossing.any():
+            return position
+    # Holes inside the outline always see some vertex; keep going regardless
+    log.debug("No visible bridge for hole vertex %d, using the nearest", h)
+    return int(positions[0])
+
+def _in_wedge(previous, v, following, point):
+    """Check that ``point`` lies in the interior angle at ``v`` of a counter-clockwise ring"""
+    if cross(previous, v, following) >= 0:
+        return cross(v, following, point) >= 0 and cross(v, point, previous) >= 0
+    return cross(v, following, point) >= 0 or cross(v, point, previous) >= 0
+
+def triangulate_rings(points, offsets, seed=0):
+    """Triangulate many counter-clockwise rings at once by ear clipping
+
+    Ring ``i`` is ``points[offsets[i]:offsets[i + 1]]``; rings may repeat
+    vertices, as bridged holes do. Every step finds the ears of all rings in
+    one NumPy pass: convex vertices whose triangle holds no reflex vertex of
+    the same ring. Of each run of neighbouring ears only local maxima of a
+    random priority are clipped, so the clipped ears never share an edge and
+    can be cut off together. Returns ``(M, 3)`` indices into ``points``.
+    """
+    count_nodes = len(points)
+    counts = np.diff(offsets)
+    ring_ids = np.repeat(np.arange(len(counts)), counts)
+    following = np.arange(1, count_nodes + 1)
+    previous = np.arange(-1, count_nodes - 1)
+    following[offsets[1:][counts > 0] - 1] = offsets[:-1][counts > 0]
+    previous[offsets[:-1][counts > 0]] = offsets[1:][counts > 0] - 1
+    remaining = counts.copy()
+    active = np.ones(count_nodes, dtype=bool)
+    priority = np.random.default_rng(seed).random(count_nodes)
+    triangles = []
+
+    while True:
+        # Rings down to their last triangle are finished directly
+        nodes = np.flatnonzero(active)
+        last = nodes[remaining[ring_ids[nodes]] == 3]
+        if len(last):
+            _, first = np.unique(ring_ids[last], return_index=True)
+            last = last[first]
+            triangles.append(np.column_stack([previous[last], last, following[last]]))
+            remaining[ring_ids[last]] = 0
+        active &= remaining[ring_ids] >= 3
+        nodes = np.flatnonzero(active)
+        if not len(nodes):
+            break
+
+        ears = _find_ears(points, nodes, previous[nodes], following[nodes], ring_ids)
+        is_ear = np.zeros(count_nodes, dtype=bool)
+        is_ear[ears] = True
+        chosen = ears[(~is_ear[previous[ears]] | (priority[ears] > priority[previous[ears]])) &
+                      (~is_ear[following[ears]] | (priority[ears] > priority[following[ears]]))]
+
+        # A ring without ears is degenerate; clip a vertex anyway so it ends
+        clipped = np.bincount(ring_ids[chosen], minlength=len(counts))
+        stuck = nodes[clipped[ring_ids[nodes]] == 0]
+        if len(stuck):
+            _, first = np.unique(ring_ids[stuck], return_index=True)
+            chosen = np.concatenate([chosen, stuck[first]])
+
+        # Flat triangles of straight vertices are kept so the caps meet the walls
+        before, after = previous[chosen], following[chosen]
+        triangles.append(np.column_stack([before, chosen, after]))
+        following[before] = after
+        previous[after] = before
+        active[chosen] = False
+        np.subtract.at(remaining, ring_ids[chosen], 1)
+
+    if not triangles:
+        return np.empty((0, 3), dtype=np.int64)
+    return np.concatenate(triangles)
+
+def _find_ears(points, nodes, before, after, ring_ids):
+    """Get the nodes whose triangle with their neighbours is an ear"""
+    area = cross(points[before], points[nodes], points[after])
+    # Vertices in the middle of a straight edge can go without a triangle
+    straight = (area == 0) & (np.einsum('ij,ij->i', points[before] - points[nodes],
+                                        points[after] - points[nodes]) < 0)
+    convex = (area > 0) | straight
+    reflex = nodes[~convex]
+    candidates = np.flatnonzero(convex)
+    if not len(reflex) or not len(candidates):
+        return nodes[candidates]
+
+    # Pair every candidate with every reflex vertex of its ring
+    reflex_rings = ring_ids[reflex]
+    candidate_rings = ring_ids[nodes[candidates]]
+    lo = np.searchsorted(reflex_rings, candidate_rings, side='left')
+    hi = np.searchsorted(reflex_rings, candidate_rings, side='right')
+    blocked = np.zeros(len(candidates), dtype=bool)
+    pair_counts = hi - lo
+    for chunk in np.array_split(np.arange(len(candidates)),
+                                max(1, int(pair_counts.sum()) // EAR_TEST_CHUNK + 1)):
+        chunk_counts = pair_counts[chunk]
+        owner = np.repeat(chunk, chunk_counts)
+        first = np.cumsum(chunk_counts) - chunk_counts
+        other = reflex[np.arange(len(owner)) - np.repeat(first, chunk_counts) + lo[owner]]
+        a = points[before[candidates[owner]]]
+        b = points[nodes[candidates[owner]]]
+        c = points[after[candidates[owner]]]
+        p = points[other]
+        corner = (p == a).all(axis=1) | (p == b).all(axis=1) | (p == c).all(axis=1)
+        inside = (cross(a, b, p) >= 0) & (cross(b, c, p) >= 0) & (cross(c, a, p) >= 0) & ~corner
+        blocked[owner[inside]] = True
+    return nodes[candidates[~blocked]]
+
+def extrude(vertices, triangles, rings, thickness):
+    """Extrude a triangulated polygon into a closed prism mesh
+
+    ``rings`` are index arrays of the outline and holes; their edges become
+    the side walls. Faces point outwards.
+    """
+    top = len(vertices)
+    points = np.vstack([np.column_stack([vertices, np.zeros(top)]),
+                        np.column_stack([vertices, np.full(top, float(thickness))])])
+    walls = []
+    for ring in rings:
+        i, j = ring, np.roll(ring, -1)
+        walls.append(np.column_stack([i, j, j + top]))
+        walls.append(np.column_stack([i, j + top, i + top]))
+    faces = np.vstack([triangles[:, ::-1], triangles + top] + walls)
+    return trimesh.Trimesh(points, faces, process=False)
+
+@traced('mesh')
+def panel_digest(part, thickness):
+    """Identify a panel's shape at the origin and its extrusion thickness"""
+    geometry = part.geometry
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update('\0'.join(geometry.layers[layer_id] for layer_id in geometry.layer_ids.tolist()).encode('utf-8'))
+    digest.update(geometry.offsets.tobytes())
+    digest.update((geometry.coords - part.bounds[:2]).tobytes())
+    digest.update(np.float64(thickness).tobytes())
+    return digest.digest()
+
+def extrude_panels(parts, thickness, cache=None):
+    """Extrude the panels of a profile by the material thickness, minus their slots
+
+    The polygons of all panels are triangulated together in one batch.
+    Returns ``(meshes, dropped)``: ``{panel_name: trimesh.Trimesh}`` in panel
+    coordinates, with the panel's lower left bound at the origin, and
+    ``{panel_name: count}`` of the slots left out because they cross the
+    panel's outline. With a ``cache`` (an LRUCache), panels whose shape did
+    not change since an earlier call reuse their mesh, so a dimension edit
+    only extrudes the panels it affects.
+    """
+    meshes = {}
+    dropped = {}
+    keys = {}
+    polygons = []
+    for part in parts:
+        if cache is not None:
+            key = panel_digest(part, thickness)
+            cached = cache.get(key)
+            count('panel_mesh_hits' if cached is not None else 'panel_mesh_misses')
+            if cached is not None:
+                meshes[part.name], panel_dropped = cached
+                if panel_dropped:
+                    dropped[part.name] = panel_dropped
+                continue
+        outline, holes, panel_dropped = panel_polygon(part.geometry)
+        if outline is None:
+            log.debug("Panel %s has no outline to extrude", part.name)
+            continue
+        if panel_dropped:
+            log.warning("Panel %s: left %d slots that cross its outline out of the mesh", part.name, panel_dropped)
+            dropped[part.name] = panel_dropped
+        origin = np.array(part.bounds[:2])
+        vertices, ring = bridge_holes(outline - origin, [hole - origin for hole in holes])
+        polygons.append((part.name, vertices, ring, len(outline), [len(hole) for hole in holes]))
+        if cache is not None:
+            keys[part.name] = key
+    if not polygons:
+        return meshes, dropped
+
+    # One batch: every panel's bridged ring, with vertices repeated per ring visit
+    ring_points = np.concatenate([vertices[ring] for _, vertices, ring, _, _ in polygons])
+    ring_offsets = np.cumsum([0] + [len(ring) for _, _, ring, _, _ in polygons])
+    with span('triangulate', 'mesh', panels=len(polygons), vertices=len(ring_points)):
+        triangles = triangulate_rings(ring_points, ring_offsets)
+
+    owner = np.searchsorted(ring_offsets, triangles[:, 0], side='right') - 1
+    for index, (panel_name, vertices, ring, outline_count, hole_counts) in enumerate(polygons):
+        local = ring[triangles[owner == index] - ring_offsets[index]]
+        # Triangles folded over a bridge repeat a vertex and cover nothing
+        local = local[(local[:, 0] != local[:, 1]) & (local[:, 1] != local[:, 2]) & (local[:, 0] != local[:, 2])]
+        rings = [np.arange(outline_count)]
+        start = outline_count
+        for hole_count in hole_counts:
+            rings.append(np.arange(start, start + hole_count))
+            start += hole_count
+        meshes[panel_name] = extrude(vertices, local, rings, thickness)
+        if panel_name in keys:
+            cache.put(keys[panel_name], (meshes[panel_name], dropped.get(panel_name, 0)))
+    return meshes, dropped
+
+def panel_role(panel_name):
+    """Get where a panel goes in the box: side, front, bottom or None"""
+    if 'LEFTRIGHT' in panel_name:
+        return 'side'
+    if 'FRONTBACK' in panel_name:
+        return 'front'
+    if 'BOTTOM' in panel_name:
+        return 'bottom'
+    return None
+
+def placement(rotation, offset):
+    """Build a 4x4 transform from a 3x3 rotation and an offset"""
+    transform = np.eye(4)
+    transform[:3, :3] = rotation
+    transform[:3, 3] = offset
+    return transform
+
+# Panel (u, v, extrusion) axes to box (x, y, z) axes
+FLAT = np.eye(3)
+FRONT_FACING = np.array([[1, 0, 0], [0, 0, -1], [0, 1, 0]], dtype=np.float64)
+SIDE_FACING = np.array([[0, 0, 1], [1, 0, 0], [0, 1, 0]], dtype=np.float64)
+
+class BoxModel:
+    """Panels of a design extruded and placed as an assembled box
+
+    The bottom lies at z = 0, the front and back panels stand at the front
+    and back faces and the side panels at the left and right faces; the
+    joints are not interlocked. Panels of no known role are laid flat next
+    to the box. ``instances`` holds ``(name, panel_name, transform)``: both
+    sides share one mesh, each with its own 4x4 transform.
+    ``dropped_slots`` counts, per panel, the slots missing from its mesh.
+    """
+    def __init__(self, meshes, thickness, dropped_slots=None):
+        self.meshes = meshes
+        self.thickness = thickness
+        self.dropped_slots = dict(dropped_slots or {})
+        self.instances = []
+
+        extents = {panel_name: mesh.bounds[1][:2] for panel_name, mesh in meshes.items()}
+        roles = {panel_name: panel_role(panel_name) for panel_name in meshes}
+        widths = [extents[p][0] for p, role in roles.items() if role in ('front', 'bottom')]
+        depths = [extents[p][0] for p, role in roles.items() if role == 'side']
+        depths += [extents[p][1] for p, role in roles.items() if role == 'bottom']
+        width = max(widths, default=0.0)
+        depth = max(depths, default=0.0)
+        t = float(thickness)
+
+        spare_x = width + 50.0
+        for panel_name, role in roles.items():
+            if role == 'bottom':
+                self.instances.append((panel_name, panel_name, placement(FLAT, (0, 0, 0))))
+            elif role == 'front':
+                self.instances.append((f"{panel_name}_FRONT", panel_name, placement(FRONT_FACING, (0, t, 0))))
+                self.instances.append((f"{panel_name}_BACK", panel_name, placement(FRONT_FACING, (0, depth, 0))))
+            elif role == 'side':
+                self.instances.append((f"{panel_name}_LEFT", panel_name, placement(SIDE_FACING, (0, 0, 0))))
+                self.instances.append((f"{panel_name}_RIGHT", panel_name, placement(SIDE_FACING, (width - t, 0, 0))))
+            else:
+                self.instances.append((panel_name, panel_name, placement(FLAT, (spare_x, 0, 0))))
+                spare_x += extents[panel_name][0] + 50.0
+
+    def iter_instances(self):
+        """Iterate over ``(name, vertices, faces)`` with the vertices placed in the box"""
+        for instance_name, panel_name, transform in self.instances:
+            mesh = self.meshes[panel_name]
+            vertices = mesh.vertices @ transform[:3, :3].T + transform[:3, 3]
+            yield instance_name, vertices, mesh.faces
+
+    @property
+    def face_count(self):
+        return sum(len(self.meshes[panel_name].faces) for _, panel_name, _ in self.instances)
+
+    @property
+    def nbytes(self):
+        return sum(mesh.vertices.nbytes + mesh.faces.nbytes for mesh in self.meshes.values())
+
+    def to_trimesh(self):
+        """Combine the placed panels into one mesh, e.g. for a preview"""
+        parts = [trimesh.Trimesh(vertices, faces, process=False) for _, vertices, faces in self.iter_instances()]
+        return trimesh.util.concatenate(parts) if parts else trimesh.Trimesh()
+
+def build_box(profile, thickness, panel_cache=None):
+    """Extrude a scaled profile's panels and assemble them into a BoxModel"""
+    meshes, dropped = extrude_panels(parts_from_profile(profile), thickness, panel_cache)
+    return BoxModel(meshes, thickness, dropped)
+
+def format_dropped_slots(dropped_slots):
+    """Describe the slots missing from a BoxModel, e.g. for the status bar"""
+    return ', '.join(f"{slots} in {panel_name}" for panel_name, slots in sorted(dropped_slots.items()))
+
+@traced('export')
+def write_stl(model, filepath):
+    """Stream a BoxModel to a binary STL file, one panel at a time"""
+    with open(filepath, 'wb') as f:
+        f.write(b'Box model'.ljust(80, b' '))
+        f.write(np.uint32(model.face_count).tobytes())
+        for _, vertices, faces in model.iter_instances():
+            corners = vertices[faces]
+            normals = np.cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0])
+            lengths = np.linalg.norm(normals, axis=1, keepdims=True)
+            facets = np.zeros(len(faces), dtype=STL_FACET)
+            facets['normal'] = normals / np.where(lengths > 0, lengths, 1.0)
+            facets['vertices'] = corners
+            f.write(facets.tobytes())
+
+@traced('export')
+def write_obj(model, filepath):
+    """Stream a BoxModel to a Wavefront OBJ file, one object per panel"""
+    with open(filepath, 'w', encoding='utf-8') as f:
+        base = 1
+        for instance_name, vertices, faces in model.iter_instances():
+            f.write(f"o {instance_name}\n")
+            np.savetxt(f, vertices, fmt='v %.6f %.6f %.6f')
+            np.savetxt(f, faces + base, fmt='f %d %d %d')
+            base += len(vertices)
+
+def write_mesh(model, filepath, file_format=None):
+    """Write a BoxModel as STL or OBJ, by default chosen by the file extension"""
+    if file_format is None:
+        file_format = 'obj' if filepath.lower().endswith('.obj') else 'stl'
+    if file_format == 'obj':
+        write_obj(model, filepath)
+    else:
+        write_stl(model, filepath)
+
+class MeshCache:
+    """Box models per (profile, dimensions, thickness), built from scaled profiles
+
+    Dragging a spin box back and forth reuses the models already built,
+    like ProfileManager's cache of scaled profiles does for the 2D preview.
+    Panel meshes are also kept by shape, so a new dimension only extrudes
+    the panels it changes, e.g. a depth edit leaves the front and back.
+    """
+    def __init__(self, profile_manager, max_items=16, max_panels=256):
+        self.profile_manager = profile_manager
+        self.models = LRUCache(max_items=max_items)
+        self.panels = LRUCache(max_items=max_panels)
+
+    def box(self, profile_name, width, height, thickness):
+        """Get the box model of a profile at container dimensions in mm, or None"""
+        layout = self.profile_manager.layouts.get(profile_name)
+        key = (profile_name, layout.digest if layout else None, width, height, thickness)
+        model = self.models.get(key)
+        count('mesh_cache_hits' if model is not None else 'mesh_cache_misses')
+        if model is None:
+            scaled = self.profile_manager.scale_to_dimensions(profile_name, width, height, thickness)
+            if scaled is None:
+                return None
+            model = build_box(scaled, thickness, self.panels)
+            # The layout is known once the profile has been parsed
+            layout = self.profile_manager.layouts.get(profile_name)
+            self.models.put((profile_name, layout.digest if layout else None, width, height, thickness), model)
+        return model
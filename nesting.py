@@ -0,0 +1,398 @@
+import argparse
+import logging
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import numpy as np
+from geometry import Geometry
+from instrumentation import add_arguments, configure, count
+
+log = logging.getLogger(__name__)
+
+SHEET_LAYER = 'SHEET'
+
+class Part:
+    """A panel to cut, nested by its bounding rectangle
+
+    ``geometry`` holds the panel's polylines at their original position.
+    ``area`` is the material the panel actually uses, for the yield.
+    """
+    def __init__(self, name, geometry, area=None, rotatable=True):
+        self.name = name
+        self.geometry = geometry
+        self.bounds = geometry.bounds()
+        min_x, min_y, max_x, max_y = self.bounds
+        self.width = max_x - min_x
+        self.height = max_y - min_y
+        self.area = area if area is not None else self.width * self.height
+        self.rotatable = rotatable
+
+    def placed(self, x, y, rotated):
+        """Get the part's geometry with its lower-left corner moved to (x, y)"""
+        min_x, min_y, max_x, max_y = self.bounds
+        coords = self.geometry.coords
+        if rotated:
+            # Quarter turn counter-clockwise: (x, y) -> (-y, x)
+            coords = np.column_stack([max_y - coords[:, 1], coords[:, 0] - min_x])
+        else:
+            coords = coords - (min_x, min_y)
+        return self.geometry.with_coords(coords + (x, y))
+
+def polygon_area(points):
+    """Area of a polygon by the shoelace formula"""
+    points = np.asarray(points, dtype=np.float64)
+    x, y = points[:, 0], points[:, 1]
+    return 0.5 * abs(np.dot(x, np.roll(y, -1)) - np.dot(y, np.roll(x, -1)))
+
+def parts_from_panels(panels, prefix='', rotatable=True):
+    """Create parts from ``{'outline', 'slots', 'cutlines'}`` panels, as PanelScaler gives them"""
+    parts = []
+    for panel_name, panel_data in panels.items():
+        if not len(panel_data['outline']):
+            continue
+        polylines = [(panel_name, panel_data['outline'])]
+        polylines += [(f"{panel_name}_SLOT5_5", slot) for slot in panel_data.get('slots', [])]
+        polylines += [(f"{panel_name}_CUTLINE", cutline) for cutline in panel_data.get('cutlines', [])]
+        parts.append(Part(prefix + panel_name, Geometry.from_polylines(polylines),
+                          polygon_area(panel_data['outline']), rotatable))
+    return parts
+
+def parts_from_profile(profile, prefix='', rotatable=True):
+    """Create one part per panel of a profile Geometry, as scale_profile gives it
+
+    Panel layers are grouped by the name before their last ``_`` (the
+    ``_TL``/``_BR`` quadrants of one panel); each slot goes to the panel
+    whose bounds contain its centre, since slot layer names are not
+    reliable. A slot outside every panel goes to the nearest one, with a
+    warning, so no cut is lost. The quadrants are open polylines, so a
+    panel's area is its bounding rectangle.
+    """
+    polyline_bounds = profile.polyline_bounds()
+    groups = {}
+    slots = []
+    for index, (layer, points) in enumerate(profile.iter_polylines()):
+        if 'SLOT' in layer:
+            slots.append(index)
+        else:
+            groups.setdefault(layer.rsplit('_', 1)[0], []).append(index)
+
+    group_bounds = {}
+    for panel_name, indices in groups.items():
+        bounds = polyline_bounds[indices]
+        group_bounds[panel_name] = (*bounds[:, :2].min(axis=0), *bounds[:, 2:].max(axis=0))
+    panel_names = list(group_bounds)
+    boxes = np.array([group_bounds[panel_name] for panel_name in panel_names]).reshape(-1, 4)
+    for index in slots:
+        center_x = (polyline_bounds[index, 0] + polyline_bounds[index, 2]) / 2
+        center_y = (polyline_bounds[index, 1] + polyline_bounds[index, 3]) / 2
+        if not len(boxes):
+            # Without panels the slot is a part of its own
+            groups.setdefault(profile.layers[profile.layer_ids[index]], []).append(index)
+            continue
+        # Distance from the centre to each panel's bounds, zero inside them
+        dx = np.maximum(np.maximum(boxes[:, 0] - center_x, center_x - boxes[:, 2]), 0)
+        dy = np.maximum(np.maximum(boxes[:, 1] - center_y, center_y - boxes[:, 3]), 0)
+        distances = np.hypot(dx, dy)
+        nearest = int(distances.argmin())
+        if distances[nearest] > 0:
+            log.warning("Slot %s at (%.1f, %.1f) lies outside every panel, %.1f from %s",
+                        profile.layers[profile.layer_ids[index]], center_x, center_y,
+                        distances[nearest], panel_names[nearest])
+            count('slots_outside_panels')
+        groups[panel_names[nearest]].append(index)
+
+    parts = []
+    for panel_name, indices in groups.items():
+        polylines = [(profile.layers[profile.layer_ids[i]], profile.polyline(i)) for i in sorted(indices)]
+        parts.append(Part(prefix + panel_name, Geometry.from_polylines(polylines), rotatable=rotatable))
+    return parts
+
+class MaxRectsSheet:
+    """Free-space bookkeeping of one sheet with the MaxRects algorithm
+
+    The free space is a list of maximal ``(x, y, width, height)`` rectangles,
+    which may overlap. Placing a part splits every free rectangle it touches
+    and drops the ones contained in another.
+    """
+    def __init__(self, width, height):
+        self.free = [(0.0, 0.0, width, height)]
+        self.used_area = 0.0
+
+    def find(self, width, height, rotatable, heuristic):
+        """Find the best position for a part: ``(score, x, y, rotated)`` or None"""
+        best = None
+        sizes = [(width, height, False)]
+        if rotatable and width != height:
+            sizes.append((height, width, True))
+        for free_x, free_y, free_w, free_h in self.free:
+            for w, h, rotated in sizes:
+                if w > free_w + 1e-9 or h > free_h + 1e-9:
+                    continue
+                if heuristic == 'area':
+                    score = (free_w * free_h - w * h, min(free_w - w, free_h - h))
+                elif heuristic == 'bottom_left':
+                    score = (free_y + h, free_x)
+                else:  # short_side
+                    leftover_w, leftover_h = free_w - w, free_h - h
+                    score = (min(leftover_w, leftover_h), max(leftover_w, leftover_h))
+                if best is None or score < best[0]:
+                    best = (score, free_x, free_y, rotated)
+        return best
+
+    def place(self, x, y, width, height):
+        """Mark a rectangle as used"""
+        self.used_area += width * height
+        right, top = x + width, y + height
+        free = []
+        for free_x, free_y, free_w, free_h in self.free:
+            free_right, free_top = free_x + free_w, free_y + free_h
+            if x >= free_right or right <= free_x or y >= free_top or top <= free_y:
+                free.append((free_x, free_y, free_w, free_h))
+                continue
+            # Keep the parts of the free rectangle on each side of the placed one
+            if x > free_x:
+                free.append((free_x, free_y, x - free_x, free_h))
+            if right < free_right:
+                free.append((right, free_y, free_right - right, free_h))
+            if y > free_y:
+                free.append((free_x, free_y, free_w, y - free_y))
+            if top < free_top:
+                free.append((free_x, top, free_w, free_top - top))
+        self.free = [rect for i, rect in enumerate(free)
+                     if not any(j != i and _contains(other, rect) and (other != rect or j < i)
+                                for j, other in enumerate(free))]
+
+def _contains(outer, inner):
+    return (inner[0] >= outer[0] and inner[1] >= outer[1]
+            and inner[0] + inner[2] <= outer[0] + outer[2]
+            and inner[1] + inner[3] <= outer[1] + outer[3])
+
+def pack(sizes, order, sheet_size, heuristic='short_side'):
+    """Pack parts onto as few sheets as possible, in the given order
+
+    ``sizes`` holds ``(width, height, rotatable)`` per part, already grown by
+    the kerf. Each part goes on the first open sheet it fits, at the
+    position the heuristic scores best. Returns a list of sheets, each a
+    list of ``(part_index, x, y, rotated)``, and the sheets' used areas.
+    """
+    sheets = []
+    placements = []
+    smallest = min(min(w, h) for w, h, _ in sizes)
+    for index in order:
+        width, height, rotatable = sizes[index]
+        for sheet, sheet_placements in zip(sheets, placements):
+            found = sheet.find(width, height, rotatable, heuristic)
+            if found is not None:
+                break
+        else:
+            sheet = MaxRectsSheet(*sheet_size)
+            sheets.append(sheet)
+            placements.append([])
+            sheet_placements = placements[-1]
+            found = sheet.find(width, height, rotatable, heuristic)
+            if found is None:
+                raise ValueError(f"Part {index} ({width:.1f}x{height:.1f}) does not fit on the sheet")
+        _, x, y, rotated = found
+        if rotated:
+            width, height = height, width
+        sheet.place(x, y, width, height)
+        # Free rectangles too small for any part only slow the search down
+        sheet.free = [rect for rect in sheet.free if min(rect[2], rect[3]) >= smallest - 1e-9]
+        sheet_placements.append((index, x, y, rotated))
+    return placements, [sheet.used_area for sheet in sheets]
+
+def packing_score(used_areas):
+    """Fewer sheets first, then the emptiest possible last sheet, leaving the largest off-cut"""
+    return (len(used_areas), min(used_areas))
+
+SORT_KEYS = {
+    'area': lambda size: size[0] * size[1],
+    'long_side': lambda size: max(size[0], size[1]),
+    'perimeter': lambda size: size[0] + size[1],
+    'width': lambda size: size[0],
+    'height': lambda size: size[1],
+}
+HEURISTICS = ('short_side', 'area', 'bottom_left')
+
+def search(sizes, sheet_size, time_budget, seed=0, worker=0, workers=1):
+    """Search part orders and placement heuristics for the best packing
+
+    Every worker first tries its share of the sorted orders (largest first
+    by several measures, each with every heuristic), then improves its best
+    packing by swapping parts in the order until ``time_budget`` seconds have
+    passed. Returns ``(score, placements, iterations)``.
+    """
+    deadline = time.monotonic() + time_budget
+    rng = random.Random(seed)
+    strategies = [(key, heuristic) for key in SORT_KEYS for heuristic in HEURISTICS]
+    best = None
+    iterations = 0
+    for key, heuristic in strategies[worker::workers] or strategies[:1]:
+        order = sorted(range(len(sizes)), key=lambda i: SORT_KEYS[key](sizes[i]), reverse=True)
+        placements, used_areas = pack(sizes, order, sheet_size, heuristic)
+        iterations += 1
+        score = packing_score(used_areas)
+        if best is None or score < best[0]:
+            best = (score, placements, order, heuristic)
+
+    # Local search: swap two parts, keep the order if the packing is no worse
+    score, placements, order, heuristic = best
+    while len(order) > 1 and time.monotonic() < deadline:
+        candidate = list(order)
+        i, j = rng.sample(range(len(candidate)), 2)
+        candidate[i], candidate[j] = candidate[j], candidate[i]
+        candidate_placements, used_areas = pack(sizes, candidate, sheet_size, heuristic)
+        iterations += 1
+        candidate_score = packing_score(used_areas)
+        if candidate_score <= score:
+            score, placements, order = candidate_score, candidate_placements, candidate
+    return score, placements, iterations
+
+class NestResult:
+    """Parts placed on sheets, with the sheet count and material yield"""
+    def __init__(self, parts, sheet_width, sheet_height, margin, sheets, seconds, iterations):
+        self.parts = parts
+        self.sheet_width = sheet_width
+        self.sheet_height = sheet_height
+        self.margin = margin
+        self.sheets = sheets
+        self.seconds = seconds
+        self.iterations = iterations
+
+    @property
+    def sheet_count(self):
+        return len(self.sheets)
+
+    @property
+    def yield_ratio(self):
+        """Share of the stock used by parts"""
+        if not self.sheets:
+            return 0.0
+        part_area = sum(part.area for part in self.parts)
+        return float(part_area) / (self.sheet_count * self.sheet_width * self.sheet_height)
+
+    def sheet_outline(self):
+        """Get the stock border, a reference on the ``SHEET`` layer that is not cut"""
+        width, height = self.sheet_width, self.sheet_height
+        return SHEET_LAYER, [(0, 0), (width, 0), (width, height), (0, height), (0, 0)]
+
+    def sheet_geometry(self, sheet_index, outline=True):
+        """Get the parts of one sheet, moved into place, and the sheet outline unless ``outline`` is False"""
+        polylines = [self.sheet_outline()] if outline else []
+        for part_index, x, y, rotated in self.sheets[sheet_index]:
+            placed = self.parts[part_index].placed(x + self.margin, y + self.margin, rotated)
+            polylines.extend(placed.iter_polylines())
+        return Geometry.from_polylines(polylines)
+
+    def report(self):
+        return {
+            'parts': len(self.parts),
+            'sheets': self.sheet_count,
+            'yield': self.yield_ratio,
+            'seconds': self.seconds,
+            'iterations': self.iterations,
+        }
+
+def nest(parts, sheet_width, sheet_height, kerf=0.0, margin=0.0, time_budget=1.0,
+         workers=1, seed=0):
+    """Nest parts onto sheets of ``sheet_width`` x ``sheet_height``
+
+    Parts are kept ``kerf`` apart and ``margin`` away from the sheet edges.
+    The search runs for about ``time_budget`` seconds on ``workers``
+    processes, each exploring different orders, and the best packing wins.
+    """
+    start = time.perf_counter()
+    if not parts:
+        return NestResult(parts, sheet_width, sheet_height, margin, [], 0.0, 0)
+
+    # Every part claims its size plus one kerf; the usable area gets one back
+    # so parts may touch the margin on every side
+    sizes = [(part.width + kerf, part.height + kerf, part.rotatable) for part in parts]
+    sheet_size = (sheet_width - 2 * margin + kerf, sheet_height - 2 * margin + kerf)
+
+    results = []
+    if workers > 1:
+        try:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                futures = [pool.submit(search, sizes, sheet_size, time_budget, seed + worker, worker, workers)
+                           for worker in range(workers)]
+                results = [future.result() for future in futures]
+        except (OSError, NotImplementedError, BrokenProcessPool) as e:
+            log.warning("Parallel nesting failed (%s), falling back to a serial search", e)
+    if not results:
+        results = [search(sizes, sheet_size, time_budget, seed)]
+
+    best_score, best_placements, _ = min(results, key=lambda result: result[0])
+    iterations = sum(result[2] for result in results)
+    return NestResult(parts, sheet_width, sheet_height, margin, best_placements,
+                      time.perf_counter() - start, iterations)
+
+def parse_sheet_size(value):
+    """Parse a sheet size given as ``WIDTHxHEIGHT`` in mm"""
+    try:
+        width, height = (float(part) for part in value.lower().split('x'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Invalid sheet size: {value} (expected e.g. 2440x1220)")
+    return width, height
+
+def main(argv=None):
+    from batch_export import read_orders
+    from dxf_export import write_dxf
+    from profile_manager import ProfileManager
+    from toolpath import format_report, optimize_cut_order
+
+    parser = argparse.ArgumentParser(description="Nest the panels of a batch of orders onto stock sheets")
+    parser.add_argument('orders', help="CSV or JSONL file with id, profile, width, height, material")
+    parser.add_argument('-o', '--output-dir', default='nest', help="Directory for the sheet DXF files")
+    parser.add_argument('--sheet', type=parse_sheet_size, default=(2440.0, 1220.0), help="Sheet size in mm (default: 2440x1220)")
+    parser.add_argument('--kerf', type=float, default=3.0, help="Gap between parts in mm (default: 3)")
+    parser.add_argument('--margin', type=float, default=10.0, help="Unused border of the sheet in mm (default: 10)")
+    parser.add_argument('--time', type=float, default=2.0, help="Search time per material in seconds (default: 2)")
+    parser.add_argument('-j', '--workers', type=int, default=None, help="Search processes (default: one per CPU)")
+    parser.add_argument('--no-rotate', action='store_true', help="Keep every panel's orientation, e.g. for grain")
+    parser.add_argument('--optimize-cuts', action='store_true', help="Order each sheet's contours to cut slots first and minimize travel")
+    parser.add_argument('--dxf-dir', default=None, help="Profile library directory (default: assets/dxf)")
+    add_arguments(parser)
+    args = parser.parse_args(argv)
+    configure(args.log_level, args.trace)
+
+    manager = ProfileManager(lazy=True, dxf_dir=args.dxf_dir)
+    parts_by_material = {}
+    failed = 0
+    for order in read_orders(args.orders):
+        scaled = None
+        if 'error' not in order:
+            scaled = manager.scale_to_dimensions(order['profile'], order['width'],
+                                                 order['height'], order['material'])
+        if scaled is None:
+            log.warning("Order %s skipped: %s", order['id'], order.get('error', 'unknown profile'))
+            failed += 1
+            continue
+        parts = parts_from_profile(scaled, f"{order['id']}:", not args.no_rotate)
+        parts_by_material.setdefault(order['material'], []).extend(parts)
+
+    # Panels of different thickness never share a sheet
+    os.makedirs(args.output_dir, exist_ok=True)
+    workers = args.workers or os.cpu_count() or 1
+    sheet_width, sheet_height = args.sheet
+    for material, parts in sorted(parts_by_material.items()):
+        result = nest(parts, sheet_width, sheet_height, args.kerf, args.margin, args.time, workers)
+        for sheet_index in range(result.sheet_count):
+            filepath = os.path.join(args.output_dir, f"{material:g}mm_sheet{sheet_index + 1}.dxf")
+            # Only the parts are cut; the sheet outline is added back as a reference
+            sheet = result.sheet_geometry(sheet_index, outline=not args.optimize_cuts)
+            if args.optimize_cuts:
+                sheet, cut_report = optimize_cut_order(sheet)
+                sheet = Geometry.from_polylines([result.sheet_outline(), *sheet.iter_polylines()])
+                print(f"{os.path.basename(filepath)}: {format_report(cut_report)}")
+            write_dxf(sheet, filepath)
+        report = result.report()
+        print(f"{material:g} mm: {report['parts']} panels on {report['sheets']} sheets, "
+              f"{report['yield']:.1%} yield ({report['iterations']} packings in {report['seconds']:.2f}s)")
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,105 @@
+import numpy as np
+from instrumentation import count
+
+def same_value(a, b):
+    """Check whether a recomputed value equals the old one; arrays compare by content"""
+    if a is b:
+        return True
+    if isinstance(a, np.ndarray) or isinstance(b, np.ndarray):
+        return (isinstance(a, np.ndarray) and isinstance(b, np.ndarray)
+                and a.shape == b.shape and np.array_equal(a, b))
+    try:
+        return bool(a == b)
+    except (TypeError, ValueError):
+        # Containers of arrays cannot be compared cheaply; treat them as changed
+        return False
+
+class ParametricModel:
+    """Dependency graph from dimension parameters to the values derived from them
+
+    Parameters are inputs such as width or material thickness. Nodes compute
+    a value, e.g. a layer's offset or a scaled panel, from parameters and
+    earlier nodes, so insertion order is a dependency order. ``update``
+    recomputes only the nodes downstream of the parameters that changed and
+    stops where a recomputed value equals the old one, so an edit costs the
+    panels it touches instead of the whole design.
+    """
+    def __init__(self):
+        self.values = {}
+        self.inputs = {}
+        self.functions = {}
+        self.dependents = {}
+        self._position = {}
+
+    def add_parameter(self, name, value):
+        """Add an input parameter"""
+        if name in self.values:
+            raise ValueError(f"Duplicate name in model: {name}")
+        self.values[name] = value
+        self.dependents[name] = []
+
+    def add_node(self, name, function, inputs=()):
+        """Add a node computed as ``function(*input_values)`` and compute it"""
+        if name in self.values:
+            raise ValueError(f"Duplicate name in model: {name}")
+        inputs = tuple(inputs)
+        for input_name in inputs:
+            if input_name not in self.values:
+                raise ValueError(f"Node {name} depends on unknown {input_name}")
+            self.dependents[input_name].append(name)
+        self.inputs[name] = inputs
+        self.functions[name] = function
+        self.dependents[name] = []
+        self._position[name] = len(self._position)
+        self.values[name] = function(*[self.values[input_name] for input_name in inputs])
+
+    def __getitem__(self, name):
+        return self.values[name]
+
+    def __contains__(self, name):
+        return name in self.values
+
+    def nodes(self):
+        """List the nodes in dependency order"""
+        return list(self._position)
+
+    def affected(self, names):
+        """Get every node downstream of the given parameters or nodes, in dependency order"""
+        seen = set()
+        stack = list(names)
+        while stack:
+            for dependent in self.dependents[stack.pop()]:
+                if dependent not in seen:
+                    seen.add(dependent)
+                    stack.append(dependent)
+        return sorted(seen, key=self._position.__getitem__)
+
+    def update(self, **parameters):
+        """Set parameters and recompute what depends on them
+
+        Returns the nodes whose value changed, in dependency order; those are
+        the only ones to redraw or export again.
+        """
+        changed = set()
+        for name, value in parameters.items():
+            if name not in self.dependents or name in self.functions:
+                raise KeyError(name)
+            if not same_value(self.values[name], value):
+                self.values[name] = value
+                changed.add(name)
+        if not changed:
+            return []
+
+        updated = []
+        for node in self.affected(changed):
+            inputs = self.inputs[node]
+            if not any(input_name in changed for input_name in inputs):
+                continue
+            value = self.functions[node](*[self.values[input_name] for input_name in inputs])
+            count('parametric_recomputed')
+            if same_value(self.values[node], value):
+                continue
+            self.values[node] = value
+            changed.add(node)
+            updated.append(node)
+        return updated
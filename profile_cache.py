@@ -0,0 +1,176 @@
+import hashlib
+import logging
+import os
+import struct
+import tempfile
+import numpy as np
+from geometry import Geometry
+from instrumentation import count
+
+log = logging.getLogger(__name__)
+
+class ProfileCache:
+    """On-disk cache of the layer geometry extracted from DXF profiles
+
+    Each DXF file gets one binary entry in the cache directory, named after a
+    hash of its absolute path. An entry records the file size, modification
+    time and SHA-256 of the DXF content followed by the profile's Geometry:
+    layer names, then the layer id and offset arrays and one packed float64
+    array of all coordinates, which are read back without copying.
+    """
+    MAGIC = b'VCPC'
+    VERSION = 2
+    HEADER = struct.Struct('<4sHQq32sH')
+    COUNTS = struct.Struct('<III')
+
+    def __init__(self, cache_dir=None):
+        if cache_dir is None:
+            cache_dir = os.path.join('assets', 'cache')
+        self.cache_dir = cache_dir
+        self.stats = {'hits': 0, 'misses': 0, 'rebuilds': 0}
+
+    def entry_path(self, filepath):
+        """Get the cache entry path for a DXF file"""
+        key = hashlib.sha1(os.path.abspath(filepath).encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, key + '.bin')
+
+    @staticmethod
+    def file_digest(filepath):
+        """Compute the SHA-256 digest of a file's content"""
+        digest = hashlib.sha256()
+        with open(filepath, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+        return digest.digest()
+
+    def load(self, filepath):
+        """Load a profile from the cache, or return None if it must be parsed
+
+        Entries whose size and mtime still match are used directly. If only
+        the timestamps changed but the content hash is the same, the entry is
+        refreshed and used. Otherwise the entry is stale and removed.
+        """
+        entry = self.entry_path(filepath)
+        try:
+            with open(entry, 'rb') as f:
+                data = f.read()
+        except OSError:
+            self.stats['misses'] += 1
+            count('profile_cache_misses')
+            return None
+
+        try:
+            header = self._read_header(data, filepath)
+            if header is not None:
+                profile = self._read_layers(data, header[3])
+        except (ValueError, struct.error):
+            header = None
+        if header is None:
+            # Corrupt, outdated or colliding entry
+            self._discard(entry)
+            self.stats['misses'] += 1
+            count('profile_cache_misses')
+            return None
+
+        size, mtime_ns, digest, _ = header
+        stat = os.stat(filepath)
+        if stat.st_size != size or stat.st_mtime_ns != mtime_ns:
+            if stat.st_size != size or self.file_digest(filepath) != digest:
+                self._discard(entry)
+                self.stats['rebuilds'] += 1
+                count('profile_cache_rebuilds')
+                return None
+            # Content unchanged, only the timestamp moved: refresh the stamp
+            try:
+                self._write(entry, filepath, stat, digest, profile)
+            except OSError as e:
+                log.warning("Could not refresh cache entry for %s: %s", filepath, e)
+
+        self.stats['hits'] += 1
+        count('profile_cache_hits')
+        return profile
+
+    def store(self, filepath, profile, stat=None, digest=None):
+        """Store a parsed profile in the cache
+
+        ``stat`` and ``digest`` should be taken before the file was parsed so
+        that a concurrent save invalidates the entry on the next load.
+        """
+        if stat is None:
+            stat = os.stat(filepath)
+        if digest is None:
+            digest = self.file_digest(filepath)
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            self._write(self.entry_path(filepath), filepath, stat, digest, profile)
+        except OSError as e:
+            log.warning("Could not write cache entry for %s: %s", filepath, e)
+
+    def clear(self):
+        """Remove all cache entries"""
+        if not os.path.isdir(self.cache_dir):
+            return
+        for filename in os.listdir(self.cache_dir):
+            if filename.endswith('.bin'):
+                self._discard(os.path.join(self.cache_dir, filename))
+
+    def _read_header(self, data, filepath):
+        magic, version, size, mtime_ns, digest, path_len = self.HEADER.unpack_from(data, 0)
+        if magic != self.MAGIC or version != self.VERSION:
+            return None
+        offset = self.HEADER.size
+        path = data[offset:offset + path_len].decode('utf-8')
+        if path != os.path.abspath(filepath):
+            return None
+        return size, mtime_ns, digest, offset + path_len
+
+    def _read_layers(self, data, offset):
+        layer_count, polyline_count, vertex_count = self.COUNTS.unpack_from(data, offset)
+        offset += self.COUNTS.size
+        layers = []
+        for _ in range(layer_count):
+            (name_len,) = struct.unpack_from('<H', data, offset)
+            offset += 2
+            layers.append(data[offset:offset + name_len].decode('utf-8'))
+            offset += name_len
+
+        layer_ids = np.frombuffer(data, '<i4', polyline_count, offset)
+        offset += layer_ids.nbytes
+        offsets = np.frombuffer(data, '<i8', polyline_count + 1, offset)
+        offset += offsets.nbytes
+        coords = np.frombuffer(data, '<f8', 2 * vertex_count, offset)
+        return Geometry(coords, offsets, layer_ids, layers)
+
+    def _write(self, entry, filepath, stat, digest, profile):
+        path = os.path.abspath(filepath).encode('utf-8')
+        parts = [
+            self.HEADER.pack(self.MAGIC, self.VERSION, stat.st_size,
+                             stat.st_mtime_ns, digest, len(path)),
+            path,
+            self.COUNTS.pack(len(profile.layers), profile.polyline_count, len(profile.coords)),
+        ]
+        for layer in profile.layers:
+            name = layer.encode('utf-8')
+            parts.append(struct.pack('<H', len(name)))
+            parts.append(name)
+        parts.append(profile.layer_ids.astype('<i4').tobytes())
+        parts.append(profile.offsets.astype('<i8').tobytes())
+        parts.append(profile.coords.astype('<f8').tobytes())
+
+        # Write to a uniquely named temporary file first so readers never see
+        # partial entries and concurrent writers of one entry never collide
+        tmp = tempfile.NamedTemporaryFile(dir=os.path.dirname(entry), suffix='.tmp', delete=False)
+        try:
+            with tmp:
+                tmp.write(b''.join(parts))
+            os.replace(tmp.name, entry)
+        except OSError:
+            self._discard(tmp.name)
+            raise
+
+    @staticmethod
+    def _discard(entry):
+        try:
+            os.remove(entry)
+        except OSError:
+            pass
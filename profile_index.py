@@ -0,0 +1,121 @@
+import json
+import os
+import sys
+import threading
+from collections.abc import Mapping
+from lru import LRUCache
+
+def profile_nbytes(profile):
+    """Estimate the memory held by a profile's geometry"""
+    return sys.getsizeof(profile) + profile.nbytes
+
+def profile_info(name, filepath, profile):
+    """Summarize a profile as its name, file, layer names and bounding box"""
+    bounds = profile.bounds()
+    return {
+        'name': name,
+        'file': os.path.basename(filepath),
+        'layers': list(profile.layers),
+        'bbox': [float(v) for v in bounds] if bounds is not None else None
+    }
+
+class ProfileManifest:
+    """Small JSON index of the profiles in a template library
+
+    The manifest lists each profile's DXF file, layer names and bounding box
+    so a library can be browsed without parsing any DXF. File names are
+    relative to the directory holding the manifest.
+    """
+    def __init__(self, path, entries=None):
+        self.path = path
+        self.entries = entries if entries is not None else {}
+
+    @classmethod
+    def load(cls, path):
+        """Read a manifest from disk"""
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        entries = {entry['name']: entry for entry in data.get('profiles', [])}
+        return cls(path, entries)
+
+    def save(self):
+        """Write the manifest to disk"""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'profiles': list(self.entries.values())}, f)
+        os.replace(tmp_path, self.path)
+
+    def filepaths(self):
+        """Map profile names to their DXF paths, in manifest order"""
+        directory = os.path.dirname(self.path)
+        return {name: os.path.join(directory, entry['file'])
+                for name, entry in self.entries.items()}
+
+    def get(self, name):
+        return self.entries.get(name)
+
+    def __contains__(self, name):
+        return name in self.entries
+
+class LazyProfiles(Mapping):
+    """Profile mapping that parses each profile on first access
+
+    Profile names are known up front; parsed profiles are kept in a bounded
+    LRU so resident memory stays within ``memory_budget`` bytes no matter how
+    large the library is. ``loader`` takes a DXF path and returns the parsed
+    profile, or None if it could not be loaded.
+
+    Safe to use from several threads: each profile is parsed by one thread
+    while others asking for it wait, and different profiles parse in
+    parallel.
+    """
+    def __init__(self, filepaths, loader, max_profiles=None, memory_budget=None):
+        self.filepaths = dict(filepaths)
+        self.loader = loader
+        self.resident = LRUCache(max_profiles, memory_budget, sizeof=profile_nbytes)
+        self._lock = threading.Lock()
+        self._profile_locks = {}
+
+    def _profile_lock(self, name):
+        with self._lock:
+            return self._profile_locks.setdefault(name, threading.Lock())
+
+    def __getitem__(self, name):
+        profile = self.resident.get(name)
+        if profile is None:
+            with self._profile_lock(name):
+                # Another thread may have parsed it while this one waited
+                profile = self.resident.get(name)
+                if profile is None:
+                    profile = self.loader(self.filepaths[name])
+                    if profile is None:
+                        raise KeyError(name)
+                    self.resident.put(name, profile)
+        return profile
+
+    def add(self, name, filepath, profile=None):
+        """Register a profile file, optionally with its parsed geometry"""
+        with self._profile_lock(name):
+            self.filepaths[name] = filepath
+            if profile is not None:
+                self.resident.put(name, profile)
+            else:
+                self.resident.pop(name)
+
+    def remove(self, name):
+        """Forget a profile file and its parsed geometry"""
+        with self._profile_lock(name):
+            self.filepaths.pop(name, None)
+            self.resident.pop(name)
+
+    def __contains__(self, name):
+        return name in self.filepaths
+
+    def __iter__(self):
+        return iter(self.filepaths)
+
+    def __len__(self):
+        return len(self.filepaths)
@@ -0,0 +1,113 @@
+import hashlib
+import numpy as np
+from parametric import ParametricModel
+
+class ProfileLayout:
+    """Panel bounds, gaps and left/top classification of a profile
+
+    Everything ``ProfileManager.scale_profile`` needs that does not depend on
+    the scale factors is computed once here, so scaling a profile only adds
+    two offsets to its coordinates. ``digest`` identifies the geometry the
+    layout was computed for.
+    """
+    def __init__(self, profile):
+        self.digest = geometry_digest(profile)
+
+        # Find the original dimensions and panel positions
+        self.panel_positions = {}
+        for layer, (min_x, min_y, max_x, max_y) in profile.layer_bounds().items():
+            if 'SLOT' in layer:
+                continue
+
+            # Store panel dimensions and position
+            self.panel_positions[layer] = {
+                'min_x': min_x,
+                'max_x': max_x,
+                'min_y': min_y,
+                'max_y': max_y,
+                'width': max_x - min_x,
+                'height': max_y - min_y
+            }
+
+        # Classify the panels
+        positions = self.panel_positions
+        self.left_panels = [p for p in positions.keys() if 'L' in p]
+        self.right_panels = [p for p in positions.keys() if 'R' in p]
+        self.top_panels = [p for p in positions.keys() if 'T' in p]
+        self.bottom_panels = [p for p in positions.keys() if 'B' in p]
+
+        # Get the original gaps
+        self.error = None
+        try:
+            self.horizontal_gap = min(positions[r]['min_x'] for r in self.right_panels) - max(positions[l]['max_x'] for l in self.left_panels)
+            self.vertical_gap = min(positions[t]['min_y'] for t in self.top_panels) - max(positions[b]['max_y'] for b in self.bottom_panels)
+        except ValueError as e:
+            # Scaling needs panels on every side; report it when scaling is asked for
+            self.horizontal_gap = self.vertical_gap = None
+            self.error = e
+
+        # Slots stay put; other panels move unless they are left (X) or top (Y) panels
+        self.moves_x = np.array([not ('SLOT' in layer or 'L' in layer) for layer in profile.layers], dtype=bool)
+        self.moves_y = np.array([not ('SLOT' in layer or 'T' in layer) for layer in profile.layers], dtype=bool)
+
+    def scale(self, profile, scale_x, scale_y):
+        """Move the profile's panels apart for the given scale factors"""
+        if self.error is not None:
+            raise ValueError(f"Cannot scale profile: {str(self.error)}")
+
+        # Calculate new gaps based on scaling
+        x_offset = self.x_offset(scale_x)
+        y_offset = self.y_offset(scale_y)
+        layer_offsets = np.column_stack([np.where(self.moves_x, x_offset, 0.0),
+                                         np.where(self.moves_y, y_offset, 0.0)])
+
+        # Move every polyline by its layer's offset in one operation
+        vertex_offsets = np.repeat(layer_offsets[profile.layer_ids], profile.counts, axis=0)
+        return profile.with_coords(profile.coords + vertex_offsets)
+
+    def x_offset(self, scale_x):
+        """How far the panels that move in X move at a scale factor"""
+        return self.horizontal_gap * scale_x - self.horizontal_gap
+
+    def y_offset(self, scale_y):
+        """How far the panels that move in Y move at a scale factor"""
+        return self.vertical_gap * scale_y - self.vertical_gap
+
+    def model(self, profile, width, height, material_thickness):
+        """Build the parametric model of a profile at container dimensions in mm
+
+        Node ``layer:{layer}`` holds the ``(dx, dy)`` that ``scale`` adds to a
+        layer for ``ProfileManager.scale_to_dimensions``. It depends on the
+        width only for layers that move in X, on the height only for those
+        that move in Y, and on nothing for slots. The material thickness
+        moves nothing in 2D.
+        """
+        if self.error is not None:
+            raise ValueError(f"Cannot scale profile: {str(self.error)}")
+
+        model = ParametricModel()
+        model.add_parameter('width', width)
+        model.add_parameter('height', height)
+        model.add_parameter('material_thickness', material_thickness)
+        model.add_node('x_offset', lambda width: self.x_offset(width / 1000), ('width',))
+        model.add_node('y_offset', lambda height: self.y_offset(height / 1000), ('height',))
+        for layer_id, layer in enumerate(profile.layers):
+            moves_x, moves_y = self.moves_x[layer_id], self.moves_y[layer_id]
+            if moves_x and moves_y:
+                model.add_node(f"layer:{layer}", lambda dx, dy: (dx, dy), ('x_offset', 'y_offset'))
+            elif moves_x:
+                model.add_node(f"layer:{layer}", lambda dx: (dx, 0.0), ('x_offset',))
+            elif moves_y:
+                model.add_node(f"layer:{layer}", lambda dy: (0.0, dy), ('y_offset',))
+            else:
+                model.add_node(f"layer:{layer}", lambda: (0.0, 0.0))
+        return model
+
+def geometry_digest(geometry):
+    """Hash a geometry's layers, polylines and coordinates"""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update('\0'.join(geometry.layers).encode('utf-8'))
+    digest.update(geometry.layer_ids.tobytes())
+    digest.update(geometry.offsets.tobytes())
+    digest.update(geometry.coords.tobytes())
+    return digest.hexdigest()
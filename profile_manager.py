@@ -1,154 +1,386 @@
-import ezdxf
+import logging
 import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from dxf_stream import DXFStreamError, read_geometry_ezdxf, read_polylines
+from geometry import Geometry
+from geometry_store import GeometryStore, default_store_path
+from instrumentation import count, span, traced
+from profile_cache import ProfileCache
+from lru import LRUCache
+from profile_index import LazyProfiles, ProfileManifest, profile_info
+from profile_layout import ProfileLayout
+
+log = logging.getLogger(__name__)
+
+def profile_name_from_path(filepath):
+    """Get the profile name for a DXF file"""
+    return os.path.splitext(os.path.basename(filepath))[0]
+
+def read_profile(filepath):
+    """Parse the layer geometry of a DXF profile
+    
+    Uses the streaming reader; files it cannot read, such as binary DXF,
+    fall back to a full ezdxf document.
+    """
+    # Get profile name from filename
+    profile_name = profile_name_from_path(filepath)
+    log.info("Loading profile: %s", profile_name)
+    
+    with span('read_profile', 'parse', file=filepath) as parse_span:
+        # Collect every polyline, keeping all polylines of a layer
+        polylines = []
+        
+        # Per-entity detail is only formatted when debug logging is on
+        verbose = log.isEnabledFor(logging.DEBUG)
+        try:
+            for layer, entity_type, points in read_polylines(filepath):
+                if verbose:
+                    log.debug("Found %s in layer %s with %d points", entity_type, layer, len(points))
+                polylines.append((layer, points))
+            profile = Geometry.from_polylines(polylines)
+        except DXFStreamError as e:
+            log.warning("Streaming read of %s failed (%s), reading with ezdxf", filepath, e)
+            profile = read_geometry_ezdxf(filepath)
+        parse_span.set(polylines=profile.polyline_count, vertices=len(profile.coords))
+    count('vertices_parsed', len(profile.coords))
+    
+    # Log summary
+    log.info("Profile %s loaded with %d layers", profile_name, len(profile))
+    if verbose:
+        for layer in profile:
+            points = profile.polylines(layer)
+            log.debug("- %s: %d points in %d polylines", layer, sum(len(p) for p in points), len(points))
+    
+    return profile
 
 class ProfileManager:
-    def __init__(self):
+    DEFAULT_MEMORY_BUDGET = 64 * 1024 * 1024
+
+    def __init__(self, use_cache=True, cache_dir=None, workers=1, lazy=False,
+                 manifest_path=None, max_profiles=None, memory_budget=DEFAULT_MEMORY_BUDGET,
+                 dxf_dir=None, scale_cache_size=256, use_store=True, store_path=None):
+        """Create the manager and load the profile library from ``dxf_dir``
+        (assets/dxf by default)
+        
+        In lazy mode only the profile names are discovered up front, from the
+        manifest at ``manifest_path`` if given or else from the directory.
+        Profiles are parsed when first requested and kept in an LRU bounded by
+        ``max_profiles`` and ``memory_budget`` bytes. Up to ``scale_cache_size``
+        scaled results are kept for reuse.
+        
+        Profiles found unchanged in the geometry store at ``store_path``
+        (``geometry_store.default_store_path`` by default) are mapped from it
+        instead of parsed; other files are parsed as usual.
+        """
         self.profiles = {}
+        self.dxf_dir = dxf_dir if dxf_dir is not None else os.path.join('assets', 'dxf')
+        self.workers = workers
+        self.cache = ProfileCache(cache_dir) if use_cache else None
+        self.store = None
+        if use_store:
+            self.store = GeometryStore.open(store_path or default_store_path(self.dxf_dir))
+        self.lazy = lazy
+        self.manifest = ProfileManifest.load(manifest_path) if manifest_path else None
+        self.max_profiles = max_profiles
+        self.memory_budget = memory_budget
+        self.info = {}
+        self.layouts = {}
+        self.scaled_cache = LRUCache(max_items=scale_cache_size)
+        # Keeps a profile and its layout consistent while they are swapped
+        self._lock = threading.RLock()
         self.load_profiles()
 
-    def load_profiles(self):
-        """Load all DXF profiles from the assets/dxf directory"""
-        dxf_dir = os.path.join('assets', 'dxf')
-        print(f"Loading profiles from: {dxf_dir}")
+    @traced('load')
+    def load_profiles(self, workers=None):
+        """Load all DXF profiles from the profile directory
+        
+        ``workers`` overrides the worker count given to the constructor.
+        """
+        if self.lazy and self.manifest is not None:
+            log.info("Indexing profiles from manifest: %s", self.manifest.path)
+            self.profiles = LazyProfiles(self.manifest.filepaths(), self._parse_profile,
+                                         self.max_profiles, self.memory_budget)
+            return
+        
+        dxf_dir = self.dxf_dir
+        log.info("Loading profiles from: %s", dxf_dir)
         
         # Create directory if it doesn't exist
         if not os.path.exists(dxf_dir):
             os.makedirs(dxf_dir)
-            print(f"Created directory: {dxf_dir}")
+            log.info("Created directory: %s", dxf_dir)
             return
 
-        # Load all DXF files
+        # Find all DXF files
+        filepaths = []
         for filename in os.listdir(dxf_dir):
             if filename.endswith('.dxf'):
-                print(f"Found DXF file: {filename}")
-                filepath = os.path.join(dxf_dir, filename)
+                log.debug("Found DXF file: %s", filename)
+                filepaths.append(os.path.join(dxf_dir, filename))
+        
+        if self.lazy:
+            names = {profile_name_from_path(filepath): filepath for filepath in filepaths}
+            self.profiles = LazyProfiles(names, self._parse_profile,
+                                         self.max_profiles, self.memory_budget)
+            log.info("Indexed %d profiles, parsing on demand", len(names))
+            return
+        
+        if workers is None:
+            workers = self.workers
+        if workers is None:
+            workers = os.cpu_count() or 1
+        
+        # Load all DXF files
+        if workers > 1 and len(filepaths) > 1:
+            self.load_profiles_parallel(filepaths, workers)
+        else:
+            for filepath in filepaths:
                 self.load_profile(filepath)
+        
+        if self.cache is not None:
+            stats = self.cache.stats
+            log.info("Profile cache: %d hits, %d misses, %d rebuilds",
+                     stats['hits'], stats['misses'], stats['rebuilds'])
 
+    @traced('load')
+    def load_profiles_parallel(self, filepaths, workers):
+        """Load DXF profiles by parsing them across a process pool
+        
+        Cached profiles are read in this process; only the remaining files are
+        sent to the workers, which return plain layer geometry. Profiles are
+        added in the order of ``filepaths`` so the result matches a serial load.
+        """
+        results = {}
+        pending = {}
+        for filepath in filepaths:
+            try:
+                profile, stamp = self._load_cached(filepath)
+            except Exception as e:
+                log.error("Error loading profile %s: %s", filepath, e)
+                continue
+            if profile is not None:
+                results[filepath] = profile
+            else:
+                pending[filepath] = stamp
+        
+        if len(pending) > 1:
+            try:
+                with ProcessPoolExecutor(max_workers=min(workers, len(pending))) as pool:
+                    futures = {pool.submit(read_profile, filepath): filepath for filepath in pending}
+                    for future in as_completed(futures):
+                        filepath = futures[future]
+                        try:
+                            profile = future.result()
+                        except BrokenProcessPool:
+                            raise
+                        except Exception as e:
+                            log.error("Error loading profile %s: %s", filepath, e, exc_info=e)
+                            continue
+                        results[filepath] = profile
+                        self._store_cached(filepath, profile, pending[filepath])
+            except (OSError, NotImplementedError, BrokenProcessPool) as e:
+                log.warning("Parallel loading failed (%s), falling back to serial loading", e)
+        
+        # Parse whatever the pool did not handle in this process
+        for filepath, stamp in pending.items():
+            if filepath in results:
+                continue
+            try:
+                profile = read_profile(filepath)
+            except Exception as e:
+                log.exception("Error loading profile %s: %s", filepath, e)
+                continue
+            results[filepath] = profile
+            self._store_cached(filepath, profile, stamp)
+        
+        for filepath in filepaths:
+            if filepath in results:
+                profile_name = profile_name_from_path(filepath)
+                self.profiles[profile_name] = results[filepath]
+                self._prepare(profile_name, filepath, results[filepath])
+
+    @traced('load')
     def load_profile(self, filepath):
         """Load a single DXF profile from file"""
+        profile = self._parse_profile(filepath)
+        if profile is None:
+            return
+        profile_name = profile_name_from_path(filepath)
+        if self.lazy:
+            self.profiles.add(profile_name, filepath, profile)
+        else:
+            self.profiles[profile_name] = profile
+
+    def _parse_profile(self, filepath):
+        """Get a profile's geometry from the cache or the DXF file, or None on error"""
         try:
-            # Read DXF file
-            doc = ezdxf.readfile(filepath)
-            msp = doc.modelspace()
-            
-            # Get profile name from filename
-            profile_name = os.path.splitext(os.path.basename(filepath))[0]
-            print(f"\nLoading profile: {profile_name}")
-            
-            # Initialize empty profile
-            self.profiles[profile_name] = {}
-            
-            # Process all entities
-            print("Processing entities...")
-            for entity in msp:
-                # Get entity type and layer
-                entity_type = entity.dxftype()
-                layer = entity.dxf.layer
-                
-                # Skip if not a polyline
-                if entity_type not in ['LWPOLYLINE', 'POLYLINE']:
-                    continue
-                
-                print(f"Found {entity_type} in layer: {layer}")
-                
-                # Get points based on entity type
-                try:
-                    if entity_type == 'LWPOLYLINE':
-                        points = [(point[0], point[1]) for point in entity.get_points()]
-                    else:  # POLYLINE
-                        points = [(vertex[0], vertex[1]) for vertex in entity.points()]
-                    
-                    # Store points in profile
-                    if points:
-                        self.profiles[profile_name][layer] = points
-                        print(f"Added {len(points)} points to layer {layer}")
-                        print(f"First point: {points[0]}")
-                        print(f"Last point: {points[-1]}")
-                except Exception as e:
-                    print(f"Error processing points in layer {layer}: {str(e)}")
-            
-            # Print summary
-            print(f"\nProfile {profile_name} loaded with {len(self.profiles[profile_name])} layers:")
-            for layer, points in self.profiles[profile_name].items():
-                print(f"- {layer}: {len(points)} points")
+            profile = self._read_profile(filepath)
+            self._prepare(profile_name_from_path(filepath), filepath, profile)
+            return profile
             
         except Exception as e:
-            print(f"Error loading profile {filepath}: {str(e)}")
-            import traceback
-            traceback.print_exc()
+            log.exception("Error loading profile %s: %s", filepath, e)
+            return None
+
+    def _read_profile(self, filepath):
+        """Get a profile's geometry from the cache or else parse the DXF file"""
+        profile, stamp = self._load_cached(filepath)
+        if profile is None:
+            profile = read_profile(filepath)
+            self._store_cached(filepath, profile, stamp)
+        return profile
+
+    @traced('load')
+    def read_profiles(self, filepaths):
+        """Parse DXF files without adding them, e.g. to reload changed files
+        
+        Returns ``{profile_name: (filepath, profile, info, layout)}`` for
+        ``swap_profiles``; files that fail to parse, such as one still being
+        saved, are logged and left out.
+        """
+        loaded = {}
+        for filepath in filepaths:
+            profile_name = profile_name_from_path(filepath)
+            try:
+                profile = self._read_profile(filepath)
+            except Exception as e:
+                log.warning("Could not reload profile %s: %s", filepath, e)
+                continue
+            loaded[profile_name] = (filepath, profile, profile_info(profile_name, filepath, profile),
+                                    ProfileLayout(profile))
+        return loaded
+
+    def swap_profiles(self, loaded, removed=()):
+        """Replace, add and remove profiles in one step
+        
+        ``loaded`` comes from ``read_profiles``. Other profiles, and the
+        scaled results of unchanged ones, are kept; scaled results of a
+        replaced profile are keyed by its old layout and no longer match.
+        """
+        with self._lock:
+            for profile_name, (filepath, profile, info, layout) in loaded.items():
+                if self.lazy:
+                    self.profiles.add(profile_name, filepath, profile)
+                else:
+                    self.profiles[profile_name] = profile
+                self.info[profile_name] = info
+                self.layouts[profile_name] = layout
+            for profile_name in removed:
+                if self.lazy:
+                    self.profiles.remove(profile_name)
+                else:
+                    self.profiles.pop(profile_name, None)
+                self.info.pop(profile_name, None)
+                self.layouts.pop(profile_name, None)
+
+    def _prepare(self, profile_name, filepath, profile):
+        """Record a loaded profile's summary and precompute its scaling layout"""
+        self.info[profile_name] = profile_info(profile_name, filepath, profile)
+        self.layouts[profile_name] = ProfileLayout(profile)
+
+    def _load_cached(self, filepath):
+        """Get a profile from the store or the cache, plus the file stamp to cache it under"""
+        if self.store is not None:
+            profile = self.store.load(filepath)
+            if profile is not None:
+                log.info("Mapped profile %s from the geometry store", profile_name_from_path(filepath))
+                return profile, None
+        
+        if self.cache is None:
+            return None, None
+        
+        # Use the cached geometry if the file has not changed
+        profile = self.cache.load(filepath)
+        if profile is not None:
+            log.info("Loaded profile %s from cache with %d layers", profile_name_from_path(filepath), len(profile))
+            return profile, None
+        
+        # Stamp the file before parsing so a concurrent save invalidates the entry
+        return None, (os.stat(filepath), self.cache.file_digest(filepath))
+
+    def _store_cached(self, filepath, profile, stamp):
+        if self.cache is not None:
+            self.cache.store(filepath, profile, *stamp)
 
     def scale_profile(self, profile_name, scale_x, scale_y, reference_y=None):
-        """Scale a profile's points based on scaling factors"""
+        """Scale a profile's points based on scaling factors
+        
+        Results are shared, read-only Geometry objects kept in an LRU keyed by
+        profile, scale factors and reference, so repeated sizes are free.
+        """
         if profile_name not in self.profiles:
             return None
-            
-        scaled_profile = {}
-        original_profile = self.profiles[profile_name]
         
-        # First, find the original dimensions and panel positions
-        panel_positions = {}
-        for layer, points in original_profile.items():
-            if not points or 'SLOT' in layer:
-                continue
-                
-            # Get the bounding box of this panel
-            min_x = min(p[0] for p in points)
-            max_x = max(p[0] for p in points)
-            min_y = min(p[1] for p in points)
-            max_y = max(p[1] for p in points)
-            
-            # Store panel dimensions and position
-            panel_positions[layer] = {
-                'min_x': min_x,
-                'max_x': max_x,
-                'min_y': min_y,
-                'max_y': max_y,
-                'width': max_x - min_x,
-                'height': max_y - min_y
-            }
-        
-        # Calculate the gaps between panels
-        left_panels = [p for p in panel_positions.keys() if 'L' in p]
-        right_panels = [p for p in panel_positions.keys() if 'R' in p]
-        top_panels = [p for p in panel_positions.keys() if 'T' in p]
-        bottom_panels = [p for p in panel_positions.keys() if 'B' in p]
-        
-        # Get the original gaps
-        original_horizontal_gap = min(panel_positions[r]['min_x'] for r in right_panels) - max(panel_positions[l]['max_x'] for l in left_panels)
-        original_vertical_gap = min(panel_positions[t]['min_y'] for t in top_panels) - max(panel_positions[b]['max_y'] for b in bottom_panels)
-        
-        # Calculate new gaps based on scaling
-        new_horizontal_gap = original_horizontal_gap * scale_x
-        new_vertical_gap = original_vertical_gap * scale_y
-        
-        # Process each layer
-        for layer, points in original_profile.items():
-            if not points:
-                continue
-                
-            if 'SLOT' in layer:
-                # Keep slots in their original position
-                scaled_points = points
-            else:
-                # For panels, keep their shape but move them based on their position
-                is_left = 'L' in layer
-                is_top = 'T' in layer
-                
-                # Calculate offset based on panel position
-                x_offset = 0 if is_left else new_horizontal_gap - original_horizontal_gap
-                y_offset = 0 if is_top else new_vertical_gap - original_vertical_gap
-                
-                # Move the panel without adding any connecting lines
-                scaled_points = [(x + x_offset, y + y_offset) for x, y in points]
-            
-            scaled_profile[layer] = scaled_points
-            
+        # The layout is computed when the profile is loaded; a lazy profile
+        # that was never parsed is parsed here
+        layout = self.layouts.get(profile_name)
+        if layout is None:
+            if self.profiles.get(profile_name) is None:
+                return None
+            layout = self.layouts[profile_name]
+        
+        key = (profile_name, layout.digest, scale_x, scale_y, reference_y)
+        scaled_profile = self.scaled_cache.get(key)
+        count('scale_cache_hits' if scaled_profile is not None else 'scale_cache_misses')
+        if scaled_profile is None:
+            with self._lock:
+                original_profile = self.profiles.get(profile_name)
+                if original_profile is None:
+                    return None
+                # A lazy profile may have been re-parsed from a changed file
+                layout = self.layouts[profile_name]
+            with span('scale_profile', 'scale', profile=profile_name):
+                scaled_profile = layout.scale(original_profile, scale_x, scale_y)
+            self.scaled_cache.put((profile_name, layout.digest, scale_x, scale_y, reference_y), scaled_profile)
         return scaled_profile
 
+    def scale_to_dimensions(self, profile_name, width, height, material_thickness):
+        """Scale a profile for container dimensions in mm, as the editor exports it"""
+        return self.scale_profile(
+            profile_name,
+            width / 1000,  # Convert to meters
+            height / 1000,
+            material_thickness / 1000
+        )
+
     def get_profile(self, profile_name):
         """Get a profile by name"""
         return self.profiles.get(profile_name)
 
+    def get_profile_info(self, profile_name):
+        """Get a profile's file, layer names and bounding box
+        
+        Uses the manifest when available so the profile is not parsed.
+        """
+        if profile_name in self.info:
+            return self.info[profile_name]
+        if self.manifest is not None and profile_name in self.manifest:
+            return self.manifest.get(profile_name)
+        if self.get_profile(profile_name) is None:
+            return None
+        return self.info.get(profile_name)
+
+    def write_manifest(self, manifest_path):
+        """Write a manifest of every profile, parsing those not seen yet"""
+        dxf_dir = self.dxf_dir
+        manifest = ProfileManifest(manifest_path)
+        for profile_name in self.list_profiles():
+            info = self.get_profile_info(profile_name)
+            if info is None:
+                continue
+            if self.lazy:
+                filepath = self.profiles.filepaths[profile_name]
+            else:
+                filepath = os.path.join(dxf_dir, info['file'])
+            # File names in the manifest are relative to its directory
+            entry = dict(info)
+            entry['file'] = os.path.relpath(filepath, os.path.dirname(os.path.abspath(manifest_path)))
+            manifest.entries[profile_name] = entry
+        manifest.save()
+        return manifest
+
     def list_profiles(self):
         """List all available profiles"""
         return list(self.profiles.keys()) 
\ No newline at end of file
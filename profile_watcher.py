@@ -0,0 +1,150 @@
+import logging
+import os
+from PyQt6.QtCore import QFileSystemWatcher, QObject, QTimer, pyqtSignal
+from background import Task
+from profile_manager import profile_name_from_path
+
+log = logging.getLogger(__name__)
+
+def file_signature(filepath):
+    """Get what changes when a file is saved: modification time, size and inode"""
+    try:
+        stat = os.stat(filepath)
+    except OSError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+def scan_directory(dxf_dir):
+    """Get the signature of every DXF file in a directory"""
+    try:
+        filenames = os.listdir(dxf_dir)
+    except OSError:
+        return {}
+    snapshot = {}
+    for filename in filenames:
+        if filename.endswith('.dxf'):
+            filepath = os.path.join(dxf_dir, filename)
+            signature = file_signature(filepath)
+            if signature is not None:
+                snapshot[filepath] = signature
+    return snapshot
+
+def diff_snapshots(old, new):
+    """Get the files added or changed and the files removed between two scans"""
+    changed = [filepath for filepath, signature in new.items() if old.get(filepath) != signature]
+    removed = [filepath for filepath in old if filepath not in new]
+    return changed, removed
+
+def reload_changed(task, manager, snapshot):
+    """Re-parse the profile files that changed since ``snapshot``
+
+    Returns ``(snapshot, loaded, removed)``: the new snapshot, the parsed
+    profiles for ``ProfileManager.swap_profiles`` and the removed profile
+    names. A file that fails to parse keeps its old signature so the next
+    scan tries it again.
+    """
+    current = scan_directory(manager.dxf_dir)
+    changed, removed = diff_snapshots(snapshot, current)
+    task.check_cancelled()
+    loaded = manager.read_profiles(changed)
+    for filepath in changed:
+        if profile_name_from_path(filepath) not in loaded:
+            if filepath in snapshot:
+                current[filepath] = snapshot[filepath]
+            else:
+                del current[filepath]
+    return current, loaded, [profile_name_from_path(filepath) for filepath in removed]
+
+class ProfileWatcher(QObject):
+    """Reload profiles when files in the profile directory change
+
+    QFileSystemWatcher reports changes, through inotify on Linux; if the
+    directory cannot be watched, it is scanned every ``poll_interval`` ms
+    instead, which only stats the files. Events are debounced by
+    ``debounce`` ms so a burst of writes from one save reloads once. Only
+    added, changed and removed files are parsed, on ``thread_pool``, and
+    then swapped into the manager together; ``profiles_changed`` is emitted
+    with the names of the reloaded and the removed profiles.
+    """
+    profiles_changed = pyqtSignal(list, list)
+
+    def __init__(self, manager, thread_pool, debounce=500, poll_interval=2000, parent=None):
+        super().__init__(parent)
+        self.manager = manager
+        self.thread_pool = thread_pool
+        self.snapshot = scan_directory(manager.dxf_dir)
+        self.task = None
+        self._pending = False
+
+        self.debounce_timer = QTimer(self)
+        self.debounce_timer.setSingleShot(True)
+        self.debounce_timer.setInterval(debounce)
+        self.debounce_timer.timeout.connect(self.reload)
+
+        self.watcher = QFileSystemWatcher(self)
+        self.watcher.directoryChanged.connect(self.schedule)
+        self.watcher.fileChanged.connect(self.schedule)
+        self.poll_timer = QTimer(self)
+        self.poll_timer.setInterval(poll_interval)
+        self.poll_timer.timeout.connect(self.poll)
+        if self.watcher.addPath(manager.dxf_dir):
+            self.watch_files()
+        else:
+            log.info("Cannot watch %s, polling it every %d ms", manager.dxf_dir, poll_interval)
+            self.poll_timer.start()
+
+    def watch_files(self):
+        """Watch every profile file; a save that replaces a file drops its watch"""
+        watched = set(self.watcher.files())
+        new = [filepath for filepath in self.snapshot if filepath not in watched]
+        if new:
+            self.watcher.addPaths(new)
+
+    def schedule(self, path=None):
+        """Reload once no more changes arrive within the debounce interval"""
+        self.debounce_timer.start()
+
+    def poll(self):
+        """Reload if a scan of the directory differs from the last one"""
+        # Rescheduling a pending reload would hold it back for as long as
+        # polls come faster than the debounce interval
+        if self.debounce_timer.isActive():
+            return
+        if self.task is None and scan_directory(self.manager.dxf_dir) != self.snapshot:
+            self.schedule()
+
+    def reload(self):
+        """Re-parse the changed files on a worker thread"""
+        if self.task is not None:
+            # Changes during a reload are picked up right after it
+            self._pending = True
+            return
+        self.task = Task(reload_changed, self.manager, dict(self.snapshot))
+        self.task.signals.result.connect(self.apply)
+        self.task.signals.finished.connect(self.finished)
+        self.thread_pool.start(self.task)
+
+    def apply(self, result):
+        """Swap the reloaded profiles into the manager"""
+        snapshot, loaded, removed = result
+        self.snapshot = snapshot
+        if not self.poll_timer.isActive():
+            self.watch_files()
+        if not loaded and not removed:
+            return
+        self.manager.swap_profiles(loaded, removed)
+        log.info("Reloaded %d profiles, removed %d", len(loaded), len(removed))
+        self.profiles_changed.emit(sorted(loaded), removed)
+
+    def finished(self):
+        self.task = None
+        if self._pending:
+            self._pending = False
+            self.schedule()
+
+    def stop(self):
+        """Stop watching and cancel a running reload"""
+        self.debounce_timer.stop()
+        self.poll_timer.stop()
+        if self.task is not None:
+            self.task.cancel()
@@ -0,0 +1,141 @@
+import numpy as np
+from geometry import Geometry
+from instrumentation import span
+
+def segment_distances(points, starts, ends):
+    """Distance of every point to the segment from its start to its end point"""
+    direction = ends - starts
+    relative = points - starts
+    length2 = np.einsum('ij,ij->i', direction, direction)
+    t = np.einsum('ij,ij->i', relative, direction) / np.where(length2 > 0, length2, 1.0)
+    np.clip(t, 0.0, 1.0, out=t)
+    closest = starts + t[:, np.newaxis] * direction
+    return np.hypot(*(points - closest).T)
+
+def extreme_vertices(geometry):
+    """Get the first and last vertex of every polyline plus those at its bounds"""
+    counts = geometry.counts
+    ids = geometry.vertex_polyline_ids()
+    starts = geometry.offsets[:-1]
+    ends = geometry.offsets[1:] - 1
+    anchors = [starts, ends]
+    x, y = geometry.coords.T
+    for key in (x, y):
+        # Sorted by polyline then coordinate, each polyline's first and last
+        # entries are its minimum and maximum
+        order = np.lexsort((key, ids))
+        anchors.append(order[starts])
+        anchors.append(order[ends])
+    anchors = np.concatenate(anchors)
+    return np.unique(anchors[np.repeat(counts > 0, 6)])
+
+def vertex_significance(geometry, min_tolerance=0.0):
+    """Get the Douglas-Peucker tolerance at which each vertex is dropped
+
+    A polyline simplified to tolerance ``t`` keeps exactly the vertices with
+    a significance above ``t`` and stays within ``t`` of the original. The
+    endpoints and the vertices at each polyline's bounds are always kept, so
+    bounds are exact at every level. Every polyline is split in the same
+    NumPy pass, one level of the recursion at a time; a vertex's value is
+    capped by the split above it so the levels nest. Intervals already
+    within ``min_tolerance`` are not split further; their vertices stay at 0.
+    """
+    coords = geometry.coords
+    significance = np.zeros(len(coords))
+    if not len(coords):
+        return significance
+    anchors = extreme_vertices(geometry)
+    significance[anchors] = np.inf
+
+    # Intervals between consecutive anchors of the same polyline
+    ids = geometry.vertex_polyline_ids()
+    same = ids[anchors[:-1]] == ids[anchors[1:]]
+    starts = anchors[:-1][same]
+    ends = anchors[1:][same]
+    caps = np.full(len(starts), np.inf)
+    while True:
+        inner = ends - starts - 1
+        keep = inner > 0
+        starts, ends, caps, inner = starts[keep], ends[keep], caps[keep], inner[keep]
+        if not len(starts):
+            break
+
+        # Every interior vertex of every interval, grouped by interval
+        owner = np.repeat(np.arange(len(starts)), inner)
+        first = np.cumsum(inner) - inner
+        index = np.arange(len(owner)) - first[owner] + starts[owner] + 1
+        distance = segment_distances(coords[index], coords[starts[owner]], coords[ends[owner]])
+
+        # Split each interval at its farthest vertex
+        farthest = np.maximum.reduceat(distance, first)
+        candidates = np.flatnonzero(distance == farthest[owner])
+        best = candidates[np.flatnonzero(np.diff(owner[candidates], prepend=-1))]
+        refine = farthest > min_tolerance
+        starts, ends, caps, best = starts[refine], ends[refine], caps[refine], best[refine]
+        split = index[best]
+        value = np.minimum(distance[best], caps)
+        significance[split] = value
+
+        starts = np.concatenate([starts, split])
+        ends = np.concatenate([split, ends])
+        caps = np.concatenate([value, value])
+    return significance
+
+class LevelOfDetail:
+    """Precomputed Douglas-Peucker pyramid of a geometry for rendering
+
+    Level ``i`` is the geometry simplified to ``tolerances[i]``, which grow by
+    ``ratio`` from ``base_tolerance`` (by default a millionth of the bounds'
+    diagonal). Levels are cut from the per-vertex significance on first use
+    and kept. Renderers ask for the coarsest level within the error they can
+    afford, e.g. half a pixel in model units; exports use the geometry itself.
+    """
+    def __init__(self, geometry, base_tolerance=None, levels=16, ratio=2.0):
+        self.geometry = geometry
+        if base_tolerance is None:
+            bounds = geometry.bounds()
+            diagonal = np.hypot(bounds[2] - bounds[0], bounds[3] - bounds[1]) if bounds else 0.0
+            base_tolerance = diagonal * 1e-6 or 1e-9
+        self.tolerances = base_tolerance * ratio ** np.arange(levels)
+        with span('vertex_significance', 'render', vertices=len(geometry.coords)):
+            self.significance = vertex_significance(geometry, base_tolerance)
+        self._masks = {}
+        self._levels = {}
+
+    def level_for(self, tolerance):
+        """Get the coarsest level within ``tolerance``, or None if only the full geometry is"""
+        level = int(np.searchsorted(self.tolerances, tolerance, side='right')) - 1
+        return level if level >= 0 else None
+
+    def mask(self, level):
+        """Get the vertex mask and polyline offsets of a level"""
+        if level not in self._masks:
+            mask = self.significance > self.tolerances[level]
+            kept = np.concatenate([[0], np.cumsum(mask)])
+            self._masks[level] = (mask, kept[self.geometry.offsets])
+        return self._masks[level]
+
+    def level(self, level):
+        """Get a level as a Geometry; None gives the full geometry"""
+        if level is None:
+            return self.geometry
+        if level not in self._levels:
+            mask, offsets = self.mask(level)
+            geometry = self.geometry
+            self._levels[level] = Geometry(geometry.coords[mask], offsets, geometry.layer_ids, geometry.layers)
+        return self._levels[level]
+
+    def simplified(self, tolerance, coords=None):
+        """Get ``(coords, offsets)`` simplified to within ``tolerance``
+
+        ``coords`` may replace the geometry's vertices, e.g. with scaled ones;
+        the error then grows with the scaling, so pass the tolerance divided
+        by the largest scale factor.
+        """
+        if coords is None:
+            coords = self.geometry.coords
+        level = self.level_for(tolerance)
+        if level is None:
+            return coords, self.geometry.offsets
+        mask, offsets = self.mask(level)
+        return coords[mask], offsets
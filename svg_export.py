@@ -0,0 +1,129 @@
+import numpy as np
+from geometry import Geometry
+from instrumentation import traced
+
+LAYER_COLORS = (
+    ('SLOT', '#0000ff'),
+    ('CUTLINE', '#ff0000'),
+)
+DEFAULT_COLOR = '#000000'
+
+def layer_color(layer):
+    """Get the stroke colour of a layer; laser software maps colours to operations"""
+    for keyword, color in LAYER_COLORS:
+        if keyword in layer:
+            return color
+    return DEFAULT_COLOR
+
+def format_numbers(values, precision):
+    """Format integers counted in units of 10**-precision as short decimals"""
+    if precision <= 0:
+        return [str(value) for value in values]
+    scale = 10 ** precision
+    numbers = []
+    for value in values:
+        if value % scale == 0:
+            numbers.append(str(value // scale))
+            continue
+        text = f"{value / scale:.{precision}f}".rstrip('0')
+        # SVG allows dropping the leading zero: 0.5 -> .5
+        if text.startswith('0.'):
+            text = text[1:]
+        elif text.startswith('-0.'):
+            text = '-' + text[2:]
+        numbers.append(text)
+    return numbers
+
+def path_data(polylines, precision, start=(0, 0)):
+    """Build compact SVG path data for polylines given as quantized ``(K, 2)`` integer arrays
+
+    Every subpath starts with a relative move from the pen position, the
+    vertices follow as one relative ``l`` run and closed polylines end in
+    ``z``. Working on integers keeps the relative steps exact, so no error
+    accumulates along a path. Returns the data and the final pen position.
+    """
+    parts = []
+    pen = np.asarray(start, dtype=np.int64)
+    for points in polylines:
+        closed = len(points) > 2 and (points[0] == points[-1]).all()
+        if closed:
+            points = points[:-1]
+        steps = np.diff(np.vstack([pen, points]), axis=0)
+        numbers = format_numbers(steps.ravel().tolist(), precision)
+        parts.append('m' + ' '.join(numbers[:2]))
+        if len(numbers) > 2:
+            parts.append('l' + ' '.join(numbers[2:]))
+        if closed:
+            parts.append('z')
+            pen = points[0]
+        else:
+            pen = points[-1]
+    # A minus sign separates numbers on its own
+    return ''.join(parts).replace(' -', '-'), pen
+
+class SVGWriter:
+    """Stream polylines to an SVG file one path per layer at a time
+
+    Coordinates are in mm, with Y flipped so the drawing is not mirrored, and
+    are rounded to ``precision`` decimals. The document bounds have to be
+    known up front for the ``viewBox``; everything after the header is
+    written as it is added, so no DOM is kept in memory.
+    """
+    def __init__(self, f, bounds, precision=3, margin=0.0):
+        self.f = f
+        self.precision = precision
+        self.scale = 10 ** precision
+        min_x, min_y, max_x, max_y = bounds
+        min_x -= margin
+        min_y -= margin
+        max_x += margin
+        max_y += margin
+        width = max_x - min_x
+        height = max_y - min_y
+        view_box = format_numbers(self.quantize([min_x, -max_y, width, height]).tolist(), precision)
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+        f.write(f'<svg xmlns="http://www.w3.org/2000/svg" width="{view_box[2]}mm" height="{view_box[3]}mm" '
+                f'viewBox="{" ".join(view_box)}" fill="none" stroke-width="0.1">\n')
+
+    def quantize(self, values):
+        return np.rint(np.asarray(values, dtype=np.float64) * self.scale).astype(np.int64)
+
+    def add(self, geometry, offset=(0.0, 0.0)):
+        """Write a geometry's polylines, moved by ``offset``, as one path per layer"""
+        if not geometry.polyline_count:
+            return
+        coords = (geometry.coords + offset) * (1, -1)
+        points = self.quantize(coords)
+        offsets = geometry.offsets.tolist()
+        layer_ids = geometry.layer_ids
+        for layer_id, layer in enumerate(geometry.layers):
+            indices = np.flatnonzero(layer_ids == layer_id).tolist()
+            if not indices:
+                continue
+            polylines = [points[offsets[i]:offsets[i + 1]] for i in indices]
+            data, _ = path_data(polylines, self.precision)
+            self.f.write(f'<path stroke="{layer_color(layer)}" d="{data}"><title>{_escape(layer)}</title></path>\n')
+
+    def close(self):
+        self.f.write('</svg>\n')
+
+def _escape(text):
+    return text.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+
+@traced('export')
+def write_svg(geometry, filepath, precision=3, margin=5.0):
+    """Write a profile Geometry, e.g. from ProfileManager.scale_profile, to an SVG file"""
+    bounds = geometry.bounds() or (0.0, 0.0, 0.0, 0.0)
+    with open(filepath, 'w', encoding='utf-8') as f:
+        writer = SVGWriter(f, bounds, precision, margin)
+        writer.add(geometry)
+        writer.close()
+
+def panels_geometry(panels):
+    """Pack ``{'outline', 'slots', 'cutlines'}`` panels, as PanelScaler gives them, into a Geometry"""
+    polylines = []
+    for panel_name, panel_data in panels.items():
+        polylines.append((panel_name, panel_data['outline']))
+        polylines.extend((f"{panel_name}_SLOT5_5", slot) for slot in panel_data.get('slots', []))
+        polylines.extend((f"{panel_name}_CUTLINE", cutline) for cutline in panel_data.get('cutlines', []))
+    return Geometry.from_polylines(polylines)
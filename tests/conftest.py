@@ -0,0 +1,19 @@
+import os
+import shutil
+import pytest
+
+DXF_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'assets', 'dxf')
+
+@pytest.fixture
+def library(tmp_path):
+    """A profile directory holding a copy of the bundled profile"""
+    dxf_dir = tmp_path / 'dxf'
+    dxf_dir.mkdir()
+    shutil.copy(os.path.join(DXF_DIR, 'bakjetestingsoftware.dxf'), dxf_dir)
+    return str(dxf_dir)
+
+@pytest.fixture(scope='session')
+def profile():
+    """The bundled profile's geometry, parsed once"""
+    from profile_manager import read_profile
+    return read_profile(os.path.join(DXF_DIR, 'bakjetestingsoftware.dxf'))
@@ -0,0 +1,91 @@
+import os
+import time
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+import ezdxf
+import pytest
+from PyQt6.QtCore import QThreadPool
+from PyQt6.QtWidgets import QApplication
+app = QApplication.instance() or QApplication([])
+from background import Task, export_box, export_design, fetch_profile
+from mesh3d import MeshCache
+from profile_manager import ProfileManager
+
+PROFILE = 'bakjetestingsoftware'
+
+@pytest.fixture
+def manager(library):
+    return ProfileManager(use_cache=False, use_store=False, lazy=True, dxf_dir=library)
+
+def run_task(task):
+    """Run a task in this thread, collecting what it emits"""
+    emitted = {'progress': [], 'result': [], 'error': [], 'cancelled': [], 'finished': []}
+    task.signals.progress.connect(lambda done, total: emitted['progress'].append((done, total)))
+    task.signals.result.connect(emitted['result'].append)
+    task.signals.error.connect(emitted['error'].append)
+    task.signals.cancelled.connect(lambda: emitted['cancelled'].append(True))
+    task.signals.finished.connect(lambda: emitted['finished'].append(True))
+    task.run()
+    return emitted
+
+def test_fetch_profile_parses_on_demand(manager):
+    emitted = run_task(Task(fetch_profile, manager, PROFILE))
+    (name, profile, layout, fit), = emitted['result']
+    assert name == PROFILE
+    assert profile == manager.profiles[PROFILE]
+    assert layout is manager.layouts[PROFILE]
+    assert fit is not None
+    assert emitted['finished'] == [True]
+
+def test_export_design_writes_the_scaled_profile(manager, tmp_path):
+    filepath = str(tmp_path / 'design.dxf')
+    emitted = run_task(Task(export_design, manager, PROFILE, 400, 600, 18, filepath))
+    assert emitted['result'] == [(filepath, None, None)]
+    assert emitted['progress'][-1] == (16, 16)
+    scaled = manager.scale_to_dimensions(PROFILE, 400, 600, 18)
+    layers = [entity.dxf.layer for entity in ezdxf.readfile(filepath).modelspace()]
+    assert layers == [layer for layer, _ in scaled.iter_polylines()]
+
+def test_export_design_reports_the_cut_order(manager, tmp_path):
+    filepath = str(tmp_path / 'design.svg')
+    emitted = run_task(Task(export_design, manager, PROFILE, 400, 600, 18, filepath, 'svg', True))
+    (path, report, warning), = emitted['result']
+    assert path == filepath and warning is None
+    assert report is not None
+    assert os.path.getsize(filepath) > 0
+
+def test_cancelled_export_writes_nothing(manager, tmp_path):
+    filepath = str(tmp_path / 'design.dxf')
+    task = Task(export_design, manager, PROFILE, 400, 600, 18, filepath)
+    task.signals.progress.connect(lambda done, total: task.cancel())
+    emitted = run_task(task)
+    assert emitted['cancelled'] == [True]
+    assert emitted['result'] == [] and emitted['error'] == []
+    assert not os.path.exists(filepath)
+
+def test_failed_task_emits_the_error(manager, tmp_path):
+    emitted = run_task(Task(export_design, manager, 'missing', 400, 600, 18, str(tmp_path / 'missing.dxf')))
+    assert emitted['error'] == ["Unknown profile: missing"]
+    assert emitted['finished'] == [True]
+
+def test_export_box_reports_dropped_slots(manager, tmp_path):
+    mesh_cache = MeshCache(manager)
+    filepath = str(tmp_path / 'box.stl')
+    emitted = run_task(Task(export_box, mesh_cache, PROFILE, 400, 600, 18, filepath))
+    assert emitted['result'] == [(filepath, None, None)]
+    assert os.path.getsize(filepath) > 0
+
+    emitted = run_task(Task(export_box, mesh_cache, PROFILE, 1200, 600, 18, str(tmp_path / 'wide.stl')))
+    (_, _, warning), = emitted['result']
+    assert warning.startswith("slots crossing their panel's outline left out: 1 in FRONTBACK")
+
+def test_task_runs_on_a_thread_pool(manager):
+    results = []
+    task = Task(fetch_profile, manager, PROFILE)
+    task.signals.result.connect(results.append)
+    pool = QThreadPool()
+    pool.start(task)
+    pool.waitForDone()
+    deadline = time.monotonic() + 5
+    while not results and time.monotonic() < deadline:
+        app.processEvents()
+    assert results[0][1] == manager.profiles[PROFILE]
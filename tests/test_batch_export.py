@@ -0,0 +1,58 @@
+import json
+import os
+import ezdxf
+import pytest
+from batch_export import BatchExporter, read_orders
+
+ORDERS = [
+    'id,profile,width,height,material',
+    'a,bakjetestingsoftware,400,600,18',
+    'b,bakjetestingsoftware,500,300,12',
+    'c,missing,400,600,18',
+    'd,bakjetestingsoftware,wide,600,18',
+]
+
+@pytest.fixture
+def orders(tmp_path, monkeypatch):
+    # Workers keep their profile cache under the working directory
+    monkeypatch.chdir(tmp_path)
+    filepath = tmp_path / 'orders.csv'
+    filepath.write_text('\n'.join(ORDERS) + '\n', encoding='utf-8')
+    return str(filepath)
+
+def read_lines(filepath):
+    with open(filepath, encoding='utf-8') as f:
+        return [json.loads(line) for line in f]
+
+def test_exports_orders_and_reports_failures(library, orders, tmp_path):
+    output_dir = str(tmp_path / 'output')
+    summary = BatchExporter(output_dir, workers=1, dxf_dir=library).run(read_orders(orders))
+    assert (summary['exported'], summary['failed'], summary['skipped']) == (2, 2, 0)
+    assert sorted(entry['id'] for entry in read_lines(os.path.join(output_dir, 'errors.jsonl'))) == ['c', 'd']
+    doc = ezdxf.readfile(os.path.join(output_dir, 'a.dxf'))
+    assert len(doc.modelspace().query('LWPOLYLINE')) == 16
+
+def test_rerun_skips_finished_orders(library, orders, tmp_path):
+    output_dir = str(tmp_path / 'output')
+    BatchExporter(output_dir, workers=1, dxf_dir=library).run(read_orders(orders))
+    os.remove(os.path.join(output_dir, 'b.dxf'))
+    summary = BatchExporter(output_dir, workers=1, dxf_dir=library).run(read_orders(orders))
+    assert (summary['exported'], summary['skipped']) == (1, 1)
+
+def test_combined_run_is_not_skipped_later(library, orders, tmp_path):
+    output_dir = str(tmp_path / 'output')
+    combined = str(tmp_path / 'shift.dxf')
+    summary = BatchExporter(output_dir, workers=1, dxf_dir=library, combined_path=combined).run(read_orders(orders))
+    assert summary['combined']['designs'] == 2
+    summary = BatchExporter(output_dir, workers=1, dxf_dir=library).run(read_orders(orders))
+    assert (summary['exported'], summary['skipped']) == (2, 0)
+
+def polylines(filepath):
+    return [(entity.dxf.layer, entity.get_points('xy')) for entity in ezdxf.readfile(filepath).modelspace()]
+
+def test_parallel_run_matches_serial(library, orders, tmp_path):
+    summary = BatchExporter(str(tmp_path / 'parallel'), workers=2, dxf_dir=library).run(read_orders(orders))
+    assert (summary['exported'], summary['failed']) == (2, 2)
+    BatchExporter(str(tmp_path / 'serial'), workers=1, dxf_dir=library).run(read_orders(orders))
+    for filename in ('a.dxf', 'b.dxf'):
+        assert polylines(tmp_path / 'parallel' / filename) == polylines(tmp_path / 'serial' / filename)
@@ -0,0 +1,43 @@
+import logging
+import os
+import pytest
+from benchmark import compare, generate_profile, run_benchmarks
+from mesh3d import build_box
+from nesting import parts_from_profile
+from profile_manager import ProfileManager
+
+@pytest.fixture
+def synthetic(tmp_path):
+    dxf_dir = tmp_path / 'profiles'
+    dxf_dir.mkdir()
+    generate_profile(str(dxf_dir / 'synthetic.dxf'), 8, 100)
+    return ProfileManager(use_cache=False, use_store=False, dxf_dir=str(dxf_dir))
+
+def test_synthetic_layers_match_the_bundled_profile(profile, tmp_path):
+    filepath = str(tmp_path / 'synthetic.dxf')
+    generate_profile(filepath, 3, 40)
+    manager = ProfileManager(use_cache=False, use_store=False, dxf_dir=str(tmp_path))
+    assert sorted(manager.get_profile('synthetic').layers) == sorted(profile.layers)
+
+@pytest.mark.parametrize('width', [300, 400, 999])
+def test_synthetic_slots_stay_inside_their_panels(synthetic, width, caplog):
+    scaled = synthetic.scale_to_dimensions('synthetic', width, 600, 18)
+    with caplog.at_level(logging.WARNING):
+        parts = parts_from_profile(scaled)
+        model = build_box(scaled, 18)
+    assert len(parts) == 8
+    assert model.dropped_slots == {}
+    assert not caplog.records
+
+def test_compare_flags_slower_and_larger_stages():
+    baseline = {'results': {'load': {'seconds': 1.0, 'peak_bytes': 100}, 'mesh': {'seconds': 1.0, 'peak_bytes': 100}}}
+    results = {'load': {'seconds': 1.2, 'peak_bytes': 200}, 'mesh': {'seconds': 1.5, 'peak_bytes': 100},
+               'paint': {'seconds': 9.0, 'peak_bytes': 9}}
+    assert compare(results, baseline, 0.25) == [('load', 'peak_bytes', 100, 200), ('mesh', 'seconds', 1.0, 1.5)]
+
+def test_selected_stages_run(tmp_path):
+    stages = {'scale_profile', 'export_svg', 'mesh'}
+    results = run_benchmarks(3, 40, repeat=1, workdir=str(tmp_path), stages=stages)
+    assert set(results) == stages
+    assert all(result['seconds'] > 0 and result['peak_bytes'] > 0 for result in results.values())
+    assert os.listdir(tmp_path) == []
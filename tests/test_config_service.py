@@ -0,0 +1,139 @@
+import asyncio
+import io
+import json
+import threading
+import ezdxf
+import pytest
+from config_service import ConfigService
+from cutting_list import part_metrics
+from nesting import parts_from_profile
+from profile_manager import ProfileManager
+
+PROFILE = 'bakjetestingsoftware'
+DESIGN = f"profile={PROFILE}&width=400&height=600&material=18"
+
+@pytest.fixture
+def manager(library):
+    return ProfileManager(use_cache=False, use_store=False, dxf_dir=library)
+
+async def request(port, method, target, body=None):
+    """Send one request on a new connection; returns ``(status, headers, body)``"""
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    payload = json.dumps(body).encode('utf-8') if body is not None else b''
+    writer.write(f"{method} {target} HTTP/1.1\r\nHost: localhost\r\nConnection: close\r\n"
+                 f"Content-Length: {len(payload)}\r\n\r\n".encode('latin-1') + payload)
+    await writer.drain()
+    status_line = await reader.readline()
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line == b'\r\n':
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+    data = await reader.readexactly(int(headers['content-length']))
+    writer.close()
+    await writer.wait_closed()
+    return int(status_line.split()[1]), headers, data
+
+def serve(manager, client, **options):
+    """Run ``client(service)`` against a service on a free localhost port"""
+    async def run():
+        service = await ConfigService(manager, **options).start('127.0.0.1', 0)
+        try:
+            return await client(service)
+        finally:
+            await service.close()
+    return asyncio.run(run())
+
+def test_endpoints_answer_from_the_bundled_profile(manager):
+    async def client(service):
+        return [await request(service.port, 'GET', '/profiles'),
+                await request(service.port, 'GET', f'/scale?{DESIGN}'),
+                await request(service.port, 'POST', '/scale',
+                              {'profile': PROFILE, 'width': 400, 'height': 600, 'material': 18}),
+                await request(service.port, 'GET', f'/preview.svg?{DESIGN}'),
+                await request(service.port, 'GET', f'/export.dxf?{DESIGN}'),
+                await request(service.port, 'GET', '/stats')]
+    profiles, scale, posted, svg, dxf, stats = serve(manager, client, workers=2)
+
+    assert profiles[0] == 200 and json.loads(profiles[2]) == {'profiles': [PROFILE]}
+
+    assert scale[0] == 200 and scale[1]['content-type'] == 'application/json'
+    assert posted[2] == scale[2]
+    data = json.loads(scale[2])
+    scaled = manager.scale_to_dimensions(PROFILE, 400, 600, 18)
+    assert data['polylines'] == 16
+    assert data['bounds'] == pytest.approx(list(scaled.bounds()))
+    expected = part_metrics(parts_from_profile(scaled))
+    assert [panel['panel'] for panel in data['panels']] == [row['panel'] for row in expected]
+    for panel, row in zip(data['panels'], expected):
+        assert panel['area'] == pytest.approx(row['area'])
+        assert panel['cut_length'] == pytest.approx(row['cut_length'])
+        assert panel['slots'] == row['slots']
+
+    assert svg[0] == 200 and svg[1]['content-type'] == 'image/svg+xml'
+    assert svg[2].startswith(b'<?xml') and svg[2].rstrip().endswith(b'</svg>')
+    assert svg[2].count(b'<path') == 16
+
+    assert dxf[0] == 200 and dxf[1]['content-type'] == 'application/dxf'
+    doc = ezdxf.read(io.StringIO(dxf[2].decode('utf-8')))
+    assert [entity.dxf.layer for entity in doc.modelspace()] == [layer for layer, _ in scaled.iter_polylines()]
+
+    stats = json.loads(stats[2])
+    assert stats['profiles'] == 1 and stats['workers'] == 2
+    assert stats['response_cache']['hits'] == 1
+    assert stats['latency']['/scale']['requests'] == 2
+
+def test_bad_requests_are_rejected(manager):
+    async def client(service):
+        return [await request(service.port, 'GET', '/scale?width=400&height=600&material=18'),
+                await request(service.port, 'GET', f'/scale?profile={PROFILE}&width=wide&height=600&material=18'),
+                await request(service.port, 'GET', f'/scale?profile={PROFILE}&width=-4&height=600&material=18'),
+                await request(service.port, 'POST', '/scale', ['not', 'an', 'object']),
+                await request(service.port, 'GET', '/scale?profile=missing&width=400&height=600&material=18'),
+                await request(service.port, 'GET', '/missing'),
+                await request(service.port, 'POST', '/profiles', {})]
+    responses = serve(manager, client)
+    assert [status for status, _, _ in responses] == [400, 400, 400, 400, 404, 404, 405]
+    assert json.loads(responses[0][2]) == {'error': 'Missing parameter: profile'}
+    assert json.loads(responses[4][2]) == {'error': 'Unknown profile: missing'}
+
+def test_overload_is_answered_503(manager, monkeypatch):
+    started = threading.Event()
+    release = threading.Event()
+    scale_to_dimensions = manager.scale_to_dimensions
+
+    def blocked(*args):
+        started.set()
+        release.wait(10)
+        return scale_to_dimensions(*args)
+    monkeypatch.setattr(manager, 'scale_to_dimensions', blocked)
+
+    async def client(service):
+        busy = asyncio.ensure_future(request(service.port, 'GET', f'/scale?{DESIGN}'))
+        await asyncio.get_running_loop().run_in_executor(None, started.wait, 10)
+        rejected = await request(service.port, 'GET', f'/preview.svg?{DESIGN}')
+        release.set()
+        stats = await request(service.port, 'GET', '/stats')
+        return await busy, rejected, stats
+    served, rejected, stats = serve(manager, client, workers=1, max_pending=1)
+    assert served[0] == 200
+    assert rejected[0] == 503 and rejected[1]['retry-after'] == '1'
+    assert json.loads(stats[2])['rejected'] == 1
+
+def test_slow_request_times_out(manager, monkeypatch):
+    release = threading.Event()
+    scale_to_dimensions = manager.scale_to_dimensions
+    monkeypatch.setattr(manager, 'scale_to_dimensions', lambda *args: release.wait(10) and scale_to_dimensions(*args))
+
+    async def client(service):
+        try:
+            timed_out = await request(service.port, 'GET', f'/scale?{DESIGN}')
+            stats = await request(service.port, 'GET', '/stats')
+        finally:
+            release.set()
+        return timed_out, stats
+    timed_out, stats = serve(manager, client, workers=1, timeout=0.2)
+    assert timed_out[0] == 504
+    assert json.loads(stats[2])['timeouts'] == 1
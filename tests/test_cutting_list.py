@@ -0,0 +1,37 @@
+import os
+import numpy as np
+import pytest
+from cutting_list import CuttingTemplate, part_metrics
+from nesting import parts_from_profile
+from profile_manager import ProfileManager
+
+DXF_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'assets', 'dxf')
+PROFILE = 'bakjetestingsoftware'
+SIZES = [(width, height) for width in range(100, 2001, 190) for height in range(100, 2001, 190)] + [(400, 600)]
+
+@pytest.fixture(scope='module')
+def manager():
+    return ProfileManager(use_cache=False, use_store=False, dxf_dir=DXF_DIR)
+
+def test_template_matches_scaled_geometry(manager):
+    template = CuttingTemplate(manager.get_profile(PROFILE), manager.layouts[PROFILE])
+    width = np.array([width for width, _ in SIZES], dtype=np.float64)
+    height = np.array([height for _, height in SIZES], dtype=np.float64)
+    area, cut_length, panel_width, panel_height = template.evaluate(width, height)
+    for row, size in enumerate(SIZES):
+        scaled = manager.scale_to_dimensions(PROFILE, *size, 18)
+        expected = {metrics['panel']: metrics for metrics in part_metrics(parts_from_profile(scaled))}
+        assert sorted(expected) == sorted(template.panels)
+        for column, panel in enumerate(template.panels):
+            metrics = expected[panel]
+            assert area[row, column] == pytest.approx(metrics['area']), (size, panel)
+            assert cut_length[row, column] == pytest.approx(metrics['cut_length']), (size, panel)
+            assert panel_width[row, column] == pytest.approx(metrics['width']), (size, panel)
+            assert panel_height[row, column] == pytest.approx(metrics['height']), (size, panel)
+
+def test_outlines_stay_whole_panels(manager):
+    # Each panel is one outline loop at every size, not its quadrants closed on their own
+    for size in [(400, 600), (800, 900), (2000, 2000)]:
+        scaled = manager.scale_to_dimensions(PROFILE, *size, 18)
+        for metrics in part_metrics(parts_from_profile(scaled)):
+            assert metrics['area'] > 0.5 * metrics['width'] * metrics['height'], (size, metrics['panel'])
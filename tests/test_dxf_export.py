@@ -0,0 +1,68 @@
+import os
+import ezdxf
+import numpy as np
+import pytest
+from dxf_export import CombinedDXFWriter, write_dxf
+from geometry import Geometry
+from profile_manager import ProfileManager
+
+PROFILE = 'bakjetestingsoftware'
+
+@pytest.fixture
+def manager(library):
+    return ProfileManager(use_cache=False, use_store=False, dxf_dir=library)
+
+def exploded(filepath):
+    """Read a DXF file's polylines with every INSERT resolved"""
+    polylines = []
+    for entity in ezdxf.readfile(filepath).modelspace():
+        entities = entity.virtual_entities() if entity.dxftype() == 'INSERT' else [entity]
+        for polyline in entities:
+            polylines.append((polyline.dxf.layer, np.array([(point.x, point.y) for point in polyline.points()])))
+    return polylines
+
+def assert_same_polylines(actual, expected):
+    # Blocks store shapes rounded to 1e-6 mm
+    def key(polyline):
+        layer, points = polyline
+        return layer, np.round(points, 3).tolist()
+    actual, expected = sorted(actual, key=key), sorted(expected, key=key)
+    assert [layer for layer, _ in actual] == [layer for layer, _ in expected]
+    for (_, points), (_, expected_points) in zip(actual, expected):
+        np.testing.assert_allclose(points, expected_points, atol=1e-5)
+
+def test_single_design_round_trips(manager, tmp_path):
+    scaled = manager.scale_to_dimensions(PROFILE, 400, 600, 18)
+    filepath = str(tmp_path / 'design.dxf')
+    write_dxf(scaled, filepath)
+    doc = ezdxf.readfile(filepath)
+    polylines = [(entity.dxf.layer, np.array(entity.get_points('xy'))) for entity in doc.modelspace()]
+    assert_same_polylines(polylines, scaled.iter_polylines())
+
+def test_identical_panels_share_blocks(manager, tmp_path):
+    sizes = [(400, 600), (400, 600), (700, 600)]
+    designs = [manager.scale_to_dimensions(PROFILE, width, height, 18) for width, height in sizes]
+    filepath = str(tmp_path / 'combined.dxf')
+    with CombinedDXFWriter(filepath) as writer:
+        offsets = []
+        for design in designs:
+            min_x, min_y, _, _ = design.bounds()
+            offsets.append((writer.cursor_x - min_x, -min_y))
+            writer.add(design)
+    stats = writer.stats
+    assert (stats['designs'], stats['panels']) == (3, 9)
+    # The repeated size adds no blocks; the wider one only for the panels the width changes
+    assert stats['blocks'] == 5
+
+    expected = [(layer, points + offset) for design, offset in zip(designs, offsets)
+                for layer, points in design.iter_polylines()]
+    assert_same_polylines(exploded(filepath), expected)
+
+def test_polylines_outside_the_panels_are_still_written(manager, tmp_path):
+    scaled = manager.scale_to_dimensions(PROFILE, 400, 600, 18)
+    design = Geometry.from_polylines([*scaled.iter_polylines(), ('NOTE', [(0.0, 0.0), (5.0, 5.0)]),
+                                      ('STRAY_SLOT', [(900.0, 900.0), (910.0, 900.0)])])
+    filepath = str(tmp_path / 'combined.dxf')
+    with CombinedDXFWriter(filepath) as writer:
+        writer.add(design, offset=(0.0, 0.0))
+    assert_same_polylines(exploded(filepath), design.iter_polylines())
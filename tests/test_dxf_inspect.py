@@ -0,0 +1,76 @@
+import os
+import time
+import numpy as np
+import pytest
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+from PyQt6.QtWidgets import QApplication
+# dxf_inspect selects the Qt backend on import, so it needs the application first
+app = QApplication.instance() or QApplication([])
+from benchmark import generate_viewer
+from dxf_inspect import DXFViewer, PanelScaler, read_panels
+
+TARGETS = [(400, 600, 200), (250, 300, 120), (1200, 900, 640)]
+
+@pytest.fixture(scope='module')
+def panels(tmp_path_factory):
+    # The viewer reads its own panel layers, which the bundled profile does not have
+    filepath = str(tmp_path_factory.mktemp('viewer') / 'simplefied.dxf')
+    generate_viewer(filepath, 6, 200)
+    return read_panels(filepath)[1]
+
+def scaled_one_by_one(scaler, panels, target):
+    for name, value in zip(PanelScaler.DIMENSIONS, np.asarray(target) / scaler.reference_dims):
+        scaler.scale_factors[name] = value
+    return {panel_name: scaler.scale_panel(panel_name, panel_data) for panel_name, panel_data in panels.items()}
+
+def assert_panels_equal(actual, expected):
+    assert sorted(actual) == sorted(expected)
+    for panel_name, panel in expected.items():
+        np.testing.assert_allclose(actual[panel_name]['outline'], panel['outline'])
+        for key in ('slots', 'cutlines'):
+            assert len(actual[panel_name][key]) == len(panel[key])
+            for points, expected_points in zip(actual[panel_name][key], panel[key]):
+                np.testing.assert_allclose(points, expected_points)
+
+def test_batch_matches_scaling_each_panel(panels):
+    scaler = PanelScaler(panels)
+    batch = scaler.scale_batch(TARGETS)
+    assert batch.shape == (len(TARGETS), len(scaler.geometry.coords), 2)
+    for target, coords in zip(TARGETS, batch):
+        assert_panels_equal(scaler.unpack(coords), scaled_one_by_one(scaler, panels, target))
+
+def test_scale_all_uses_the_current_factors(panels):
+    scaler = PanelScaler(panels)
+    expected = scaled_one_by_one(scaler, panels, TARGETS[2])
+    assert_panels_equal(scaler.scale_all(), expected)
+
+@pytest.fixture
+def viewer(tmp_path, monkeypatch):
+    # The viewer opens simplefied.dxf from the working directory
+    monkeypatch.chdir(tmp_path)
+    generate_viewer('simplefied.dxf', 6, 200)
+    viewer = DXFViewer()
+    yield viewer
+    viewer.redraw_timer.stop()
+    viewer.deleteLater()
+
+def test_dimension_change_moves_existing_artists(viewer):
+    artists = {panel_name: artists['outline'] for panel_name, artists in viewer.panel_artists.items()}
+    before = {panel_name: line.get_xydata().copy() for panel_name, line in artists.items()}
+    bounds = {panel_name: viewer.panel_model[panel_name][1] for panel_name in artists}
+    viewer.width_spin.setValue(viewer.width_spin.value() * 2)
+    viewer.update_plot()
+    assert {panel_name: artists['outline'] for panel_name, artists in viewer.panel_artists.items()} == artists
+    # Width scales the front/back and bottom panels, not the sides
+    assert artists['FRONTBACK'].get_xydata()[:, 0].max() > before['FRONTBACK'][:, 0].max()
+    assert viewer.panel_model['FRONTBACK'][1][2] > bounds['FRONTBACK'][2]
+    assert viewer.panel_model['LEFTRIGHT'][1] == bounds['LEFTRIGHT']
+
+def test_redraws_are_throttled_not_postponed(viewer):
+    viewer.update_scaling()
+    assert viewer.redraw_timer.isActive()
+    time.sleep(0.012)
+    viewer.update_scaling()
+    # A running timer is left alone, so a steady stream of changes still redraws every frame
+    assert viewer.redraw_timer.remainingTime() < viewer.redraw_timer.interval() - 5
@@ -0,0 +1,38 @@
+import os
+import numpy as np
+import pytest
+from dxf_stream import DXFStreamError, read_geometry, read_geometry_ezdxf, read_polylines
+from dxf_export import write_dxf
+
+def assert_same_geometry(actual, expected):
+    assert actual.layers == expected.layers
+    assert np.array_equal(actual.layer_ids, expected.layer_ids)
+    assert np.array_equal(actual.offsets, expected.offsets)
+    np.testing.assert_array_equal(actual.coords, expected.coords)
+
+def test_stream_matches_ezdxf(library):
+    filepath = os.path.join(library, 'bakjetestingsoftware.dxf')
+    assert_same_geometry(read_geometry(filepath), read_geometry_ezdxf(filepath))
+
+def test_selected_layers_match_ezdxf(library):
+    filepath = os.path.join(library, 'bakjetestingsoftware.dxf')
+    layers = ['FRONTBACK_TL', 'FRONTBACK_SLOTR', 'LEFTRIHT_SLOTR']
+    geometry = read_geometry(filepath, layers)
+    assert set(geometry.layers) == set(layers)
+    assert_same_geometry(geometry, read_geometry_ezdxf(filepath, layers))
+
+def test_written_file_reads_back(profile, tmp_path):
+    # The exporter writes LWPOLYLINEs where the bundled file has other entities
+    filepath = str(tmp_path / 'scaled.dxf')
+    write_dxf(profile, filepath)
+    assert_same_geometry(read_geometry(filepath), read_geometry_ezdxf(filepath))
+    assert [layer for layer, _, _ in read_polylines(filepath)] == [layer for layer, _ in profile.iter_polylines()]
+
+def test_truncated_file_is_an_error(library, tmp_path):
+    with open(os.path.join(library, 'bakjetestingsoftware.dxf'), 'rb') as f:
+        data = f.read()
+    filepath = tmp_path / 'truncated.dxf'
+    # Cut inside the ENTITIES section, as a file still being saved is
+    filepath.write_bytes(data[:data.index(b'ENTITIES') + 4000])
+    with pytest.raises(DXFStreamError):
+        list(read_polylines(str(filepath)))
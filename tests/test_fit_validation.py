@@ -0,0 +1,101 @@
+import json
+import os
+import numpy as np
+import pytest
+from batch_export import BatchExporter, read_orders
+from fit_validation import FitTemplate, format_issues, main, validate_orders
+from mesh3d import build_box
+from profile_manager import ProfileManager
+
+PROFILE = 'bakjetestingsoftware'
+# The bundled slots are 9.8 mm wide
+SLOT_WIDTH = 9.8
+
+ORDERS = [
+    'id,profile,width,height,material',
+    f'fits,{PROFILE},400,600,9.8',
+    f'thick,{PROFILE},400,600,18',
+    f'wide,{PROFILE},1200,600,9.8',
+    'unknown,missing,400,600,9.8',
+]
+
+@pytest.fixture
+def manager(library):
+    return ProfileManager(use_cache=False, use_store=False, dxf_dir=library)
+
+@pytest.fixture
+def template(manager):
+    return FitTemplate(manager.profiles[PROFILE], manager.layouts[PROFILE])
+
+@pytest.fixture
+def orders(tmp_path, monkeypatch):
+    # Profile managers keep their cache under the working directory
+    monkeypatch.chdir(tmp_path)
+    filepath = tmp_path / 'orders.csv'
+    filepath.write_text('\n'.join(ORDERS) + '\n', encoding='utf-8')
+    return str(filepath)
+
+def test_slots_are_assigned_to_their_panels(template):
+    assert template.panels == ['LEFTRIGHT', 'FRONTBACK', 'BOTTOM']
+    assert [slot['layers'] for slot in template.slots] == \
+        [['LEFTRIHT_SLOTR', 'LEFTRIGHT_SLOTL'], ['FRONTBACK_SLOTL', 'FRONTBACK_SLOTR']]
+    assert template.slot_panels.tolist() == [0, 1]
+    assert template.slot_widths.tolist() == [SLOT_WIDTH, SLOT_WIDTH]
+
+def test_fitting_design_has_no_issues(template):
+    result = template.check([400], [600], SLOT_WIDTH)
+    assert result.ok.tolist() == [True]
+    assert result.issues() == []
+    np.testing.assert_allclose(result.clearance, 10.0)
+
+def test_material_and_clearance_problems(template):
+    result = template.check([400, 400, 400], 600, [18, 9.2, SLOT_WIDTH], clearance=2.0, play=0.5)
+    assert result.ok.tolist() == [False, False, True]
+    assert result.counts() == {'no_panel': 0, 'outside': 0, 'clearance': 0, 'too_narrow': 1, 'too_loose': 1}
+    assert format_issues(result.issues(0)).startswith(
+        "LEFTRIHT_SLOTR+LEFTRIGHT_SLOTL of LEFTRIGHT is 9.8 mm, narrower than the material")
+    assert [issue['problem'] for issue in result.issues(1)] == ['too_loose', 'too_loose']
+
+    tight = template.check([400], 600, SLOT_WIDTH, clearance=12.0)
+    assert [issue['problem'] for issue in tight.issues()] == ['clearance', 'clearance']
+    assert format_issues(tight.issues()[:1]) == "LEFTRIHT_SLOTR+LEFTRIGHT_SLOTL of LEFTRIGHT is 10.0 mm from the edge"
+
+def test_outside_slots_match_the_mesh(manager, template):
+    widths = np.arange(300.0, 1500.0, 50.0)
+    result = template.check(widths, 600, SLOT_WIDTH, clearance=0.0)
+    outside = result.problems['outside'].any(axis=1)
+    assert outside.any() and not outside.all()
+    for width, design_outside in zip(widths, outside):
+        model = build_box(manager.scale_to_dimensions(PROFILE, width, 600, SLOT_WIDTH), SLOT_WIDTH)
+        assert bool(model.dropped_slots) == bool(design_outside), width
+    # Checking the batch at once matches checking each design alone
+    for design, width in enumerate(widths):
+        single = template.check([width], 600, SLOT_WIDTH, clearance=0.0)
+        assert single.issues() == result.issues(design)
+
+def test_validate_orders_reports_problem_orders(library, orders):
+    manager = ProfileManager(lazy=True, use_cache=False, use_store=False, dxf_dir=library)
+    problems = dict(validate_orders(manager, read_orders(orders)))
+    assert sorted(problems) == ['thick', 'unknown', 'wide']
+    assert problems['unknown'] == "Unknown profile: missing"
+    assert [issue['problem'] for issue in problems['wide']] == ['outside']
+    assert problems['wide'][0]['panel'] == 'FRONTBACK'
+
+def test_cli_writes_problems(library, orders, tmp_path, capsys):
+    output = str(tmp_path / 'problems.jsonl')
+    assert main([orders, '--dxf-dir', library, '-o', output]) == 1
+    with open(output, encoding='utf-8') as f:
+        problems = {entry['id']: entry for entry in map(json.loads, f)}
+    assert sorted(problems) == ['thick', 'unknown', 'wide']
+    assert 'error' in problems['unknown'] and 'issues' in problems['wide']
+    assert "3 orders with problems" in capsys.readouterr().out
+
+def test_batch_export_fails_orders_that_do_not_fit(library, orders, tmp_path):
+    output_dir = str(tmp_path / 'output')
+    summary = BatchExporter(output_dir, workers=1, dxf_dir=library, validate=True).run(read_orders(orders))
+    assert (summary['exported'], summary['failed']) == (1, 3)
+    assert os.listdir(output_dir).count('fits.dxf') == 1
+    with open(os.path.join(output_dir, 'errors.jsonl'), encoding='utf-8') as f:
+        errors = {entry['id']: entry['error'] for entry in map(json.loads, f)}
+    assert errors['thick'].startswith("Slot fit: ") and "narrower than the material" in errors['thick']
+    assert errors['wide'] == "Slot fit: FRONTBACK_SLOTL+FRONTBACK_SLOTR of FRONTBACK sticks out of its panel"
@@ -0,0 +1,31 @@
+import pickle
+import numpy as np
+import pytest
+from geometry import Geometry, chain_layers
+
+def test_polylines_round_trip(profile):
+    rebuilt = Geometry.from_polylines(profile.iter_polylines())
+    assert rebuilt == profile
+    assert pickle.loads(pickle.dumps(profile)) == profile
+    assert profile.polyline_count == 16
+    assert len(profile.coords) == int(profile.counts.sum())
+
+def test_arrays_are_read_only(profile):
+    with pytest.raises(ValueError):
+        profile.coords[0, 0] = 1.0
+    with pytest.raises(ValueError):
+        profile['LEFTRIGHT_TL'][0, 0] = 1.0
+
+def test_bounds_match_vertices(profile):
+    for layer, (min_x, min_y, max_x, max_y) in profile.layer_bounds().items():
+        points = np.vstack(profile.polylines(layer))
+        assert (min_x, min_y) == tuple(points.min(axis=0))
+        assert (max_x, max_y) == tuple(points.max(axis=0))
+    assert profile.bounds() == (*profile.coords.min(axis=0), *profile.coords.max(axis=0))
+
+def test_quadrants_chain_into_one_ring(profile):
+    layers = [layer for layer in profile.layers if layer.startswith('FRONTBACK_') and 'SLOT' not in layer]
+    polylines = [profile[layer] for layer in layers]
+    loops = chain_layers(layers, polylines)
+    assert len(loops) == 1
+    assert [layers[index].rsplit('_', 1)[1] for index, _ in loops[0]] == ['TL', 'TR', 'BR', 'BL']
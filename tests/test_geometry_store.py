@@ -0,0 +1,96 @@
+import os
+import shutil
+import numpy as np
+import pytest
+import geometry_store
+import profile_manager
+from geometry_store import GeometryStore, build_store, default_store_path, pack_paths, write_store
+from profile_manager import ProfileManager
+
+PROFILE = 'bakjetestingsoftware'
+
+@pytest.fixture
+def store_path(library):
+    return default_store_path(library)
+
+def parsed(library):
+    return ProfileManager(lazy=True, use_cache=False, use_store=False, dxf_dir=library)
+
+def test_store_round_trip_views_the_mapping(library, store_path, profile):
+    stats = build_store(parsed(library), store_path)
+    assert (stats['profiles'], stats['polylines']) == (1, 16)
+    store = GeometryStore(store_path)
+    assert os.path.basename(store.pack_path) in [os.path.basename(path) for path in pack_paths(store_path)]
+    stored = store.get(PROFILE)
+    assert stored == profile
+    assert np.shares_memory(stored.coords, store.coords)
+    assert not stored.coords.flags.writeable
+    assert store.filepath(PROFILE) == os.path.join(library, f'{PROFILE}.dxf')
+
+def test_translated_copies_are_stored_once(library, store_path, profile):
+    filepath = os.path.join(library, f'{PROFILE}.dxf')
+    stamp = geometry_store.file_stamp(filepath)
+    moved = profile.with_coords(profile.coords + [250.0, -40.0])
+    single = write_store(store_path, [(PROFILE, filepath, stamp, profile)])
+    stats = write_store(store_path, [(PROFILE, filepath, stamp, profile), ('moved', filepath, stamp, moved)])
+    assert stats['polylines'] == 32
+    assert stats['unique_polylines'] == single['unique_polylines']
+    assert stats['unique_vertices'] == single['unique_vertices']
+
+    store = GeometryStore(store_path)
+    assert 'shifts' in store.entries['moved'] and 'shifts' not in store.entries[PROFILE]
+    copy = store.get('moved')
+    assert not np.shares_memory(copy.coords, store.coords)
+    np.testing.assert_allclose(copy.coords, moved.coords, rtol=0, atol=1e-9)
+    np.testing.assert_array_equal(copy.offsets, moved.offsets)
+    assert copy.layers == moved.layers
+
+def test_touched_file_is_hashed_once(library, store_path, profile, monkeypatch):
+    build_store(parsed(library), store_path)
+    filepath = os.path.join(library, f'{PROFILE}.dxf')
+    os.utime(filepath, ns=(1, 10 ** 18))
+
+    hashed = []
+    file_stamp = geometry_store.file_stamp
+    monkeypatch.setattr(geometry_store, 'file_stamp', lambda path: hashed.append(path) or file_stamp(path))
+    store = GeometryStore(store_path)
+    assert store.load(filepath) == profile
+    assert store.load(filepath) == profile
+    # Other processes read the refreshed stamp from the sidecar
+    assert GeometryStore(store_path).load(filepath) == profile
+    assert len(hashed) == 1
+    assert os.path.exists(store.pack_path + '.stamps')
+
+    with open(filepath, 'a', encoding='utf-8') as f:
+        f.write('\n')
+    assert store.load(filepath) is None
+    assert store.load(os.path.join(library, 'elsewhere.dxf')) is None
+
+def test_rebuild_switches_packs(library, store_path, profile):
+    build_store(parsed(library), store_path)
+    old = GeometryStore(store_path)
+    shutil.copy(os.path.join(library, f'{PROFILE}.dxf'), os.path.join(library, 'copy.dxf'))
+    stats = build_store(parsed(library), store_path)
+    assert stats['profiles'] == 2 and stats['unique_polylines'] < stats['polylines']
+
+    new = GeometryStore(store_path)
+    assert new.pack_path != old.pack_path
+    assert pack_paths(store_path) == [new.pack_path]
+    # A process that mapped the old pack keeps reading it
+    assert old.get(PROFILE) == profile
+    assert new.get('copy') == profile
+
+def test_manager_maps_profiles_from_the_store(library, store_path, profile, tmp_path, monkeypatch, capsys):
+    # The command line build keeps its profile cache under the working directory
+    monkeypatch.chdir(tmp_path)
+    geometry_store.main(['--dxf-dir', library])
+    assert "Stored 1 profiles in" in capsys.readouterr().out
+    expected = parsed(library).scale_to_dimensions(PROFILE, 400, 600, 18)
+
+    def unexpected(filepath):
+        raise AssertionError(f"{filepath} was parsed")
+    monkeypatch.setattr(profile_manager, 'read_profile', unexpected)
+    manager = ProfileManager(use_cache=False, dxf_dir=library)
+    assert manager.store is not None
+    assert manager.profiles[PROFILE] == profile
+    assert manager.scale_to_dimensions(PROFILE, 400, 600, 18) == expected
@@ -0,0 +1,62 @@
+import json
+import pytest
+import instrumentation
+from profile_manager import ProfileManager
+
+PROFILE = 'bakjetestingsoftware'
+
+@pytest.fixture
+def tracing():
+    instrumentation.reset()
+    instrumentation.enable()
+    yield
+    instrumentation.disable()
+    instrumentation.reset()
+
+def test_trace_records_spans_and_counters(library, tracing, tmp_path):
+    manager = ProfileManager(use_cache=False, use_store=False, dxf_dir=library)
+    manager.scale_to_dimensions(PROFILE, 400, 600, 18)
+    manager.scale_to_dimensions(PROFILE, 400, 600, 18)
+
+    trace_path = tmp_path / 'trace.json'
+    instrumentation.write_trace(str(trace_path))
+    with open(trace_path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+
+    spans = {event['name']: event for event in data['traceEvents'] if event['ph'] == 'X'}
+    assert spans['read_profile']['cat'] == 'parse'
+    assert spans['read_profile']['args']['polylines'] == 16
+    assert spans['scale_profile']['cat'] == 'scale'
+    assert all(event['dur'] >= 0 for event in spans.values())
+    totals = data['otherData']['counters']
+    assert totals['vertices_parsed'] == len(manager.profiles[PROFILE].coords)
+    assert totals['scale_cache_misses'] == 1
+    assert totals['scale_cache_hits'] == 1
+
+def test_failed_span_records_the_error(tracing):
+    with pytest.raises(ValueError):
+        with instrumentation.span('broken', 'export'):
+            raise ValueError("boom")
+    event, = instrumentation.trace_data()['traceEvents']
+    assert event['args'] == {'error': 'ValueError'}
+
+def test_disabled_tracing_records_nothing(library):
+    instrumentation.reset()
+    assert not instrumentation.is_enabled()
+    ProfileManager(use_cache=False, use_store=False, dxf_dir=library)
+    with instrumentation.span('unused', 'load') as unused:
+        unused.set(items=1)
+    assert instrumentation.trace_data()['traceEvents'] == []
+    assert instrumentation.counters() == {}
+
+def test_configure_writes_the_trace_at_exit(monkeypatch, tmp_path):
+    registered = []
+    monkeypatch.setattr(instrumentation.atexit, 'register', lambda *args: registered.append(args))
+    trace_path = str(tmp_path / 'trace.json')
+    try:
+        instrumentation.configure('debug', trace_path)
+        assert instrumentation.is_enabled()
+        assert registered == [(instrumentation.write_trace, trace_path)]
+    finally:
+        instrumentation.disable()
+        instrumentation.reset()
@@ -0,0 +1,72 @@
+import struct
+import numpy as np
+import pytest
+from cutting_list import part_metrics
+from mesh3d import MeshCache, build_box, format_dropped_slots, write_mesh
+from nesting import parts_from_profile
+from profile_manager import ProfileManager
+
+PROFILE = 'bakjetestingsoftware'
+
+@pytest.fixture
+def manager(library):
+    return ProfileManager(use_cache=False, use_store=False, dxf_dir=library)
+
+def test_panels_are_closed_solids_with_their_slots(manager):
+    scaled = manager.scale_to_dimensions(PROFILE, 400, 600, 18)
+    model = build_box(scaled, 18)
+    assert model.dropped_slots == {}
+    assert {name: len(mesh.faces) for name, mesh in model.meshes.items()} == \
+        {'LEFTRIGHT': 148, 'FRONTBACK': 140, 'BOTTOM': 100}
+    metrics = {row['panel']: row for row in part_metrics(parts_from_profile(scaled))}
+    for name, mesh in model.meshes.items():
+        assert mesh.is_watertight
+        assert mesh.volume == pytest.approx(metrics[name]['area'] * 18, rel=1e-6)
+        np.testing.assert_allclose(mesh.bounds[0], 0.0, atol=1e-9)
+        np.testing.assert_allclose(mesh.bounds[1], [metrics[name]['width'], metrics[name]['height'], 18], atol=1e-6)
+
+def test_box_places_both_sides_and_faces(manager):
+    model = build_box(manager.scale_to_dimensions(PROFILE, 400, 600, 18), 18)
+    assert [name for name, _, _ in model.instances] == \
+        ['LEFTRIGHT_LEFT', 'LEFTRIGHT_RIGHT', 'FRONTBACK_FRONT', 'FRONTBACK_BACK', 'BOTTOM']
+    assert model.face_count == 2 * 148 + 2 * 140 + 100
+    combined = model.to_trimesh()
+    assert len(combined.faces) == model.face_count
+    assert combined.bounds[0].tolist() == [0.0, 0.0, 0.0]
+
+def test_slots_crossing_the_outline_are_reported(manager):
+    model = build_box(manager.scale_to_dimensions(PROFILE, 1200, 600, 18), 18)
+    assert model.dropped_slots == {'FRONTBACK': 1}
+    assert format_dropped_slots(model.dropped_slots) == "1 in FRONTBACK"
+    assert all(mesh.is_watertight for mesh in model.meshes.values())
+
+def test_write_stl_and_obj(manager, tmp_path):
+    model = build_box(manager.scale_to_dimensions(PROFILE, 400, 600, 18), 18)
+    stl_path = str(tmp_path / 'box.stl')
+    write_mesh(model, stl_path)
+    with open(stl_path, 'rb') as f:
+        data = f.read()
+    facets, = struct.unpack('<I', data[80:84])
+    assert facets == model.face_count
+    assert len(data) == 84 + 50 * facets
+
+    obj_path = str(tmp_path / 'box.obj')
+    write_mesh(model, obj_path)
+    with open(obj_path, 'r', encoding='utf-8') as f:
+        lines = f.read().splitlines()
+    assert [line[2:] for line in lines if line.startswith('o ')] == [name for name, _, _ in model.instances]
+    assert sum(line.startswith('f ') for line in lines) == model.face_count
+    vertices = sum(line.startswith('v ') for line in lines)
+    faces = np.array([line.split()[1:] for line in lines if line.startswith('f ')], dtype=int)
+    assert faces.min() == 1 and faces.max() == vertices
+
+def test_mesh_cache_reuses_models_and_panels(manager):
+    mesh_cache = MeshCache(manager)
+    model = mesh_cache.box(PROFILE, 400, 600, 18)
+    assert mesh_cache.box(PROFILE, 400, 600, 18) is model
+    # Nothing moves with the height, so every panel mesh is reused
+    taller = mesh_cache.box(PROFILE, 400, 900, 18)
+    assert taller is not model
+    for name, mesh in model.meshes.items():
+        assert taller.meshes[name] is mesh
+    assert mesh_cache.box('missing', 400, 600, 18) is None
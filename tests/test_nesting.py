@@ -0,0 +1,70 @@
+import logging
+import numpy as np
+import pytest
+from geometry import Geometry
+from nesting import SHEET_LAYER, nest, parts_from_profile
+from profile_manager import ProfileManager
+
+PROFILE = 'bakjetestingsoftware'
+
+@pytest.fixture
+def manager(library):
+    return ProfileManager(use_cache=False, use_store=False, dxf_dir=library)
+
+def placed_rectangles(result):
+    for sheet_index, sheet in enumerate(result.sheets):
+        for part_index, x, y, rotated in sheet:
+            part = result.parts[part_index]
+            width, height = (part.height, part.width) if rotated else (part.width, part.height)
+            yield sheet_index, x + result.margin, y + result.margin, width, height
+
+def test_each_panel_is_a_part_with_its_slots(manager):
+    scaled = manager.scale_to_dimensions(PROFILE, 400, 600, 18)
+    parts = parts_from_profile(scaled, 'order1:')
+    assert sorted(part.name for part in parts) == ['order1:BOTTOM', 'order1:FRONTBACK', 'order1:LEFTRIGHT']
+    assert sum(part.geometry.polyline_count for part in parts) == scaled.polyline_count
+    slots = {part.name: [layer for layer, _ in part.geometry.iter_polylines() if 'SLOT' in layer] for part in parts}
+    assert len(slots['order1:LEFTRIGHT']) == 2 and len(slots['order1:FRONTBACK']) == 2
+    assert slots['order1:BOTTOM'] == []
+
+def test_slot_outside_every_panel_goes_to_the_nearest(manager, caplog):
+    scaled = manager.scale_to_dimensions(PROFILE, 400, 600, 18)
+    stray = [(900.0, 800.0), (910.0, 800.0), (910.0, 810.0)]
+    geometry = Geometry.from_polylines([*scaled.iter_polylines(), ('STRAY_SLOT', stray)])
+    with caplog.at_level(logging.WARNING, logger='nesting'):
+        parts = parts_from_profile(geometry)
+    assert 'STRAY_SLOT' in caplog.text
+    assert sum(part.geometry.polyline_count for part in parts) == geometry.polyline_count
+
+def test_nested_parts_stay_apart_and_on_the_sheet(manager):
+    parts = []
+    for order, (width, height) in enumerate([(400, 600), (800, 500), (300, 300), (1000, 900)] * 3):
+        scaled = manager.scale_to_dimensions(PROFILE, width, height, 18)
+        parts += parts_from_profile(scaled, f"{order}:")
+    kerf, margin = 3.0, 10.0
+    result = nest(parts, 1220.0, 610.0, kerf, margin, time_budget=0.2)
+    assert sorted(index for sheet in result.sheets for index, _, _, _ in sheet) == list(range(len(parts)))
+    assert 0 < result.yield_ratio <= 1
+
+    rectangles = list(placed_rectangles(result))
+    for sheet_index, x, y, width, height in rectangles:
+        assert margin - 1e-6 <= x and x + width <= 1220.0 - margin + 1e-6
+        assert margin - 1e-6 <= y and y + height <= 610.0 - margin + 1e-6
+    for i, (sheet_a, xa, ya, wa, ha) in enumerate(rectangles):
+        for sheet_b, xb, yb, wb, hb in rectangles[i + 1:]:
+            if sheet_a == sheet_b:
+                assert (xa + wa + kerf <= xb + 1e-6 or xb + wb + kerf <= xa + 1e-6
+                        or ya + ha + kerf <= yb + 1e-6 or yb + hb + kerf <= ya + 1e-6)
+
+def test_sheet_geometry_places_parts_inside_the_outline(manager):
+    parts = parts_from_profile(manager.scale_to_dimensions(PROFILE, 400, 600, 18), rotatable=False)
+    result = nest(parts, 1220.0, 610.0, 3.0, 10.0, time_budget=0.1)
+    assert all(not rotated for sheet in result.sheets for _, _, _, rotated in sheet)
+    sheet = result.sheet_geometry(0)
+    assert sheet.polylines(SHEET_LAYER)[0].max(axis=0).tolist() == [1220.0, 610.0]
+    assert sheet.polyline_count == sum(part.geometry.polyline_count for part in parts) + 1
+    parts_only = result.sheet_geometry(0, outline=False)
+    assert SHEET_LAYER not in parts_only
+    min_x, min_y, max_x, max_y = parts_only.bounds()
+    assert min_x >= 10.0 and min_y >= 10.0 and max_x <= 1210.0 and max_y <= 600.0
+    assert np.isclose(result.yield_ratio * 1220.0 * 610.0, sum(part.area for part in parts))
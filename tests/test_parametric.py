@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+from parametric import ParametricModel
+from profile_manager import ProfileManager
+
+PROFILE = 'bakjetestingsoftware'
+
+@pytest.fixture
+def manager(library):
+    return ProfileManager(use_cache=False, use_store=False, dxf_dir=library)
+
+def test_update_recomputes_only_downstream_nodes():
+    calls = []
+    model = ParametricModel()
+    model.add_parameter('width', 400)
+    model.add_parameter('height', 600)
+    model.add_node('half', lambda width: calls.append('half') or width // 2, ('width',))
+    model.add_node('even', lambda half: calls.append('even') or half % 2 == 0, ('half',))
+    model.add_node('area', lambda half, height: calls.append('area') or half * height, ('half', 'height'))
+    calls.clear()
+
+    assert model.update(width=400) == []
+    assert model.update(height=700) == ['area']
+    assert calls == ['area']
+    calls.clear()
+    # 'half' changes but 'even' recomputes to the same value, so it is not reported
+    assert model.update(width=404) == ['half', 'area']
+    assert calls == ['half', 'even', 'area']
+    assert model['area'] == 202 * 700
+    assert model.affected(['width']) == ['half', 'even', 'area']
+
+def test_unknown_and_duplicate_names_are_rejected():
+    model = ParametricModel()
+    model.add_parameter('width', 400)
+    model.add_node('half', lambda width: width / 2, ('width',))
+    with pytest.raises(ValueError):
+        model.add_parameter('width', 500)
+    with pytest.raises(ValueError):
+        model.add_node('depth', lambda height: height, ('height',))
+    with pytest.raises(KeyError):
+        model.update(half=3)
+    with pytest.raises(KeyError):
+        model.update(height=3)
+
+def test_model_offsets_match_scale(manager, profile):
+    layout = manager.layouts[PROFILE]
+    model = layout.model(profile, 400, 600, 18)
+    scaled = manager.scale_to_dimensions(PROFILE, 400, 600, 18)
+    for layer in profile.layers:
+        points = profile.polylines(layer)[0]
+        np.testing.assert_allclose(scaled.polylines(layer)[0] - points,
+                                   np.broadcast_to(model[f"layer:{layer}"], points.shape))
+
+    changed = model.update(width=800)
+    assert 'x_offset' in changed and 'y_offset' not in changed
+    moving = [f"layer:{layer}" for layer_id, layer in enumerate(profile.layers) if layout.moves_x[layer_id]]
+    assert moving and [name for name in changed if name.startswith('layer:')] == moving
+    assert model.update(material_thickness=12) == []
+
+    scaled = manager.scale_to_dimensions(PROFILE, 800, 600, 18)
+    for layer in profile.layers:
+        np.testing.assert_allclose(scaled.polylines(layer)[0] - profile.polylines(layer)[0],
+                                   np.broadcast_to(model[f"layer:{layer}"], profile.polylines(layer)[0].shape))
@@ -0,0 +1,43 @@
+import os
+from profile_cache import ProfileCache
+from profile_manager import ProfileManager, read_profile
+
+def test_cached_profile_matches_parse(library, tmp_path):
+    filepath = os.path.join(library, 'bakjetestingsoftware.dxf')
+    cache = ProfileCache(str(tmp_path / 'cache'))
+    assert cache.load(filepath) is None
+    profile = read_profile(filepath)
+    cache.store(filepath, profile)
+    assert cache.load(filepath) == profile
+    assert cache.stats == {'hits': 1, 'misses': 1, 'rebuilds': 0}
+
+def test_touched_file_is_hashed_once(library, tmp_path, monkeypatch):
+    filepath = os.path.join(library, 'bakjetestingsoftware.dxf')
+    cache = ProfileCache(str(tmp_path / 'cache'))
+    profile = read_profile(filepath)
+    cache.store(filepath, profile)
+    os.utime(filepath, ns=(1, 10 ** 18))
+
+    digests = []
+    file_digest = ProfileCache.file_digest
+    monkeypatch.setattr(ProfileCache, 'file_digest', staticmethod(lambda path: digests.append(path) or file_digest(path)))
+    assert cache.load(filepath) == profile
+    assert cache.load(filepath) == profile
+    assert len(digests) == 1
+
+def test_changed_file_invalidates_entry(library, tmp_path):
+    filepath = os.path.join(library, 'bakjetestingsoftware.dxf')
+    cache = ProfileCache(str(tmp_path / 'cache'))
+    cache.store(filepath, read_profile(filepath))
+    with open(filepath, 'a', encoding='utf-8') as f:
+        f.write('999\nedited\n')
+    assert cache.load(filepath) is None
+    assert cache.stats['rebuilds'] == 1
+    assert not os.path.exists(cache.entry_path(filepath))
+
+def test_manager_reads_profiles_from_cache(library, tmp_path):
+    cache_dir = str(tmp_path / 'cache')
+    first = ProfileManager(cache_dir=cache_dir, dxf_dir=library, use_store=False)
+    second = ProfileManager(cache_dir=cache_dir, dxf_dir=library, use_store=False)
+    assert second.cache.stats['hits'] == 1
+    assert second.get_profile('bakjetestingsoftware') == first.get_profile('bakjetestingsoftware')
@@ -0,0 +1,50 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from lru import LRUCache
+from profile_index import LazyProfiles, ProfileManifest
+from profile_manager import ProfileManager, read_profile
+
+def test_lazy_manager_parses_on_first_access(library):
+    manager = ProfileManager(lazy=True, use_cache=False, use_store=False, dxf_dir=library)
+    assert list(manager.profiles) == ['bakjetestingsoftware']
+    assert len(manager.profiles.resident) == 0
+    profile = manager.get_profile('bakjetestingsoftware')
+    assert profile == read_profile(os.path.join(library, 'bakjetestingsoftware.dxf'))
+    assert manager.get_profile('bakjetestingsoftware') is profile
+
+def test_manifest_lists_profiles_without_parsing(library, tmp_path):
+    manifest_path = str(tmp_path / 'manifest.json')
+    ProfileManager(use_cache=False, use_store=False, dxf_dir=library).write_manifest(manifest_path)
+    manifest = ProfileManifest.load(manifest_path)
+    assert manifest.get('bakjetestingsoftware')['bbox'] is not None
+
+    manager = ProfileManager(lazy=True, use_cache=False, use_store=False, manifest_path=manifest_path)
+    assert manager.get_profile_info('bakjetestingsoftware') == manifest.get('bakjetestingsoftware')
+    assert len(manager.profiles.resident) == 0
+
+def test_concurrent_access_parses_once(library):
+    filepath = os.path.join(library, 'bakjetestingsoftware.dxf')
+    parsed = []
+
+    def loader(path):
+        parsed.append(threading.get_ident())
+        time.sleep(0.05)
+        return read_profile(path)
+
+    profiles = LazyProfiles({'bakjetestingsoftware': filepath}, loader)
+    with ThreadPoolExecutor(8) as pool:
+        results = list(pool.map(lambda _: profiles['bakjetestingsoftware'], range(16)))
+    assert len(parsed) == 1
+    assert all(result is results[0] for result in results)
+
+def test_lru_stays_within_budget():
+    cache = LRUCache(max_bytes=100, sizeof=len)
+    for key in 'abcd':
+        cache.put(key, 'x' * 40)
+    assert cache.keys() == ['c', 'd']
+    assert cache.total_bytes == 80
+    assert cache.get('a') is None
+    cache.put('e', 'x' * 500)
+    assert cache.keys() == ['e']
@@ -0,0 +1,28 @@
+import numpy as np
+import pytest
+from profile_layout import ProfileLayout
+from profile_manager import ProfileManager
+
+PROFILE = 'bakjetestingsoftware'
+
+@pytest.fixture
+def manager(library):
+    return ProfileManager(use_cache=False, use_store=False, dxf_dir=library)
+
+def test_scale_moves_whole_layers(manager, profile):
+    layout = ProfileLayout(profile)
+    scaled = layout.scale(profile, 0.5, 0.8)
+    dx, dy = layout.x_offset(0.5), layout.y_offset(0.8)
+    for layer_id, layer in enumerate(profile.layers):
+        expected = (dx if layout.moves_x[layer_id] else 0.0, dy if layout.moves_y[layer_id] else 0.0)
+        for original, moved in zip(profile.polylines(layer), scaled.polylines(layer)):
+            np.testing.assert_allclose(moved - original, np.broadcast_to(expected, original.shape))
+        if 'SLOT' in layer:
+            assert expected == (0.0, 0.0)
+
+def test_scaled_results_are_memoized(manager):
+    scaled = manager.scale_to_dimensions(PROFILE, 400, 600, 18)
+    assert manager.scale_to_dimensions(PROFILE, 400, 600, 18) is scaled
+    assert manager.scale_to_dimensions(PROFILE, 401, 600, 18) is not scaled
+    with pytest.raises(ValueError):
+        scaled.coords[0, 0] = 0.0
@@ -0,0 +1,29 @@
+import os
+import shutil
+import pytest
+from profile_manager import ProfileManager
+
+@pytest.fixture
+def copies(library):
+    """The bundled profile under three names, plus a file that is not a DXF drawing"""
+    source = os.path.join(library, 'bakjetestingsoftware.dxf')
+    for name in ('copy1', 'copy2'):
+        shutil.copy(source, os.path.join(library, f'{name}.dxf'))
+    with open(os.path.join(library, 'broken.dxf'), 'w', encoding='utf-8') as f:
+        f.write('not a drawing\n')
+    return library
+
+def test_parallel_load_matches_serial(copies):
+    serial = ProfileManager(use_cache=False, use_store=False, dxf_dir=copies, workers=1)
+    parallel = ProfileManager(use_cache=False, use_store=False, dxf_dir=copies, workers=3)
+    assert list(parallel.profiles) == list(serial.profiles)
+    assert sorted(serial.profiles) == ['bakjetestingsoftware', 'copy1', 'copy2']
+    for name, profile in serial.profiles.items():
+        assert parallel.profiles[name] == profile
+        assert parallel.layouts[name].digest == serial.layouts[name].digest
+
+def test_parallel_load_fills_the_cache(copies, tmp_path):
+    cache_dir = str(tmp_path / 'cache')
+    ProfileManager(cache_dir=cache_dir, use_store=False, dxf_dir=copies, workers=3)
+    cached = ProfileManager(cache_dir=cache_dir, use_store=False, dxf_dir=copies, workers=3)
+    assert cached.cache.stats['hits'] == 3
@@ -0,0 +1,88 @@
+import os
+import shutil
+import time
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+import pytest
+from PyQt6.QtCore import QThreadPool
+from PyQt6.QtWidgets import QApplication
+app = QApplication.instance() or QApplication([])
+from background import Task
+from dxf_export import write_dxf
+from profile_manager import ProfileManager
+from profile_watcher import ProfileWatcher, diff_snapshots, reload_changed, scan_directory
+
+PROFILE = 'bakjetestingsoftware'
+
+@pytest.fixture
+def manager(library):
+    shutil.copy(os.path.join(library, f'{PROFILE}.dxf'), os.path.join(library, 'old.dxf'))
+    return ProfileManager(use_cache=False, use_store=False, dxf_dir=library)
+
+def edit_library(manager):
+    """Replace the bundled profile with a wider copy, add one profile and remove another"""
+    library = manager.dxf_dir
+    wider = manager.scale_to_dimensions(PROFILE, 800, 600, 18)
+    write_dxf(wider, os.path.join(library, f'{PROFILE}.dxf'))
+    shutil.copy(os.path.join(library, 'old.dxf'), os.path.join(library, 'new.dxf'))
+    os.remove(os.path.join(library, 'old.dxf'))
+    return wider
+
+def run_reload(manager, snapshot):
+    results = []
+    task = Task(reload_changed, manager, snapshot)
+    task.signals.result.connect(results.append)
+    task.run()
+    return results[0]
+
+def test_diff_snapshots():
+    changed, removed = diff_snapshots({'a': 1, 'b': 2, 'c': 3}, {'a': 1, 'b': 4, 'd': 5})
+    assert changed == ['b', 'd']
+    assert removed == ['c']
+
+def test_reload_parses_only_changed_files(manager, monkeypatch):
+    snapshot = scan_directory(manager.dxf_dir)
+    wider = edit_library(manager)
+    parsed = []
+    read_profile = manager._read_profile
+    monkeypatch.setattr(manager, '_read_profile', lambda filepath: parsed.append(filepath) or read_profile(filepath))
+
+    current, loaded, removed = run_reload(manager, snapshot)
+    assert sorted(os.path.basename(filepath) for filepath in parsed) == [f'{PROFILE}.dxf', 'new.dxf']
+    assert sorted(loaded) == [PROFILE, 'new'] and removed == ['old']
+    assert current == scan_directory(manager.dxf_dir)
+
+    old_layout = manager.layouts[PROFILE]
+    manager.swap_profiles(loaded, removed)
+    assert sorted(manager.list_profiles()) == [PROFILE, 'new']
+    assert manager.profiles[PROFILE] == wider
+    assert manager.layouts[PROFILE] is not old_layout
+    assert 'old' not in manager.info and 'new' in manager.layouts
+
+def test_unreadable_file_is_retried(manager):
+    snapshot = scan_directory(manager.dxf_dir)
+    broken = os.path.join(manager.dxf_dir, 'broken.dxf')
+    with open(broken, 'w', encoding='utf-8') as f:
+        f.write('not a drawing\n')
+    current, loaded, removed = run_reload(manager, snapshot)
+    assert loaded == {} and removed == []
+    assert broken not in current
+    assert diff_snapshots(current, scan_directory(manager.dxf_dir)) == ([broken], [])
+
+def test_watcher_swaps_edited_profiles(manager):
+    pool = QThreadPool()
+    watcher = ProfileWatcher(manager, pool, debounce=20, poll_interval=20)
+    changes = []
+    watcher.profiles_changed.connect(lambda loaded, removed: changes.append((loaded, removed)))
+    try:
+        wider = edit_library(manager)
+        # Polling catches the edit too if no file system event arrives
+        watcher.poll_timer.start()
+        deadline = time.monotonic() + 10
+        while not changes and time.monotonic() < deadline:
+            app.processEvents()
+            time.sleep(0.005)
+    finally:
+        watcher.stop()
+        pool.waitForDone()
+    assert changes[0] == ([PROFILE, 'new'], ['old'])
+    assert manager.profiles[PROFILE] == wider
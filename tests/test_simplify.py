@@ -0,0 +1,82 @@
+import numpy as np
+import pytest
+from geometry import Geometry
+from simplify import LevelOfDetail, segment_distances
+
+def polyline_error(original, simplified):
+    """Largest distance of an original vertex to the simplified polyline"""
+    starts, ends = simplified[:-1], simplified[1:]
+    distances = [segment_distances(np.broadcast_to(point, starts.shape), starts, ends).min()
+                 for point in original]
+    return max(distances)
+
+def densified(profile, pieces=10, noise=1e-3):
+    """The profile with every segment split into ``pieces``, jittered by up to ``noise``"""
+    rng = np.random.default_rng(7)
+    polylines = []
+    for layer, points in profile.iter_polylines():
+        t = np.linspace(0.0, 1.0, pieces, endpoint=False)[:, np.newaxis]
+        dense = (points[:-1, np.newaxis] * (1 - t) + points[1:, np.newaxis] * t).reshape(-1, 2)
+        dense = np.vstack([dense, points[-1:]])
+        dense[1:-1] += rng.uniform(-noise, noise, dense[1:-1].shape)
+        polylines.append((layer, dense))
+    return Geometry.from_polylines(polylines)
+
+@pytest.fixture(scope='module')
+def lod(profile):
+    return LevelOfDetail(profile)
+
+def test_levels_keep_endpoints_and_bounds(profile, lod):
+    for level in range(len(lod.tolerances)):
+        simplified = lod.level(level)
+        assert simplified.layers == profile.layers
+        assert simplified.polyline_count == profile.polyline_count
+        for (layer, points), (simple_layer, simple) in zip(profile.iter_polylines(), simplified.iter_polylines()):
+            assert simple_layer == layer
+            np.testing.assert_array_equal(simple[0], points[0])
+            np.testing.assert_array_equal(simple[-1], points[-1])
+            np.testing.assert_array_equal(simple.min(axis=0), points.min(axis=0))
+            np.testing.assert_array_equal(simple.max(axis=0), points.max(axis=0))
+
+def test_levels_stay_within_tolerance(profile, lod):
+    for level, tolerance in enumerate(lod.tolerances):
+        simplified = lod.level(level)
+        for (_, points), (_, simple) in zip(profile.iter_polylines(), simplified.iter_polylines()):
+            assert polyline_error(points, simple) <= tolerance
+
+def test_levels_nest(lod):
+    counts = []
+    for level in range(len(lod.tolerances) - 1):
+        mask, offsets = lod.mask(level)
+        coarser, _ = lod.mask(level + 1)
+        assert not np.any(coarser & ~mask)
+        assert offsets[-1] == mask.sum()
+        counts.append(mask.sum())
+    assert counts[-1] < counts[0]
+
+def test_level_for_picks_the_coarsest_level_within_tolerance(profile, lod):
+    assert lod.level_for(lod.tolerances[0] / 2) is None
+    assert lod.level(None) is profile
+    assert lod.level_for(lod.tolerances[3]) == 3
+    assert lod.level_for((lod.tolerances[3] + lod.tolerances[4]) / 2) == 3
+    assert lod.level(3) is lod.level(3)
+    coords, offsets = lod.simplified(lod.tolerances[0] / 2)
+    assert coords is profile.coords and offsets is profile.offsets
+
+def test_dense_outline_simplifies_back(profile):
+    dense = densified(profile)
+    lod = LevelOfDetail(dense)
+    tolerance = 4e-3
+    coords, offsets = lod.simplified(tolerance)
+    # The jittered vertices at each polyline's bounds are kept as well
+    assert len(coords) <= len(profile.coords) + 4 * profile.polyline_count
+    assert len(coords) * 4 < len(dense.coords)
+    for index, (_, points) in enumerate(dense.iter_polylines()):
+        assert polyline_error(points, coords[offsets[index]:offsets[index + 1]]) <= tolerance
+
+def test_scaled_coords_use_the_same_mask(profile, lod):
+    scaled = profile.coords * 2.0
+    coords, offsets = lod.simplified(lod.tolerances[12], scaled)
+    mask, level_offsets = lod.mask(12)
+    np.testing.assert_array_equal(coords, scaled[mask])
+    assert offsets is level_offsets
@@ -0,0 +1,56 @@
+import re
+import xml.etree.ElementTree as ET
+import numpy as np
+import pytest
+from profile_manager import ProfileManager
+from svg_export import write_svg
+
+NS = {'svg': 'http://www.w3.org/2000/svg'}
+COMMAND = re.compile(r'([mlz])([^mlz]*)')
+NUMBER = re.compile(r'-?(?:\d+\.?\d*|\.\d+)')
+
+def parse_path(data):
+    """Decode relative m/l/z path data into absolute polylines, in SVG coordinates"""
+    polylines = []
+    pen = np.zeros(2)
+    for command, numbers in COMMAND.findall(data):
+        values = np.array([float(number) for number in NUMBER.findall(numbers)]).reshape(-1, 2)
+        if command == 'm':
+            pen = pen + values[0]
+            polylines.append([pen])
+            values = values[1:]
+        if command == 'z':
+            pen = polylines[-1][0]
+            polylines[-1].append(pen)
+            continue
+        for step in values:
+            pen = pen + step
+            polylines[-1].append(pen)
+    return [np.array(points) for points in polylines]
+
+@pytest.fixture
+def scaled(library):
+    manager = ProfileManager(use_cache=False, use_store=False, dxf_dir=library)
+    return manager.scale_to_dimensions('bakjetestingsoftware', 400, 600, 18)
+
+@pytest.mark.parametrize('precision', [3, 1])
+def test_paths_match_the_geometry(scaled, tmp_path, precision):
+    filepath = str(tmp_path / 'design.svg')
+    write_svg(scaled, filepath, precision=precision)
+    paths = ET.parse(filepath).getroot().findall('svg:path', NS)
+    assert [path.find('svg:title', NS).text for path in paths] == list(scaled.layers)
+    for path, layer in zip(paths, scaled.layers):
+        assert path.get('stroke') == ('#0000ff' if 'SLOT' in layer else '#000000')
+        polylines = parse_path(path.get('d'))
+        assert len(polylines) == len(scaled.polylines(layer))
+        for points, expected in zip(polylines, scaled.polylines(layer)):
+            # Each vertex is rounded once, however long the path
+            np.testing.assert_allclose(points * (1, -1), expected, atol=0.5 * 10 ** -precision + 1e-9)
+
+def test_lower_precision_is_smaller(scaled, tmp_path):
+    sizes = []
+    for precision in (3, 1):
+        filepath = tmp_path / f'design{precision}.svg'
+        write_svg(scaled, str(filepath), precision=precision)
+        sizes.append(filepath.stat().st_size)
+    assert sizes[1] < sizes[0]
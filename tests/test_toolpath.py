@@ -0,0 +1,44 @@
+import os
+import ezdxf
+import numpy as np
+import pytest
+from nesting import main as nest_main
+from profile_manager import ProfileManager
+from toolpath import contour_precedence, optimize_cut_order
+
+PROFILE = 'bakjetestingsoftware'
+
+@pytest.fixture
+def scaled(library):
+    manager = ProfileManager(use_cache=False, use_store=False, dxf_dir=library)
+    return manager.scale_to_dimensions(PROFILE, 400, 600, 18)
+
+def polyline_keys(geometry):
+    # Contours may be cut in either direction
+    return sorted((layer, tuple(map(tuple, min(points.tolist(), points[::-1].tolist()))))
+                  for layer, points in geometry.iter_polylines())
+
+def test_reordering_keeps_every_contour(scaled):
+    ordered, report = optimize_cut_order(scaled)
+    assert polyline_keys(ordered) == polyline_keys(scaled)
+    assert report['contours'] == scaled.polyline_count
+    assert report['travel_after'] <= report['travel_nearest'] + 1e-9
+    assert report['travel_after'] < report['travel_before']
+
+def test_slots_are_cut_before_their_outline(scaled):
+    ordered, _ = optimize_cut_order(scaled)
+    children, parents = contour_precedence(ordered)
+    assert len(children)
+    assert np.all(children < parents)
+
+def test_nested_sheets_leave_the_border_out_of_the_cut_order(library, tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    orders = tmp_path / 'orders.csv'
+    orders.write_text(f'id,profile,width,height,material\n1,{PROFILE},400,600,18\n', encoding='utf-8')
+    output_dir = tmp_path / 'nest'
+    assert nest_main([str(orders), '-o', str(output_dir), '--dxf-dir', library, '--optimize-cuts',
+                      '-j', '1', '--time', '0.1']) == 0
+    assert 'Cut order: 16 contours' in capsys.readouterr().out
+    layers = [entity.dxf.layer for entity in ezdxf.readfile(os.path.join(output_dir, '18mm_sheet1.dxf')).modelspace()]
+    assert layers.count('SHEET') == 1 and layers[0] == 'SHEET'
+    assert len(layers) == 17
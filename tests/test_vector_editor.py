@@ -0,0 +1,50 @@
+import os
+import pytest
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+from PyQt6.QtWidgets import QApplication
+app = QApplication.instance() or QApplication([])
+from vector_editor import Container, DrawingArea
+
+@pytest.fixture
+def area(profile, monkeypatch):
+    built = []
+    build_paths = DrawingArea.build_paths
+    monkeypatch.setattr(DrawingArea, 'build_paths', staticmethod(lambda level: built.append(level) or build_paths(level)))
+    container = Container()
+    container.current_profile = profile
+    area = DrawingArea(container)
+    area.resize(800, 600)
+    area.built = built
+    yield area
+    area.deleteLater()
+
+def test_paths_are_built_once_per_profile(area, profile):
+    area.grab()
+    assert len(area.built) == 1
+
+    # Moving layers and repainting only change the transforms
+    area.container.layer_offsets = {'FRONTBACK_TR': (120.0, 0.0)}
+    area.grab()
+    area.container.current_profile = profile
+    area.grab()
+    assert len(area.built) == 1
+
+    # Each zoom's level of detail is built once, and kept
+    area.container.update_dimensions(2000, 2000, 18)
+    area.grab()
+    built = len(area.built)
+    area.container.update_dimensions(400, 600, 18)
+    area.grab()
+    area.container.update_dimensions(2000, 2000, 18)
+    area.grab()
+    assert len(area.built) == built
+
+def test_paths_cover_every_layer(area, profile):
+    assert {layer for layer, _, _ in area.profile_paths(0.0)} == set(profile.layers)
+
+def test_new_profile_rebuilds_paths(area, profile):
+    area.grab()
+    area.container.current_profile = profile.with_coords(profile.coords + 10.0)
+    area.grab()
+    assert len(area.built) == 2
@@ -0,0 +1,183 @@
+import time
+import numpy as np
+from geometry import Geometry
+
+def is_inner(layer):
+    """Inner features (slots) must be cut before the outlines around them"""
+    return 'SLOT' in layer
+
+def contour_precedence(geometry):
+    """Find which contours must be cut before which
+
+    Returns ``(children, parents)`` index arrays: contour ``children[k]`` is
+    an inner feature whose centre lies within the bounds of the outer
+    contour ``parents[k]``, so it has to be cut first. Bounds are used
+    rather than exact containment because profile outlines are often made
+    of several open polylines.
+    """
+    bounds = geometry.polyline_bounds()
+    inner = np.array([is_inner(geometry.layers[layer_id]) for layer_id in geometry.layer_ids.tolist()],
+                     dtype=bool).reshape(-1)
+    inner_ids = np.flatnonzero(inner)
+    outer_ids = np.flatnonzero(~inner)
+    if not len(inner_ids) or not len(outer_ids):
+        return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp)
+
+    centers = (bounds[inner_ids, :2] + bounds[inner_ids, 2:]) / 2
+    outer = bounds[outer_ids]
+    children = []
+    parents = []
+    # Test a block of inner features against every outline at a time
+    block = max(1, 4_000_000 // len(outer_ids))
+    for start in range(0, len(inner_ids), block):
+        c = centers[start:start + block, np.newaxis]
+        inside = ((c[..., 0] >= outer[:, 0]) & (c[..., 0] <= outer[:, 2])
+                  & (c[..., 1] >= outer[:, 1]) & (c[..., 1] <= outer[:, 3]))
+        rows, cols = np.nonzero(inside)
+        children.append(inner_ids[start + rows])
+        parents.append(outer_ids[cols])
+    return np.concatenate(children), np.concatenate(parents)
+
+def travel_distance(starts, ends, origin=(0.0, 0.0)):
+    """Rapid travel from the origin through contours cut from ``starts`` to ``ends``, in order"""
+    if not len(starts):
+        return 0.0
+    previous = np.vstack([np.asarray(origin, dtype=np.float64).reshape(1, 2), ends[:-1]])
+    return float(np.hypot(*(starts - previous).T).sum())
+
+def nearest_neighbour(first, last, children, parents, origin):
+    """Build a cut order by always moving to the closest contour that may be cut next
+
+    Contours may be cut in either direction, so both of their end points
+    are candidates. Returns the contour order and whether each is reversed.
+    """
+    count = len(first)
+    # Number of uncut inner features per contour, and each child's parents
+    waiting = np.bincount(parents, minlength=count)
+    child_order = np.argsort(children, kind='stable')
+    parent_starts = np.searchsorted(children[child_order], np.arange(count + 1))
+    sorted_parents = parents[child_order]
+
+    endpoints = np.vstack([first, last])
+    available = np.ones(count, dtype=bool)
+    order = np.empty(count, dtype=np.intp)
+    reversed_ = np.zeros(count, dtype=bool)
+    position = np.asarray(origin, dtype=np.float64)
+    for step in range(count):
+        distances = np.hypot(*(endpoints - position).T)
+        blocked = ~available | (waiting > 0)
+        distances[np.concatenate([blocked, blocked])] = np.inf
+        best = int(np.argmin(distances))
+        contour = best % count
+        reverse = best >= count
+        order[step] = contour
+        reversed_[step] = reverse
+        available[contour] = False
+        waiting[sorted_parents[parent_starts[contour]:parent_starts[contour + 1]]] -= 1
+        position = first[contour] if reverse else last[contour]
+    return order, reversed_
+
+def two_opt(order, reversed_, first, last, children, parents, origin, deadline):
+    """Improve a cut order by reversing runs of contours while it shortens the travel
+
+    Reversing a run also reverses the direction of each contour in it. Runs
+    that hold both an inner feature and its outline are never reversed, so
+    features stay ahead of their outlines. Stops at ``deadline``.
+    """
+    count = len(order)
+    order = order.copy()
+    reversed_ = reversed_.copy()
+    origin = np.asarray(origin, dtype=np.float64).reshape(1, 2)
+
+    def tour_state():
+        # Position 0 is the origin; contour positions are 1..count
+        entries = np.where(reversed_[:, np.newaxis], last[order], first[order])
+        exits = np.where(reversed_[:, np.newaxis], first[order], last[order])
+        # Earliest position of any outline each contour has to precede
+        positions = np.empty(count, dtype=np.intp)
+        positions[order] = np.arange(1, count + 1)
+        first_parent = np.full(count, count + 1, dtype=np.intp)
+        np.minimum.at(first_parent, children, positions[parents])
+        return (np.vstack([origin, entries]), np.vstack([origin, exits]),
+                np.concatenate([[count + 1], first_parent[order]]))
+
+    entries, exits, first_parent = tour_state()
+    passes = 0
+    improved = True
+    while improved and time.monotonic() < deadline:
+        improved = False
+        passes += 1
+        for i in range(count):
+            if time.monotonic() >= deadline:
+                break
+            # Gain of reversing the run a..j for every j
+            a = i + 1
+            j = np.arange(a, count + 1)
+            removed = np.hypot(*(exits[i] - entries[a]))
+            added = np.hypot(*(exits[j] - exits[i]).T)
+            follows = j < count
+            next_entries = entries[np.minimum(j + 1, count)]
+            removed = removed + np.where(follows, np.hypot(*(next_entries - exits[j]).T), 0.0)
+            added = added + np.where(follows, np.hypot(*(next_entries - entries[a]).T), 0.0)
+            gain = removed - added
+            valid = np.minimum.accumulate(first_parent[a:]) > j
+            gain[~valid] = 0.0
+
+            best = int(np.argmax(gain))
+            if gain[best] > 1e-9:
+                end = a + best
+                order[a - 1:end] = order[a - 1:end][::-1]
+                reversed_[a - 1:end] = ~reversed_[a - 1:end][::-1]
+                entries, exits, first_parent = tour_state()
+                improved = True
+    return order, reversed_, passes
+
+def optimize_cut_order(geometry, origin=(0.0, 0.0), time_budget=1.0):
+    """Reorder a geometry's contours to shorten the rapid travel between cuts
+
+    A nearest-neighbour order is improved with 2-opt until ``time_budget``
+    seconds have passed. Inner features (``*_SLOT*`` layers) are cut before
+    the outlines around them. Returns the reordered Geometry, with contours
+    reversed where that is shorter, and a report of the travel before and
+    after and the solve time.
+    """
+    start = time.perf_counter()
+    deadline = time.monotonic() + time_budget
+    count = geometry.polyline_count
+    first = geometry.coords[geometry.offsets[:-1]]
+    last = geometry.coords[geometry.offsets[1:] - 1]
+    report = {
+        'contours': count,
+        'travel_before': travel_distance(first, last, origin),
+    }
+    if count < 2:
+        report.update(travel_nearest=report['travel_before'], travel_after=report['travel_before'],
+                      passes=0, seconds=time.perf_counter() - start)
+        return geometry, report
+
+    children, parents = contour_precedence(geometry)
+    order, reversed_ = nearest_neighbour(first, last, children, parents, origin)
+    starts = np.where(reversed_[:, np.newaxis], last[order], first[order])
+    ends = np.where(reversed_[:, np.newaxis], first[order], last[order])
+    report['travel_nearest'] = travel_distance(starts, ends, origin)
+
+    order, reversed_, passes = two_opt(order, reversed_, first, last, children, parents, origin, deadline)
+    starts = np.where(reversed_[:, np.newaxis], last[order], first[order])
+    ends = np.where(reversed_[:, np.newaxis], first[order], last[order])
+    report['travel_after'] = travel_distance(starts, ends, origin)
+    report['passes'] = passes
+
+    polylines = []
+    for contour, reverse in zip(order.tolist(), reversed_.tolist()):
+        points = geometry.polyline(contour)
+        polylines.append((geometry.layers[geometry.layer_ids[contour]], points[::-1] if reverse else points))
+    report['seconds'] = time.perf_counter() - start
+    return Geometry.from_polylines(polylines), report
+
+def format_report(report):
+    """Summarize a cut order report in one line"""
+    before = report['travel_before']
+    after = report['travel_after']
+    saved = 1 - after / before if before else 0.0
+    return (f"Cut order: {report['contours']} contours, travel {before:.0f} -> {after:.0f} mm "
+            f"({saved:.0%} less) in {report['seconds']:.2f}s")
@@ -1,18 +1,86 @@
+import argparse
+import logging
+import os
 import sys
 from PyQt6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout,
                             QPushButton, QHBoxLayout, QLabel, QFileDialog,
-                            QSpinBox, QGroupBox, QFormLayout, QComboBox)
-from PyQt6.QtCore import Qt
-from PyQt6.QtGui import QPainter, QPen, QPainterPath
-import ezdxf
+                            QSpinBox, QGroupBox, QFormLayout, QComboBox,
+                            QCheckBox, QProgressDialog)
+from PyQt6.QtCore import Qt, QPointF, QThreadPool
+from PyQt6.QtGui import QColor, QPainter, QPen, QPainterPath, QPolygonF, QTransform
+from background import Task, export_box, export_design, fetch_profile
+from fit_validation import format_issues
+from instrumentation import add_arguments, configure, span, traced
+from mesh3d import MeshCache
+from simplify import LevelOfDetail
+from toolpath import format_report
 from profile_manager import ProfileManager
+from profile_watcher import ProfileWatcher
+
+log = logging.getLogger(__name__)
 
 class DrawingArea(QWidget):
+    MARGIN = 50
+    # Largest on-screen deviation of simplified polylines from the profile
+    MAX_ERROR_PIXELS = 0.5
+
     def __init__(self, container):
         super().__init__()
         self.container = container
         self.setMinimumSize(800, 600)
         
+        # Slots that do not fit are drawn thicker, in orange
+        self.misfit_pen = QPen(QColor(255, 140, 0), 4)
+        self.misfit_pen.setCosmetic(True)
+        
+        # Profile paths in model coordinates per level of detail, rebuilt only
+        # when the profile changes
+        self._lod = None
+        self._paths = {}
+        self._paths_version = None
+        
+    def profile_paths(self, tolerance=0.0):
+        """Get the cached (layer, pen, path) triples for the current profile, simplified to within ``tolerance``"""
+        if self._paths_version != self.container.profile_version:
+            profile = self.container.current_profile
+            self._lod = LevelOfDetail(profile) if profile else None
+            self._paths = {}
+            self._paths_version = self.container.profile_version
+        if self._lod is None:
+            return []
+        
+        level = self._lod.level_for(tolerance)
+        if level not in self._paths:
+            with span('build_paths', 'render', level=level):
+                self._paths[level] = self.build_paths(self._lod.level(level))
+        return self._paths[level]
+
+    @staticmethod
+    def build_paths(profile):
+        """Build one path per layer of a profile, in model coordinates
+        
+        Layers are drawn with their own offset, so moving a layer when the
+        dimensions change does not rebuild its path.
+        """
+        if not profile:
+            return []
+        
+        # Cosmetic pens keep their pixel width under the view transform
+        panel_pen = QPen(Qt.GlobalColor.blue, 2)
+        panel_pen.setCosmetic(True)
+        slot_pen = QPen(Qt.GlobalColor.red, 2)
+        slot_pen.setCosmetic(True)
+        
+        paths = {}
+        for layer, points in profile.iter_polylines():
+            path = paths.setdefault(layer, QPainterPath())
+            path.addPolygon(QPolygonF([QPointF(x, y) for x, y in points.tolist()]))
+            # Close the path if it's not a slot
+            if 'SLOT' not in layer and len(points) > 2:
+                path.closeSubpath()
+        return [(layer, slot_pen if 'SLOT' in layer else panel_pen, path) for layer, path in paths.items()]
+
+    @traced('render', 'DrawingArea.paintEvent')
     def paintEvent(self, event):
         painter = QPainter(self)
         painter.setRenderHint(QPainter.RenderHint.Antialiasing)
@@ -20,49 +88,35 @@ class DrawingArea(QWidget):
         # Set up coordinate system
         width = self.width()
         height = self.height()
-        margin = 50
-        print(f"\nDrawing area size: {width}x{height}")
+        margin = self.MARGIN
         
         # Calculate scaling factors
         scale_x = (width - 2 * margin) / self.container.width
         scale_y = (height - 2 * margin) / self.container.height
         scale = min(scale_x, scale_y)
-        print(f"Scale factors - X: {scale_x}, Y: {scale_y}, Using: {scale}")
         
         # Transform coordinates
         def transform(x, y):
             return (int(margin + x * scale), int(height - margin - y * scale))
         
-        # Draw profile if available
-        if self.container.current_profile:
-            print("\nDrawing profile:")
-            # Draw main profile sections
-            for layer, points in self.container.current_profile.items():
-                print(f"Layer {layer}: {len(points)} points")
-                if points:
-                    # Set color based on layer type
-                    if 'SLOT' in layer:
-                        painter.setPen(QPen(Qt.GlobalColor.red, 2))
-                    else:
-                        painter.setPen(QPen(Qt.GlobalColor.blue, 2))
-                    
-                    # Draw the path
-                    path = QPainterPath()
-                    start_x, start_y = transform(points[0][0], points[0][1])
-                    print(f"First point at ({points[0][0]}, {points[0][1]}) transforms to ({start_x}, {start_y})")
-                    path.moveTo(start_x, start_y)
-                    for x, y in points[1:]:
-                        tx, ty = transform(x, y)
-                        print(f"Point at ({x}, {y}) transforms to ({tx}, {ty})")
-                        path.lineTo(tx, ty)
-                    
-                    # Close the path if it's not a slot
-                    if not 'SLOT' in layer and len(points) > 2:
-                        path.lineTo(start_x, start_y)
-                    
-                    painter.drawPath(path)
-        else:
-            print("No profile to draw")
+        # Draw profile if available, mapping model to widget coordinates with
+        # one transform per layer instead of transforming every vertex;
+        # vertices closer together than a fraction of a pixel are left out
+        paths = self.profile_paths(self.MAX_ERROR_PIXELS / scale if scale > 0 else 0.0)
+        if paths:
+            layer_offsets = self.container.layer_offsets
+            misfit_layers = self.container.misfit_layers
+            current_pen = None
+            for layer, pen, path in paths:
+                if layer in misfit_layers:
+                    pen = self.misfit_pen
+                dx, dy = layer_offsets.get(layer, (0.0, 0.0))
+                painter.setTransform(QTransform(scale, 0, 0, -scale, margin + dx * scale, height - margin - dy * scale))
+                if pen is not current_pen:
+                    painter.setPen(pen)
+                    current_pen = pen
+                painter.drawPath(path)
+            painter.resetTransform()
         
         # Draw dimensions
         painter.setPen(QPen(Qt.GlobalColor.black, 1))
@@ -84,7 +138,23 @@ class Container:
         self.width = 400
         self.height = 600
         self.material_thickness = 18
-        self.current_profile = None
+        self._current_profile = None
+        self.profile_version = 0
+        # (dx, dy) per layer, applied when drawing the current profile
+        self.layer_offsets = {}
+        # Slot layers that do not fit their panel or the material
+        self.misfit_layers = set()
+
+    @property
+    def current_profile(self):
+        return self._current_profile
+
+    @current_profile.setter
+    def current_profile(self, profile):
+        # Bump the version only for a different profile so cached paths stay valid
+        if profile is not self._current_profile:
+            self._current_profile = profile
+            self.profile_version += 1
 
     def update_dimensions(self, width, height, material):
         self.width = width
@@ -92,14 +162,22 @@ class Container:
         self.material_thickness = material
 
 class VectorEditor(QMainWindow):
-    def __init__(self):
+    def __init__(self, watch=False, scaled_preview=False):
         super().__init__()
         self.setWindowTitle("Vector Config Editor")
         self.setMinimumSize(1000, 700)
         
-        # Initialize container and profile manager
+        # Initialize container and profile manager; profiles are only indexed
+        # here and each is parsed on a worker thread when first selected
         self.container = Container()
-        self.profile_manager = ProfileManager()
+        self.profile_manager = ProfileManager(workers=None, lazy=True)
+        self.mesh_cache = MeshCache(self.profile_manager)
+        self.thread_pool = QThreadPool()
+        self.tasks = set()
+        # Parametric model of the current profile, see ProfileLayout.model
+        self.model = None
+        # Slot fit checks of the current profile, see fit_validation.FitTemplate
+        self.fit = None
         
         # Create main widget and layout
         main_widget = QWidget()
@@ -115,7 +193,6 @@ class VectorEditor(QMainWindow):
         profile_layout = QVBoxLayout(profile_group)
         
         self.profile_combo = QComboBox()
-        self.profile_combo.addItems(self.profile_manager.list_profiles())
         self.profile_combo.currentTextChanged.connect(self.update_profile)
         profile_layout.addWidget(QLabel("Select Profile:"))
         profile_layout.addWidget(self.profile_combo)
@@ -150,11 +227,36 @@ class VectorEditor(QMainWindow):
         
         left_layout.addWidget(dim_group)
         
+        # The preview shows the profile as drawn unless asked to place its
+        # layers for the dimensions, as the export does
+        self.scaled_preview_check = QCheckBox("Preview at dimensions")
+        self.scaled_preview_check.setChecked(scaled_preview)
+        self.scaled_preview_check.toggled.connect(self.update_preview)
+        left_layout.addWidget(self.scaled_preview_check)
+        
+        # Cut order optimization for laser/CNC export
+        self.optimize_check = QCheckBox("Optimize cut order")
+        self.optimize_check.setChecked(True)
+        left_layout.addWidget(self.optimize_check)
+        
         # Export button
         export_btn = QPushButton("Export DXF")
         export_btn.clicked.connect(self.export_dxf)
         left_layout.addWidget(export_btn)
         
+        export_svg_btn = QPushButton("Export SVG")
+        export_svg_btn.clicked.connect(self.export_svg)
+        left_layout.addWidget(export_svg_btn)
+        
+        # 3D box model extruded by the material thickness
+        export_stl_btn = QPushButton("Export STL")
+        export_stl_btn.clicked.connect(lambda: self.export_mesh('stl'))
+        left_layout.addWidget(export_stl_btn)
+        
+        export_obj_btn = QPushButton("Export OBJ")
+        export_obj_btn.clicked.connect(lambda: self.export_mesh('obj'))
+        left_layout.addWidget(export_obj_btn)
+        
         left_layout.addStretch()
         layout.addWidget(left_panel)
         
@@ -162,40 +264,131 @@ class VectorEditor(QMainWindow):
         self.drawing_area = DrawingArea(self.container)
         layout.addWidget(self.drawing_area, stretch=2)
         
-        # Set initial profile if available
-        if self.profile_combo.count() > 0:
-            self.update_profile(self.profile_combo.currentText())
+        # Fill the profile list from the index right away; the first entry
+        # becomes the current profile and is fetched by update_profile
+        self.profile_combo.addItems(self.profile_manager.list_profiles())
+        self.statusBar().showMessage(f"Found {self.profile_combo.count()} profiles", 5000)
+        
+        # Pick up profiles the CAD team saves while the editor is open
+        self.profile_watcher = None
+        if watch:
+            self.profile_watcher = ProfileWatcher(self.profile_manager, self.thread_pool, parent=self)
+            self.profile_watcher.profiles_changed.connect(self.reload_profiles)
+
+    def start_task(self, task):
+        """Run a background task, keeping it alive until it finishes"""
+        self.tasks.add(task)
+        task.signals.finished.connect(lambda: self.tasks.discard(task))
+        self.thread_pool.start(task)
+        return task
+
+    def reload_profiles(self, reloaded, removed):
+        """Update the selection and the drawing for profiles changed on disk
+        
+        Entries of unchanged profiles stay as they are; the current profile
+        is redrawn only if its file changed.
+        """
+        current = self.profile_combo.currentText()
+        self.profile_combo.blockSignals(True)
+        for profile_name in removed:
+            index = self.profile_combo.findText(profile_name)
+            if index >= 0:
+                self.profile_combo.removeItem(index)
+        for profile_name in reloaded:
+            if self.profile_combo.findText(profile_name) < 0:
+                self.profile_combo.addItem(profile_name)
+        self.profile_combo.blockSignals(False)
+        
+        if current in removed or not current:
+            # The combo box moved to another entry, or is empty now
+            if self.profile_combo.count():
+                self.update_profile(self.profile_combo.currentText())
+            else:
+                self.model = None
+                self.fit = None
+                self.container.current_profile = None
+                self.container.misfit_layers = set()
+                self.drawing_area.update()
+        elif current in reloaded:
+            self.update_profile(current)
+        self.statusBar().showMessage(f"Reloaded {len(reloaded)} profiles, removed {len(removed)}", 5000)
 
     def update_profile(self, profile_name):
-        """Update the current profile based on selection"""
+        """Fetch the selected profile on a worker thread and show it when ready"""
         if not profile_name:
             return
             
-        print(f"\nUpdating profile to: {profile_name}")
-        profile = self.profile_manager.get_profile(profile_name)
+        log.debug("Updating profile to: %s", profile_name)
+        task = Task(fetch_profile, self.profile_manager, profile_name)
+        task.signals.result.connect(self.show_profile)
+        self.start_task(task)
+
+    def show_profile(self, result):
+        """Hand a profile and its parametric model to the drawing area, unless the selection changed meanwhile"""
+        profile_name, profile, layout, fit = result
+        if profile_name != self.profile_combo.currentText():
+            return
         if not profile:
-            print("No profile data found")
+            log.warning("No profile data found for %s", profile_name)
             return
             
-        print(f"Setting profile with {len(profile)} layers")
+        # The geometry is shared read-only with the worker, not copied; the
+        # model places its layers for the current dimensions
+        try:
+            self.model = layout.model(profile, self.container.width, self.container.height,
+                                      self.container.material_thickness)
+        except ValueError as e:
+            log.warning("Showing %s unscaled: %s", profile_name, e)
+            self.model = None
+        log.debug("Setting profile with %d layers", len(profile))
         self.container.current_profile = profile
+        self.container.layer_offsets = self.layer_offsets(profile.layers)
+        self.fit = fit
+        self.check_fit()
         self.drawing_area.update()
 
+    def layer_offsets(self, layers):
+        """Get the (dx, dy) of layers from the parametric model, if the preview is placed for the dimensions"""
+        if self.model is None or not self.scaled_preview_check.isChecked():
+            return {}
+        return {layer: self.model[f"layer:{layer}"] for layer in layers}
+
     def update_dimensions(self):
-        """Update container dimensions and refresh display"""
+        """Update container dimensions and move only the layers that depend on them"""
         width = self.width_spin.value()
         height = self.height_spin.value()
         material = self.material_spin.value()
         
         self.container.update_dimensions(width, height, material)
         
-        # Update current profile if one is selected
-        profile_name = self.profile_combo.currentText()
-        if profile_name:
-            self.update_profile(profile_name)
+        # Recompute the offsets of the affected layers of the current profile
+        if self.model is not None:
+            changed = self.model.update(width=width, height=height, material_thickness=material)
+            layers = [node[len('layer:'):] for node in changed if node.startswith('layer:')]
+            log.debug("Dimensions moved %d layers", len(layers))
+            self.container.layer_offsets.update(self.layer_offsets(layers))
         
+        self.check_fit()
+        self.drawing_area.update()
+
+    def update_preview(self):
+        """Switch the preview between the profile as drawn and its layers placed for the dimensions"""
+        profile = self.container.current_profile
+        self.container.layer_offsets = self.layer_offsets(profile.layers) if profile else {}
         self.drawing_area.update()
 
+    def check_fit(self):
+        """Check the current design's slots and mark those that do not fit"""
+        issues = []
+        if self.fit is not None:
+            container = self.container
+            issues = self.fit.check([container.width], [container.height], container.material_thickness).issues()
+        self.container.misfit_layers = {layer for issue in issues for layer in issue['layers']}
+        if issues:
+            self.statusBar().showMessage(f"Slot fit: {format_issues(issues)}")
+        elif self.statusBar().currentMessage().startswith("Slot fit:"):
+            self.statusBar().clearMessage()
+
     def export_dxf(self):
         """Export the current design to DXF"""
         filepath, _ = QFileDialog.getSaveFileName(
@@ -206,42 +399,97 @@ class VectorEditor(QMainWindow):
         )
         
         if filepath:
-            try:
-                # Create new DXF document
-                doc = ezdxf.new('R2010')
-                msp = doc.modelspace()
-                
-                # Get current profile
-                profile_name = self.profile_combo.currentText()
-                if not profile_name:
-                    return
-                    
-                profile = self.profile_manager.get_profile(profile_name)
-                if not profile:
-                    return
-                
-                # Scale the profile
-                scaled_profile = self.profile_manager.scale_profile(
-                    profile_name,
-                    self.container.width / 1000,  # Convert to meters
-                    self.container.height / 1000,
-                    self.container.material_thickness / 1000
-                )
-                
-                # Add each layer to the DXF
-                for layer, points in scaled_profile.items():
-                    if points:
-                        msp.add_lwpolyline(points, dxfattribs={'layer': layer})
-                
-                # Save the file
-                doc.saveas(filepath)
-                
-            except Exception as e:
-                print(f"Failed to export DXF: {str(e)}")
+            # Cut slots first and shorten the travel between contours
+            self.start_export(filepath, 'dxf', self.optimize_check.isChecked())
+
+    def export_svg(self):
+        """Export the current design to SVG"""
+        filepath, _ = QFileDialog.getSaveFileName(
+            self,
+            "Export SVG",
+            "",
+            "SVG Files (*.svg)"
+        )
+        
+        if filepath:
+            self.start_export(filepath, 'svg')
+
+    def export_mesh(self, file_format):
+        """Export the current design as a 3D box model"""
+        filepath, _ = QFileDialog.getSaveFileName(
+            self,
+            f"Export {file_format.upper()}",
+            "",
+            f"{file_format.upper()} Files (*.{file_format})"
+        )
+        
+        if filepath:
+            self.start_export(filepath, file_format)
+
+    def start_export(self, filepath, file_format, optimize_cuts=False):
+        """Scale and write the current design on a worker thread with a cancellable progress dialog"""
+        profile_name = self.profile_combo.currentText()
+        if not profile_name:
+            return
+            
+        dimensions = (self.container.width, self.container.height, self.container.material_thickness)
+        if file_format in ('stl', 'obj'):
+            task = Task(export_box, self.mesh_cache, profile_name, *dimensions, filepath, file_format)
+        else:
+            task = Task(export_design, self.profile_manager, profile_name, *dimensions,
+                        filepath, file_format, optimize_cuts)
+        
+        # The dialog shows a busy indicator until the writer reports progress
+        progress = QProgressDialog(f"Exporting {os.path.basename(filepath)}...", "Cancel", 0, 0, self)
+        progress.setWindowModality(Qt.WindowModality.WindowModal)
+        progress.setMinimumDuration(300)
+        progress.canceled.connect(task.cancel)
+        task.signals.progress.connect(lambda done, total: self.show_export_progress(progress, done, total))
+        task.signals.result.connect(self.export_finished)
+        task.signals.error.connect(lambda message: self.statusBar().showMessage(f"Export failed: {message}"))
+        task.signals.cancelled.connect(lambda: self.statusBar().showMessage("Export cancelled", 5000))
+        task.signals.finished.connect(progress.reset)
+        self.start_task(task)
+
+    @staticmethod
+    def show_export_progress(progress, done, total):
+        if progress.wasCanceled():
+            return
+        progress.setMaximum(total)
+        progress.setValue(done)
+
+    def export_finished(self, result):
+        filepath, report, warning = result
+        if report is not None:
+            log.info(format_report(report))
+        if warning is not None:
+            log.warning("Exported %s, but %s", filepath, warning)
+            self.statusBar().showMessage(f"Exported {filepath}, but {warning}")
+            return
+        log.info("Exported %s", filepath)
+        self.statusBar().showMessage(f"Exported {filepath}", 5000)
+
+    def closeEvent(self, event):
+        # Stop background work before the widgets it reports to go away
+        if self.profile_watcher is not None:
+            self.profile_watcher.stop()
+        for task in list(self.tasks):
+            task.cancel()
+        self.thread_pool.waitForDone()
+        super().closeEvent(event)
 
 def main():
-    app = QApplication(sys.argv)
-    window = VectorEditor()
+    parser = argparse.ArgumentParser(description="Vector Config Editor")
+    parser.add_argument('--watch', action='store_true',
+                        help="reload profiles when files in assets/dxf change")
+    parser.add_argument('--scaled-preview', action='store_true',
+                        help="start with the preview placed for the dimensions instead of as drawn")
+    add_arguments(parser)
+    args, qt_args = parser.parse_known_args()
+    configure(args.log_level, args.trace)
+    
+    app = QApplication(sys.argv[:1] + qt_args)
+    window = VectorEditor(watch=args.watch, scaled_preview=args.scaled_preview)
     window.show()
     sys.exit(app.exec())
 